@@ -0,0 +1,57 @@
+"""
+CPU time and peak memory of decoding a large comments page with the stdlib and with the typed decoder.
+
+Run with `python -m benchmarks.bench_decoding`.
+
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from reddit_parser.decoding import Comments, decode
+
+EXTRA_FIELDS = {f"field_{index}": f"value {index}" for index in range(100)}
+
+
+def make_comments_page(count: int) -> bytes:
+    children = [
+        {
+            "kind": "t1",
+            "data": {
+                "id": f"c{index}", "name": f"t1_c{index}", "author": f"author_{index % 50}",
+                "created": 1736000000.0 + index, "score": index % 100, "replies": "", **EXTRA_FIELDS,
+            },
+        }
+        for index in range(count)
+    ]
+    return json.dumps([
+        {"kind": "Listing", "data": {"children": []}},
+        {"kind": "Listing", "data": {"children": children}},
+    ]).encode()
+
+
+def measure(content: bytes, schema) -> tuple[float, int]:
+    tracemalloc.start()
+    start = time.process_time()
+    result = decode(content, schema)
+    elapsed = time.process_time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--comments", type=int, default=5_000)
+    params = parser.parse_args()
+    content = make_comments_page(params.comments)
+    print(f"page size: {len(content) / 1024 / 1024:.1f} MiB")
+    for name, schema in (("stdlib", None), ("typed", Comments)):
+        elapsed, peak = measure(content, schema)
+        print(f"{name:>7}: {elapsed * 1000:8.1f} ms CPU, {peak / 1024 / 1024:8.1f} MiB peak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Per-entity cost of building entities from API data: validated RedditEntity and trusted TrustedRedditEntity.
+
+Run with `python -m benchmarks.bench_entities`.
+
+"""
+import argparse
+import timeit
+
+from reddit_parser.api import _convert_reddit_response_to_models
+
+
+def make_children(count: int) -> list[dict]:
+    return [
+        {
+            "kind": "t1",
+            "data": {
+                "id": f"c{index}", "name": f"t1_c{index}", "author": f"author_{index % 50}",
+                "created": 1736000000.0 + index, "score": index % 100, "body": "text " * 20,
+            },
+        }
+        for index in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--entities", type=int, default=10_000)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    params = parser.parse_args()
+    children = make_children(params.entities)
+    for name, validate in (("validated", True), ("trusted", False)):
+        best = min(timeit.repeat(
+            lambda: _convert_reddit_response_to_models(children, validate), number=1, repeat=params.repeat,
+        ))
+        print(f"{name:>10}: {best / params.entities * 1e9:8.0f} ns per entity")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+End-to-end benchmark of the searchers against the synthetic Reddit stand-in.
+
+Runs TopLinksSearcher and TopUsersSearcher (blocking and asyncio) through the real RedditApi and reports
+wall time, CPU time, request count and peak memory of every scenario. Results can be saved as a baseline
+and later runs compared against it:
+
+    python -m benchmarks.bench_searchers --scenario small --save-baseline
+    python -m benchmarks.bench_searchers --scenario small --compare
+
+Crawls recorded with `python -m reddit_parser --record DIR` can be used as fixtures instead:
+
+    python -m benchmarks.bench_searchers --archive DIR --subreddit python --days 3
+
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from benchmarks.synthetic import RateLimitShape, SubredditShape, SyntheticReddit, SyntheticSubreddit
+from reddit_parser.api import RedditApi
+from reddit_parser.archive import Archive, ReplayTransport
+from reddit_parser.async_api import AsyncRedditApi
+from reddit_parser.config import AuthConfig
+from reddit_parser.planning import CommentsStrategy
+from reddit_parser.ratelimit import TokenBucket, UnlimitedBucket
+from reddit_parser.searcher import AsyncTopUsersSearcher, TopLinksSearcher, TopUsersSearcher
+
+BASE_URL = "https://oauth.reddit.com"
+SUBREDDIT = "benchmark"
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines.json")
+COMPARED_METRICS = ("wall_time", "cpu_time", "requests", "peak_memory")
+
+SCENARIOS: dict[str, tuple[SubredditShape, RateLimitShape]] = {
+    "small": (SubredditShape(days=1, links_per_day=50, comments_per_thread=10), RateLimitShape()),
+    "medium": (
+        SubredditShape(days=3, links_per_day=200, comments_per_thread=40, visible_comments=50),
+        RateLimitShape(),
+    ),
+    "large": (
+        SubredditShape(days=7, links_per_day=300, comments_per_thread=150, nesting_depth=10, visible_comments=100),
+        RateLimitShape(),
+    ),
+    "latency": (
+        SubredditShape(days=1, links_per_day=100, comments_per_thread=20),
+        RateLimitShape(latency=0.02),
+    ),
+}
+# top_users plans how to count comments, top_users_links always counts them per link.
+MODES = ("top_links", "top_users", "top_users_links", "top_users_async")
+
+AUTH_CONFIG = AuthConfig(
+    app_id="benchmark", secret="secret", username="benchmark", password="password",
+    auth_url="https://www.reddit.com/api/v1/access_token",
+)
+
+
+def run_mode(
+        mode: str,
+        network: Any,
+        subreddit_name: str,
+        days: int,
+        concurrency: int,
+        clock: Callable[[], float] = time.time,
+        limiter: TokenBucket | None = None,
+) -> Any:
+    if mode == "top_users_async":
+        return asyncio.run(run_async(network, subreddit_name, days, concurrency, clock, limiter))
+    api = RedditApi(base_url=BASE_URL, auth_config=AUTH_CONFIG, network=network, limiter=limiter)
+    api.authorize()
+    if mode == "top_links":
+        return list(TopLinksSearcher(api, clock=clock).process(subreddit_name, days))
+    strategy = CommentsStrategy.LINKS if mode == "top_users_links" else CommentsStrategy.AUTO
+    return TopUsersSearcher(api, clock=clock, strategy=strategy).process(subreddit_name, days)
+
+
+async def run_async(
+        network: Any,
+        subreddit_name: str,
+        days: int,
+        concurrency: int,
+        clock: Callable[[], float],
+        limiter: TokenBucket | None,
+) -> Any:
+    async with AsyncRedditApi(
+            base_url=BASE_URL, auth_config=AUTH_CONFIG, max_in_flight=concurrency, network=network, limiter=limiter,
+    ) as api:
+        await api.authorize()
+        return await AsyncTopUsersSearcher(api, clock=clock).process(subreddit_name, days)
+
+
+def measure(scenario: str, mode: str, concurrency: int, memory: bool) -> dict[str, Any]:
+    shape, ratelimit = SCENARIOS[scenario]
+
+    def run() -> SyntheticReddit:
+        server = SyntheticReddit([SyntheticSubreddit(SUBREDDIT, shape)], ratelimit)
+        run_mode(mode, server, SUBREDDIT, shape.days, concurrency)
+        return server
+
+    return measure_run(run, memory)
+
+
+def measure_archive(
+        archive: Archive, subreddit_name: str, days: int, mode: str, concurrency: int, memory: bool,
+) -> dict[str, Any]:
+    """
+    Replays a crawl recorded with --record, without rate limiting.
+
+    """
+    def run() -> ReplayTransport:
+        replay = ReplayTransport(archive)
+        run_mode(
+            mode, replay, subreddit_name, days, concurrency,
+            clock=lambda: archive.start(subreddit_name), limiter=UnlimitedBucket(),
+        )
+        return replay
+
+    return measure_run(run, memory)
+
+
+def measure_run(run: Callable[[], SyntheticReddit | ReplayTransport], memory: bool) -> dict[str, Any]:
+    wall_started, cpu_started = time.perf_counter(), time.process_time()
+    server = run()
+    result: dict[str, Any] = {
+        "wall_time": time.perf_counter() - wall_started,
+        "cpu_time": time.process_time() - cpu_started,
+        "requests": sum(server.requests.values()),
+        "requests_by_endpoint": dict(server.requests),
+        "bytes_received": server.bytes_sent,
+    }
+    if memory:
+        # Separate run: tracing allocations slows the code down too much to measure time at once.
+        result["peak_memory"] = measure_peak_memory(run)
+    return result
+
+
+def measure_peak_memory(function: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric not in result or not baseline[key].get(metric):
+                continue
+            ratio = result[metric] / baseline[key][metric]
+            marker = ""
+            if ratio > 1 + tolerance:
+                marker = "  <-- regression"
+                regressions.append(f"{key} {metric}")
+            print(f"{key:<32} {metric:<12} {baseline[key][metric]:>14.3f} -> {result[metric]:>14.3f} "
+                  f"({ratio:6.2f}x){marker}")
+    return regressions
+
+
+def print_result(key: str, result: dict[str, Any]) -> None:
+    memory = f"{result['peak_memory'] / 1024 / 1024:8.1f} MiB peak" if "peak_memory" in result else ""
+    print(f"{key:<32} {result['wall_time']:8.3f} s wall {result['cpu_time']:8.3f} s CPU "
+          f"{result['requests']:6d} requests {result['bytes_received'] / 1024 / 1024:8.1f} MiB {memory}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--scenario", choices=SCENARIOS, action="append")
+    parser.add_argument("-m", "--mode", choices=MODES, action="append")
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--no-memory", help="Skip the peak memory run.", action="store_true")
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", help="Allowed slowdown before reporting a regression.", type=float, default=0.2)
+    parser.add_argument("--archive", help="Replay a recorded archive instead of synthetic scenarios.", type=str)
+    parser.add_argument("--subreddit", help="Subreddit to replay from the archive.", type=str)
+    parser.add_argument("-d", "--days", help="Days to replay from the archive.", type=int, default=3)
+    params = parser.parse_args()
+    if params.archive and not params.subreddit:
+        parser.error("--archive requires --subreddit.")
+
+    results = {}
+    if params.archive:
+        with Archive(params.archive) as archive:
+            for mode in params.mode or MODES:
+                key = f"archive:{params.subreddit}/{mode}"
+                results[key] = measure_archive(
+                    archive, params.subreddit, params.days, mode, params.concurrency, memory=not params.no_memory,
+                )
+                print_result(key, results[key])
+    for scenario in params.scenario or ([] if params.archive else ["small", "medium"]):
+        for mode in params.mode or MODES:
+            key = f"{scenario}/{mode}"
+            results[key] = measure(scenario, mode, params.concurrency, memory=not params.no_memory)
+            print_result(key, results[key])
+
+    if params.compare and not os.path.exists(params.baseline):
+        print(f"No baseline at {params.baseline}, save one with --save-baseline")
+    elif params.compare:
+        with open(params.baseline) as file:
+            regressions = compare(results, json.load(file), params.tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            return 1
+    if params.save_baseline:
+        baseline = {}
+        if os.path.exists(params.baseline):
+            with open(params.baseline) as file:
+                baseline = json.load(file)
+        baseline.update(results)
+        with open(params.baseline, "w") as file:
+            json.dump(baseline, file, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
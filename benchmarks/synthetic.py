@@ -0,0 +1,299 @@
+"""
+Synthetic stand-in for the Reddit API, used as a network transport of RedditApi and AsyncRedditApi.
+
+Subreddits are generated deterministically from the seed and their size. Comment trees are generated
+on request, so large subreddits don't have to be kept in memory.
+
+"""
+import asyncio
+import heapq
+import json
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+
+import httpx
+
+PAGE_SIZE = 100
+MAX_COMMENTS_LIMIT = 500
+MAX_LISTING_ITEMS = 1000
+TIME_FILTERS = {"hour": 1 / 24, "day": 1, "week": 7, "month": 30, "year": 365}
+FILLER = {f"field_{index}": f"filler value {index}" for index in range(40)}
+
+
+@dataclass
+class SubredditShape:
+    days: int = 3
+    links_per_day: int = 100
+    comments_per_thread: int = 20
+    nesting_depth: int = 5
+    visible_comments: int = 200
+    empty_threads_share: float = 0.3
+
+
+@dataclass
+class RateLimitShape:
+    quota: int = 100_000
+    period: int = 600
+    latency: float = 0.0
+
+
+@dataclass
+class SyntheticComment:
+    id: str
+    parent: int
+    depth: int
+    author: str
+    created: float
+    score: int
+
+
+@dataclass
+class SyntheticLink:
+    id: str
+    author: str
+    created: float
+    score: int
+    num_comments: int
+
+
+@dataclass
+class SyntheticSubreddit:
+    name: str
+    shape: SubredditShape = field(default_factory=SubredditShape)
+    seed: int = 0
+    now: float = field(default_factory=time.time)
+    links: list[SyntheticLink] = field(init=False)
+
+    def __post_init__(self) -> None:
+        rng = random.Random(f"{self.seed}:{self.name}")
+        count = self.shape.days * self.shape.links_per_day
+        interval = 24 * 60 * 60 / self.shape.links_per_day
+        self.links = [
+            SyntheticLink(
+                id=f"{self.name}{index:x}",
+                author=f"author_{rng.randrange(count // 4 + 1)}",
+                created=self.now - (index + 0.5) * interval,
+                score=rng.randrange(10_000),
+                num_comments=0 if rng.random() < self.shape.empty_threads_share
+                else rng.randint(1, 2 * self.shape.comments_per_thread),
+            )
+            for index in range(count)
+        ]
+        self.links_by_id = {link.id: link for link in self.links}
+        self.top_links = sorted(self.links, key=lambda x: x.score, reverse=True)
+
+    def comments(self, link_id: str) -> tuple[SyntheticComment, ...]:
+        link = self.links_by_id[link_id]
+        return _generate_comments(link.id, link.num_comments, link.created, self.shape.nesting_depth, self.seed)
+
+    def get_top_links(self, request: httpx.Request) -> list[SyntheticLink]:
+        if (days := TIME_FILTERS.get(request.url.params.get("t", "all"))) is None:
+            return self.top_links
+        threshold = self.now - days * 24 * 60 * 60
+        return [link for link in self.top_links if link.created >= threshold]
+
+    @cached_property
+    def newest_comments(self) -> list[tuple[SyntheticComment, SyntheticLink]]:
+        """
+        The subreddit-wide comment stream, which ends after MAX_LISTING_ITEMS comments like Reddit listings do.
+
+        """
+        return heapq.nlargest(
+            MAX_LISTING_ITEMS,
+            ((comment, link) for link in self.links for comment in self.comments(link.id)),
+            key=lambda x: x[0].created,
+        )
+
+
+@lru_cache(maxsize=256)
+def _generate_comments(
+        link_id: str, count: int, created: float, depth: int, seed: int,
+) -> tuple[SyntheticComment, ...]:
+    rng = random.Random(f"{seed}:{link_id}")
+    comments: list[SyntheticComment] = []
+    for index in range(count):
+        parent = -1
+        if comments and rng.random() < 0.6:
+            parent = rng.randrange(len(comments))
+            if comments[parent].depth + 1 >= depth:
+                parent = -1
+        comments.append(SyntheticComment(
+            id=f"{link_id}c{index:x}",
+            parent=parent,
+            depth=0 if parent < 0 else comments[parent].depth + 1,
+            author=f"commenter_{rng.randrange(count * 2 + 10)}",
+            created=created + index,
+            score=rng.randrange(100),
+        ))
+    return tuple(comments)
+
+
+class SyntheticReddit(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Serves /new, /top, comment trees, the comment stream, /api/morechildren, /api/info and authorization for synthetic
+    subreddits, emits X-Ratelimit-* headers of a quota which is shared by all requests and
+    counts requests per endpoint.
+
+    """
+    def __init__(self, subreddits: list[SyntheticSubreddit], ratelimit: RateLimitShape | None = None) -> None:
+        self.subreddits = {subreddit.name.lower(): subreddit for subreddit in subreddits}
+        self.ratelimit = ratelimit or RateLimitShape()
+        self.requests: Counter[str] = Counter()
+        self.bytes_sent = 0
+        self._window_started = time.monotonic()
+        self._used = 0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.ratelimit.latency:
+            time.sleep(self.ratelimit.latency)
+        return self._respond(request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.ratelimit.latency:
+            await asyncio.sleep(self.ratelimit.latency)
+        return self._respond(request)
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        parts = path.strip("/").split("/")
+        if path == "/api/v1/access_token":
+            self.requests["access_token"] += 1
+            return self._json({"access_token": "synthetic", "expires_in": 86400, "token_type": "bearer"})
+        if path == "/api/morechildren":
+            return self._count("morechildren", self._morechildren(request))
+        if path == "/api/info":
+            return self._count("info", self._info(request))
+        if len(parts) >= 3 and parts[0] == "r" and (subreddit := self.subreddits.get(parts[1].lower())):
+            match parts[2:]:
+                case ["new"]:
+                    return self._count("new", self._listing(subreddit.links, request))
+                case ["top"]:
+                    return self._count("top", self._listing(subreddit.get_top_links(request), request))
+                case ["comments"]:
+                    return self._count("comment_stream", self._comment_stream(subreddit, request))
+                case ["comments", article]:
+                    return self._count("comments", self._comments(subreddit, article, request))
+        return httpx.Response(404, json={"message": "Not Found", "error": 404})
+
+    def _count(self, endpoint: str, response: httpx.Response) -> httpx.Response:
+        self.requests[endpoint] += 1
+        now = time.monotonic()
+        if now - self._window_started >= self.ratelimit.period:
+            self._window_started = now
+            self._used = 0
+        self._used += 1
+        response.headers["X-Ratelimit-Used"] = str(self._used)
+        response.headers["X-Ratelimit-Remaining"] = str(max(self.ratelimit.quota - self._used, 0))
+        response.headers["X-Ratelimit-Reset"] = str(int(self.ratelimit.period - (now - self._window_started)))
+        return response
+
+    def _json(self, data) -> httpx.Response:
+        content = json.dumps(data).encode()
+        self.bytes_sent += len(content)
+        return httpx.Response(200, content=content, headers={"Content-Type": "application/json"})
+
+    def _listing(self, links: list[SyntheticLink], request: httpx.Request) -> httpx.Response:
+        start = 0
+        if after := request.url.params.get("after"):
+            start = next((index + 1 for index, link in enumerate(links) if f"t3_{link.id}" == after), len(links))
+        limit = int(request.url.params.get("limit", PAGE_SIZE))
+        page = links[start:start + limit]
+        return self._json({
+            "kind": "Listing",
+            "data": {
+                "after": f"t3_{page[-1].id}" if start + limit < len(links) else None,
+                "children": [_link_thing(link) for link in page],
+            },
+        })
+
+    def _comment_stream(self, subreddit: SyntheticSubreddit, request: httpx.Request) -> httpx.Response:
+        comments = subreddit.newest_comments
+        start = 0
+        if after := request.url.params.get("after"):
+            names = (f"t1_{comment.id}" for comment, _ in comments)
+            start = next((index + 1 for index, name in enumerate(names) if name == after), len(comments))
+        limit = int(request.url.params.get("limit", PAGE_SIZE))
+        page = comments[start:start + limit]
+        return self._json({
+            "kind": "Listing",
+            "data": {
+                "after": f"t1_{page[-1][0].id}" if start + limit < len(comments) else None,
+                "children": [_comment_thing(comment, link) for comment, link in page],
+            },
+        })
+
+    def _info(self, request: httpx.Request) -> httpx.Response:
+        links = []
+        for fullname in request.url.params["id"].split(","):
+            link_id = fullname.removeprefix("t3_")
+            for subreddit in self.subreddits.values():
+                if link := subreddit.links_by_id.get(link_id):
+                    links.append(_link_thing(link))
+        return self._json({"kind": "Listing", "data": {"after": None, "children": links}})
+
+    def _comments(self, subreddit: SyntheticSubreddit, article: str, request: httpx.Request) -> httpx.Response:
+        link = subreddit.links_by_id[article]
+        comments = subreddit.comments(article)
+        limit = int(request.url.params.get("limit", subreddit.shape.visible_comments))
+        visible = min(limit, MAX_COMMENTS_LIMIT, len(comments))
+        things = [_comment_thing(comment, link) for comment in comments[:visible]]
+        roots = []
+        for comment, thing in zip(comments, things):
+            if comment.parent < 0:
+                roots.append(thing)
+            else:
+                parent = things[comment.parent]["data"]
+                if not parent["replies"]:
+                    parent["replies"] = {"kind": "Listing", "data": {"children": []}}
+                parent["replies"]["data"]["children"].append(thing)
+        if hidden := comments[visible:]:
+            roots.append({
+                "kind": "more",
+                "data": {
+                    "count": len(hidden), "name": f"t1_{hidden[0].id}", "id": hidden[0].id,
+                    "parent_id": f"t3_{article}", "depth": 0, "children": [comment.id for comment in hidden],
+                },
+            })
+        return self._json([
+            {"kind": "Listing", "data": {"children": [_link_thing(link)]}},
+            {"kind": "Listing", "data": {"children": roots}},
+        ])
+
+    def _morechildren(self, request: httpx.Request) -> httpx.Response:
+        article = request.url.params["link_id"].removeprefix("t3_")
+        requested = set(request.url.params["children"].split(","))
+        things = []
+        for subreddit in self.subreddits.values():
+            if link := subreddit.links_by_id.get(article):
+                things = [
+                    _comment_thing(comment, link)
+                    for comment in subreddit.comments(article) if comment.id in requested
+                ]
+        return self._json({"json": {"errors": [], "data": {"things": things}}})
+
+
+def _link_thing(link: SyntheticLink) -> dict:
+    return {
+        "kind": "t3",
+        "data": {
+            **FILLER,
+            "id": link.id, "name": f"t3_{link.id}", "author": link.author, "created": link.created,
+            "created_utc": link.created, "score": link.score, "num_comments": link.num_comments,
+            "title": f"Synthetic link {link.id}", "selftext": "text " * 50,
+        },
+    }
+
+
+def _comment_thing(comment: SyntheticComment, link: SyntheticLink) -> dict:
+    return {
+        "kind": "t1",
+        "data": {
+            **FILLER,
+            "id": comment.id, "name": f"t1_{comment.id}", "author": comment.author, "created": comment.created,
+            "created_utc": comment.created, "score": comment.score, "depth": comment.depth,
+            "link_id": f"t3_{link.id}", "body": "comment " * 20, "replies": "",
+        },
+    }
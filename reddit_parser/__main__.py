@@ -1,13 +1,37 @@
 import argparse
-import json
+import asyncio
 import os
+import sys
+import time
 from enum import StrEnum
-from typing import Any, Callable
-from collections.abc import Hashable
+from typing import Any, Awaitable, Callable
 
-from reddit_parser.searcher import TopLinksSearcher, TopUsersSearcher
-from reddit_parser.api import RedditApi
-from reddit_parser.config import load_from_env, Config
+import httpx
+
+from reddit_parser.searcher import TopLinksSearcher, TopUsersSearcher, AsyncTopUsersSearcher
+from reddit_parser.api import RedditApi, RedditApiError
+from reddit_parser.archive import Archive, RecordingTransport, ReplayTransport, current_subreddit
+from reddit_parser.async_api import AsyncRedditApi
+from reddit_parser.auth import TokenStore, DEFAULT_TOKEN_FILE
+from reddit_parser.cache import ResponseCache, DEFAULT_TTL
+from reddit_parser.checkpoint import CheckpointStore, DEFAULT_CHECKPOINT_DIR
+from reddit_parser.config import load_from_env, AuthConfig, Config
+from reddit_parser.metrics import Metrics
+from reddit_parser.network import ConnectionConfig, RetryPolicy, create_async_http_transport, create_http_transport
+from reddit_parser.incremental import IncrementalTopUsersSearcher, StateStore, DEFAULT_STATE_DIR
+from reddit_parser.planning import CommentsStrategy
+from reddit_parser.pool import SessionPool
+from reddit_parser.ratelimit import UnlimitedBucket, current_lane
+from reddit_parser.server import DEFAULT_INTERVAL, DEFAULT_PORT, RankingService, serve
+from reddit_parser.workqueue import DEFAULT_LEASE, QueueCoordinator, QueueWorker, WorkQueue, WorkQueueError
+from reddit_parser.writers import OutputFormat, is_available, write_result
+
+SUBREDDIT_PLACEHOLDER = "{subreddit}"
+# Replayed responses are matched by path and query only, so no real host or credentials are needed.
+REPLAY_CONFIG = Config(
+    base_url="https://oauth.reddit.com",
+    auth=AuthConfig(app_id="replay", secret="", username="replay", password="", auth_url=""),
+)
 
 
 class TopMode(StrEnum):
@@ -15,49 +39,463 @@ class TopMode(StrEnum):
     TOP_USERS = "top_users"
 
 
-def save(name: str, data: dict[Hashable, Any] | list[Any]) -> None:
-    with open(name, "w") as file:
-        file.write(json.dumps(data, indent=4))
+class BatchReport:
+    """
+    Saves result of every subreddit into its own file as soon as it is ready and collects failures.
+
+    """
+    def __init__(self, file_template: str, batch: bool, output_format: OutputFormat = OutputFormat.JSON) -> None:
+        self.file_template = file_template
+        self.batch = batch
+        self.output_format = output_format
+        self.messages: list[str] = []
+        self.failed: list[str] = []
+
+    def __call__(self, subreddit_name: str, result: Any) -> None:
+        if isinstance(result, Exception):
+            self.failed.append(subreddit_name)
+            self.messages.append(f"Search in {subreddit_name} failed: {result}")
+            return
+        filename = self.get_filename(subreddit_name)
+        write_result(filename, result, self.output_format)
+        self.messages.append(f"Results saved to {filename}.")
+
+    def get_filename(self, subreddit_name: str) -> str:
+        if SUBREDDIT_PLACEHOLDER in self.file_template:
+            return self.file_template.replace(SUBREDDIT_PLACEHOLDER, subreddit_name)
+        if not self.batch:
+            return self.file_template
+        root, extension = os.path.splitext(self.file_template)
+        return f"{root}_{subreddit_name}{extension}"
+
+
+def get_serve_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m reddit_parser serve",
+        description="Keep rankings of the subreddits in memory, refresh them on schedule and serve them over HTTP.",
+    )
+    parser.add_argument("subreddit", help="Subreddit names to keep rankings of.", nargs="*")
+    parser.add_argument(
+        "-s", "--subreddits-file", help="File with subreddit names, one per line.",
+        required=False, type=str, default=None,
+    )
+    parser.add_argument("-d", "--days", help="Count of days.", required=False, type=int, default=3)
+    parser.add_argument(
+        "-m", "--mode", help="Rating mode to keep, may be repeated. Both of them by default.",
+        required=False, type=TopMode, action="append",
+    )
+    parser.add_argument(
+        "-t", "--top", help="Count of top entries to keep in every rating.", required=False, type=int, default=None,
+    )
+    parser.add_argument(
+        "--interval", help="Seconds between refreshes of the rankings.",
+        required=False, type=float, default=DEFAULT_INTERVAL,
+    )
+    parser.add_argument("--host", help="Address to listen on.", required=False, type=str, default="127.0.0.1")
+    parser.add_argument("--port", help="Port to listen on.", required=False, type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--token-file", help="File to keep the access token in between runs.",
+        required=False, type=str, default=DEFAULT_TOKEN_FILE,
+    )
+    params = parser.parse_args(argv)
+    params.subreddits = get_subreddits(params.subreddit, params.subreddits_file)
+    if not params.subreddits:
+        parser.error("At least one subreddit has to be provided.")
+    return params
+
+
+def get_worker_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m reddit_parser worker",
+        description="Fetch comment trees of links enqueued by runs with --queue and store their author counts.",
+    )
+    parser.add_argument("--queue", help="Path of the queue database.", required=True, type=str)
+    parser.add_argument(
+        "--batch-size", help="Count of links to claim at once.", required=False, type=int, default=1,
+    )
+    parser.add_argument(
+        "--lease", help="Seconds after which links claimed by a crashed worker are claimed again.",
+        required=False, type=float, default=DEFAULT_LEASE,
+    )
+    parser.add_argument(
+        "--wait", help="Keep waiting for new links instead of exiting when the queue is done.", action="store_true",
+    )
+    parser.add_argument(
+        "--token-file", help="File to keep the access token in between runs.",
+        required=False, type=str, default=DEFAULT_TOKEN_FILE,
+    )
+    return parser.parse_args(argv)
 
 
 def get_args():
     parser = argparse.ArgumentParser()
-    parser.add_argument("subreddit", help="Subreddit name to search links in.")
+    parser.add_argument("subreddit", help="Subreddit names to search links in.", nargs="*")
+    parser.add_argument(
+        "-s", "--subreddits-file", help="File with subreddit names to search links in, one per line.",
+        required=False, type=str, default=None,
+    )
     parser.add_argument("-d", "--days", help="Count of days.", required=False, type=int, default=3)
     parser.add_argument(
         "-m", "--mode", help="Rating mode. One of: top_links, top_users.",
         required=False, type=TopMode, default=TopMode.TOP_USERS,
     )
     parser.add_argument(
-        "-f", "--file", help="File name to save results into.",
-        required=False, type=str, default="result.json"
+        "-f", "--file",
+        help=f"File name to save results into, result.<format> by default. With several subreddits, "
+             f"{SUBREDDIT_PLACEHOLDER} in it is replaced with the subreddit name, "
+             f"otherwise the name is appended to it.",
+        required=False, type=str, default=None,
+    )
+    parser.add_argument(
+        "--comments-strategy",
+        help="How comments are counted in top_users mode. One of: links (per link), stream (from the "
+             "subreddit-wide comment stream), auto (whichever is estimated to take fewer requests).",
+        required=False, type=CommentsStrategy, default=CommentsStrategy.AUTO,
+    )
+    parser.add_argument(
+        "--format", help="Output format. One of: json, ndjson, csv, parquet (requires pyarrow).",
+        required=False, type=OutputFormat, default=OutputFormat.JSON,
     )
     parser.add_argument("--log", help="Enable saving responses to a log file", action="store_true")
-    return parser.parse_args()
+    parser.add_argument(
+        "--log-sample-rate", help="Log only every N-th successful response. Errors are always logged.",
+        required=False, type=int, default=1,
+    )
+    parser.add_argument("--log-errors-only", help="Log only failed responses.", action="store_true")
+    parser.add_argument(
+        "-c", "--concurrency",
+        help="Count of comment requests to keep in flight at once in top_users mode. "
+             "Values above 1 switch to the asyncio client. With several credentials it's counted per credential "
+             "and threads are used instead.",
+        required=False, type=int, default=1,
+    )
+    parser.add_argument(
+        "--cache", help="Path to SQLite file to cache listings and comment trees in. Disabled by default.",
+        required=False, type=str, default=None,
+    )
+    parser.add_argument(
+        "--cache-ttl", help="Base time to live of cached comment trees in seconds. Grows with the age of a link.",
+        required=False, type=float, default=DEFAULT_TTL,
+    )
+    parser.add_argument(
+        "--incremental",
+        help="Keep per-subreddit state between runs and only request what changed since the previous one. "
+             "Only supported in top_users mode.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--state-dir", help="Directory to keep state of incremental runs in.",
+        required=False, type=str, default=DEFAULT_STATE_DIR,
+    )
+    parser.add_argument(
+        "--queue",
+        help="Path of a queue database to hand comment trees to `python -m reddit_parser worker` processes "
+             "through. The run waits for the workers and merges their counts. Only supported in top_users mode.",
+        required=False, type=str, default=None,
+    )
+    parser.add_argument(
+        "--resume",
+        help="Continue interrupted top_users runs from their checkpoints instead of starting over. "
+             "Checkpoints are written by every top_users run without --incremental and --queue.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--checkpoint-dir", help="Directory to keep checkpoints of top_users runs in until they finish.",
+        required=False, type=str, default=DEFAULT_CHECKPOINT_DIR,
+    )
+    parser.add_argument(
+        "--validate", help="Validate every entity received from the API. Slower, useful for debugging.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-t", "--top", help="Count of top entries to keep in every rating. All of them by default.",
+        required=False, type=int, default=None,
+    )
+    parser.add_argument(
+        "--metrics",
+        help="File to write request metrics into at the end of the run: Prometheus text format "
+             "for .prom files, JSON otherwise.",
+        required=False, type=str, default=None,
+    )
+    parser.add_argument(
+        "--token-file",
+        help="File to keep the access token in between runs. Pass an empty string to request a new token every run.",
+        required=False, type=str, default=DEFAULT_TOKEN_FILE,
+    )
+    parser.add_argument(
+        "--retries", help="Count of attempts of a request failed with 429, 5xx or a network error.",
+        required=False, type=int, default=RetryPolicy.attempts,
+    )
+    parser.add_argument("--http2", help="Use HTTP/2, requires httpx[http2] to be installed.", action="store_true")
+    archive = parser.add_mutually_exclusive_group()
+    archive.add_argument(
+        "--record", help="Directory of an archive to append every received response to.",
+        required=False, type=str, default=None,
+    )
+    archive.add_argument(
+        "--replay",
+        help="Directory of a recorded archive to serve responses from instead of the API. "
+             "Days are counted back from the time the recorded crawl of each subreddit started.",
+        required=False, type=str, default=None,
+    )
+    params = parser.parse_args()
+    if params.file is None:
+        params.file = f"result.{params.format}"
+    if params.log_sample_rate < 1:
+        parser.error("--log-sample-rate has to be at least 1.")
+    # Checked before the crawl, the result would be lost otherwise.
+    if not is_available(params.format):
+        parser.error(f"{params.format} output requires pyarrow, install the parquet extra.")
+    if params.incremental and params.mode != TopMode.TOP_USERS:
+        parser.error("--incremental is only supported in top_users mode.")
+    if params.queue and (params.mode != TopMode.TOP_USERS or params.incremental):
+        parser.error("--queue is only supported in top_users mode without --incremental.")
+    if params.resume and (params.mode != TopMode.TOP_USERS or params.incremental or params.queue):
+        parser.error("--resume is only supported in top_users mode without --incremental and --queue.")
+    params.subreddits = get_subreddits(params.subreddit, params.subreddits_file)
+    if not params.subreddits:
+        parser.error("At least one subreddit has to be provided.")
+    return params
+
+
+def get_subreddits(names: list[str], filename: str | None) -> list[str]:
+    if filename:
+        with open(filename) as file:
+            names = names + [line.strip() for line in file if line.strip() and not line.startswith("#")]
+    return list(dict.fromkeys(name.removeprefix("r/") for name in names))
+
+
+def create_cache(params: argparse.Namespace) -> ResponseCache | None:
+    if not params.cache:
+        return None
+    return ResponseCache(params.cache, ttl=params.cache_ttl)
+
+
+def create_token_store(params: argparse.Namespace) -> TokenStore | None:
+    return TokenStore(params.token_file) if params.token_file and not params.replay else None
+
 
+def create_archive(params: argparse.Namespace) -> Archive | None:
+    if params.replay:
+        return Archive(params.replay)
+    if params.record:
+        return Archive(params.record, writable=True)
+    return None
 
-def create_searcher(params: argparse.Namespace, config: Config) -> Callable[[str, int], ...]:
-    api = RedditApi(base_url=config.base_url, auth_config=config.auth)
+
+def get_archive_options(
+        archive: Archive | None, connection: ConnectionConfig, asynchronous: bool = False,
+) -> dict[str, Any]:
+    if archive is None:
+        return {}
+    if not archive.writable:
+        return {"network": ReplayTransport(archive), "limiter": UnlimitedBucket()}
+    network = create_async_http_transport(connection) if asynchronous else create_http_transport(connection)
+    return {"network": RecordingTransport(archive, network)}
+
+
+def get_clock(archive: Archive | None) -> Callable[[], float]:
+    if archive is None:
+        return time.time
+    return lambda: archive.start(current_subreddit.get())
+
+
+def create_searcher(
+        params: argparse.Namespace,
+        config: Config,
+        cache: ResponseCache | None = None,
+        metrics: Metrics | None = None,
+        archive: Archive | None = None,
+) -> Callable[[str, int], Any]:
+    api = create_api(params, config.base_url, config.auth, cache, metrics, archive)
+    searcher: TopLinksSearcher | TopUsersSearcher | IncrementalTopUsersSearcher | QueueCoordinator
     match params.mode:
+        case TopMode.TOP_USERS if params.incremental:
+            searcher = IncrementalTopUsersSearcher(api, StateStore(params.state_dir), top=params.top)
         case TopMode.TOP_LINKS:
-            searcher = TopLinksSearcher(api)
+            searcher = TopLinksSearcher(api, top=params.top, clock=get_clock(archive))
+        case TopMode.TOP_USERS if params.queue:
+            searcher = QueueCoordinator(api, WorkQueue(params.queue), top=params.top, clock=get_clock(archive))
+        case TopMode.TOP_USERS if len(config.credentials) > 1:
+            pool = SessionPool(
+                [api] + [
+                    create_api(params, config.base_url, auth_config, cache, metrics, archive)
+                    for auth_config in config.extra_auth
+                ],
+                workers_per_session=params.concurrency,
+            )
+            pool.authorize()
+            searcher = TopUsersSearcher(
+                pool.api,
+                top=params.top,
+                clock=get_clock(archive),
+                strategy=params.comments_strategy,
+                pool=pool,
+                checkpoints=CheckpointStore(params.checkpoint_dir),
+                resume=params.resume,
+            )
         case TopMode.TOP_USERS:
-            searcher = TopUsersSearcher(api)
+            searcher = TopUsersSearcher(
+                api,
+                top=params.top,
+                clock=get_clock(archive),
+                strategy=params.comments_strategy,
+                checkpoints=CheckpointStore(params.checkpoint_dir),
+                resume=params.resume,
+            )
         case _:
             raise ValueError(f"Unknown mode: {params.mode}")
     searcher.api.authorize()
     return searcher.process
 
 
+def create_api(
+        params: argparse.Namespace,
+        base_url: str,
+        auth_config: AuthConfig,
+        cache: ResponseCache | None = None,
+        metrics: Metrics | None = None,
+        archive: Archive | None = None,
+) -> RedditApi:
+    connection = ConnectionConfig(http2=params.http2)
+    return RedditApi(
+        base_url=base_url,
+        auth_config=auth_config,
+        cache=cache,
+        validate=params.validate,
+        metrics=metrics,
+        token_store=create_token_store(params),
+        retry=RetryPolicy(attempts=params.retries),
+        connection=connection,
+        **get_archive_options(archive, connection),
+    )
+
+
+def run_batch(
+        process: Callable[[str, int], Any], subreddits: list[str], days: int, report: Callable[[str, Any], None],
+) -> None:
+    for subreddit_name in subreddits:
+        current_subreddit.set(subreddit_name)
+        try:
+            result = process(subreddit_name, days)
+        except (RedditApiError, WorkQueueError, httpx.HTTPError) as error:
+            result = error
+        report(subreddit_name, result)
+
+
+async def run_async_batch(
+        process: Callable[[str, int], Awaitable[Any]],
+        subreddits: list[str],
+        days: int,
+        report: Callable[[str, Any], None],
+) -> None:
+    async def run(subreddit_name: str) -> None:
+        current_lane.set(subreddit_name)
+        current_subreddit.set(subreddit_name)
+        try:
+            result = await process(subreddit_name, days)
+        except (RedditApiError, httpx.HTTPError) as error:
+            result = error
+        report(subreddit_name, result)
+
+    await asyncio.gather(*(run(subreddit_name) for subreddit_name in subreddits))
+
+
+async def search_async(
+        params: argparse.Namespace,
+        config: Config,
+        report: Callable[[str, Any], None],
+        cache: ResponseCache | None = None,
+        metrics: Metrics | None = None,
+        archive: Archive | None = None,
+) -> None:
+    connection = ConnectionConfig(
+        max_connections=params.concurrency, max_keepalive_connections=params.concurrency, http2=params.http2,
+    )
+    async with AsyncRedditApi(
+            base_url=config.base_url,
+            auth_config=config.auth,
+            max_in_flight=params.concurrency,
+            cache=cache,
+            validate=params.validate,
+            metrics=metrics,
+            token_store=create_token_store(params),
+            retry=RetryPolicy(attempts=params.retries),
+            connection=connection,
+            **get_archive_options(archive, connection, asynchronous=True),
+    ) as api:
+        await api.authorize()
+        searcher = AsyncTopUsersSearcher(
+            api,
+            top=params.top,
+            clock=get_clock(archive),
+            strategy=params.comments_strategy,
+            checkpoints=CheckpointStore(params.checkpoint_dir),
+            resume=params.resume,
+        )
+        await run_async_batch(searcher.process, params.subreddits, params.days, report)
+
+
+def run_server(params: argparse.Namespace) -> str:
+    config = load_from_env()
+    token_store = TokenStore(params.token_file) if params.token_file else None
+    api = RedditApi(base_url=config.base_url, auth_config=config.auth, token_store=token_store)
+    api.authorize()
+    service = RankingService(
+        api,
+        params.subreddits,
+        params.mode or list(TopMode),
+        days=params.days,
+        interval=params.interval,
+        top=params.top,
+    )
+    serve(service, host=params.host, port=params.port)
+    return "Server stopped."
+
+
+def run_worker(params: argparse.Namespace) -> str:
+    config = load_from_env()
+    token_store = TokenStore(params.token_file) if params.token_file else None
+    api = RedditApi(base_url=config.base_url, auth_config=config.auth, token_store=token_store)
+    api.authorize()
+    queue = WorkQueue(params.queue, lease=params.lease)
+    try:
+        processed = QueueWorker(api, queue, batch_size=params.batch_size).run(wait=params.wait)
+    finally:
+        queue.close()
+    return f"Processed {processed} links."
+
+
 def main() -> str:
+    if sys.argv[1:2] == ["serve"]:
+        return run_server(get_serve_args(sys.argv[2:]))
+    if sys.argv[1:2] == ["worker"]:
+        return run_worker(get_worker_args(sys.argv[2:]))
     params = get_args()
     os.environ["ENABLE_REDDIT_PARSER_LOGGING"] = str(params.log)
-    config = load_from_env()
-    searcher = create_searcher(params, config)
-    report_filename = params.file
-    result = searcher(params.subreddit, params.days)
-    save(report_filename, result)
-    return f"Results saved to {report_filename}."
+    os.environ["REDDIT_PARSER_LOG_SAMPLE_RATE"] = str(params.log_sample_rate)
+    os.environ["REDDIT_PARSER_LOG_ERRORS_ONLY"] = str(params.log_errors_only)
+    config = REPLAY_CONFIG if params.replay else load_from_env()
+    cache = create_cache(params)
+    metrics = Metrics() if params.metrics else None
+    archive = create_archive(params)
+    report = BatchReport(params.file, batch=len(params.subreddits) > 1, output_format=params.format)
+    # Several credentials are shared by threads of the blocking client.
+    asynchronous = params.concurrency > 1 and len(config.credentials) == 1
+    if params.mode == TopMode.TOP_USERS and asynchronous and not params.incremental and not params.queue:
+        asyncio.run(search_async(params, config, report, cache, metrics, archive))
+    else:
+        run_batch(create_searcher(params, config, cache, metrics, archive), params.subreddits, params.days, report)
+    if archive:
+        archive.close()
+        report.messages.append(f"Archive {archive.directory} holds {len(archive)} responses.")
+    if metrics:
+        metrics.save(params.metrics)
+        report.messages.append(f"Metrics saved to {params.metrics}.")
+    if cache:
+        cache.close()
+        report.messages.append(f"Cache hits: {cache.hits}, misses: {cache.misses}.")
+    return "\n".join(report.messages)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,44 @@
+import heapq
+from collections import Counter
+from collections.abc import Callable, Iterable, Mapping
+from operator import itemgetter
+from typing import Any, TypedDict
+
+from reddit_parser.columns import Columns
+from reddit_parser.models import Entity
+
+
+class AuthorCount(TypedDict):
+    author: str
+    count: int
+
+
+def count_authors(entities: Iterable[Entity] | Columns) -> Counter[str]:
+    if isinstance(entities, Columns):
+        # Interned author indexes are counted, so no string is touched per row.
+        authors = entities.authors
+        return Counter({authors[index]: count for index, count in Counter(entities.author).items()})
+    return Counter(entity.author for entity in entities)
+
+
+def top_authors(counts: Mapping[str, int], top: int | None = None) -> list[AuthorCount]:
+    """
+    Returns authors with the most entities, `top` of them if it's set. Authors with equal counts
+    keep the order in which they were counted first.
+
+    """
+    return [AuthorCount(author=author, count=count) for author, count in select_top(counts.items(), itemgetter(1), top)]
+
+
+def top_rows_by_score(links: Columns, top: int | None = None) -> list[int]:
+    return select_top(range(len(links)), links.score.__getitem__, top)
+
+
+def select_top[T](items: Iterable[T], key: Callable[[T], Any], top: int | None = None) -> list[T]:
+    """
+    Stable selection of the `top` largest items. Takes O(n log top) with a heap instead of a full sort.
+
+    """
+    if top is None:
+        return sorted(items, key=key, reverse=True)
+    return heapq.nlargest(top, items, key=key)
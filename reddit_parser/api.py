@@ -1,98 +1,280 @@
-import datetime
-import json
-import logging
-import os
+import asyncio
+import threading
 import time
+from collections import Counter
+from collections.abc import AsyncGenerator, Callable, Generator, Iterable, Iterator
 from typing import Any
 
 import httpx
 from httpx import Request, Response
 
+from reddit_parser.auth import Token, TokenStore
+from reddit_parser.cache import ResponseCache
 from reddit_parser.config import AuthConfig
-from reddit_parser.models import RedditEntity, RedditEntityKinds
-from reddit_parser.utils import variable_to_boolean
+from reddit_parser.decoding import Comments, Listing, MoreChildren, decode
+from reddit_parser.metrics import Metrics
+from reddit_parser.models import Entity, RedditEntityKinds, entity_from_api
+from reddit_parser.network import ConnectionConfig, RetryPolicy, create_http_transport
+from reddit_parser.pagination import paginate
+from reddit_parser.ratelimit import TokenBucket
+from reddit_parser.response_log import create_response_logger
 
-REQUEST_INTERVAL = 60 / 90
+
+LONG_WAIT_NOTICE = 10
+INFO_BATCH_SIZE = 100
+LISTING_PAGE_SIZE = 100
+# Listings end after this many items, however they are paginated.
+MAX_LISTING_ITEMS = 1000
+MORECHILDREN_BATCH_SIZE = 100
+ENTITY_KINDS = frozenset(RedditEntityKinds)
+COMMENTS_DEPTH = 100
+# Reddit doesn't return more comments than this in one tree, the rest come as `more` stubs.
+MAX_COMMENTS_LIMIT = 500
+# Counts in listings lag behind a bit, so a few more comments than expected are asked for.
+COMMENTS_LIMIT_MARGIN = 10
+# Time filters of /top listings by the days they cover, from the narrowest. A month is counted as its shortest.
+TIME_FILTERS = (("day", 1), ("week", 7), ("month", 28), ("year", 365))
+ACCESS_TOKEN_URL = "https://www.reddit.com/api/v1/access_token"
+TOKEN_REFRESH_MARGIN = 60
+# Bodies of failed responses are cut to this many characters in error messages, gateway errors are whole HTML pages.
+ERROR_BODY_LIMIT = 500
+
+
+class RedditApiError(Exception):
+    def __init__(self, message: str, status_code: int | None = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
 
 
-class RedditApiError(Exception): pass
 class RedditAuthorizationError(RedditApiError): pass
 
 
 class Transport(httpx.BaseTransport):
-    def __init__(self) -> None:
-        self._wrapper = httpx.HTTPTransport()
-        self.time_to_wait = 0.0
-        self.last_request_timestamp = time.time() - REQUEST_INTERVAL
-        self.logger = None
-        if variable_to_boolean(os.getenv("ENABLE_REDDIT_PARSER_LOGGING")):
-            self.logger = logging.Logger("FileLogger")
-            handler = logging.FileHandler("responses.log")
-            handler.setLevel(logging.DEBUG)
-            self.logger.addHandler(handler)
-            self.logger.debug(f"\n\n{'-' * 20}\n{datetime.datetime.now()}\n")
+    """
+    Paces requests by the rate limiter and retries transient failures according to the retry policy.
+    Requests are sent with `network` transport, which is a pooled HTTP transport unless another one is provided.
+
+    """
+    def __init__(
+            self,
+            limiter: TokenBucket | None = None,
+            network: httpx.BaseTransport | None = None,
+            metrics: Metrics | None = None,
+            retry: RetryPolicy | None = None,
+            connection: ConnectionConfig | None = None,
+    ) -> None:
+        self._wrapper = network or create_http_transport(connection or ConnectionConfig())
+        self.limiter = limiter or TokenBucket()
+        self.logger = create_response_logger()
+        self.metrics = metrics
+        self.retry = retry or RetryPolicy()
+        self.retries: Counter[str] = Counter()
 
     def handle_request(self, request: Request) -> Response:
-        if self.time_to_wait > 0:
-            print(f"Waiting for {self.time_to_wait} seconds for request limits to be restored...")
-            time.sleep(self.time_to_wait)
+        attempt = 0
+        while True:
+            try:
+                response = self._send(request)
+            except httpx.TransportError as error:
+                if not self.retry.should_retry(attempt):
+                    raise
+                delay, reason = self.retry.get_delay(attempt), type(error).__name__
+            else:
+                if not self.retry.should_retry(attempt, response):
+                    return response
+                delay, reason = self.retry.get_delay(attempt, response), str(response.status_code)
+                response.close()
+            self.retries[reason] += 1
+            if self.metrics:
+                self.metrics.observe_retry(reason)
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        self._wrapper.close()
+
+    def _send(self, request: Request) -> Response:
+        if (time_to_wait := self.limiter.reserve()) > LONG_WAIT_NOTICE:
+            print(f"Waiting for {time_to_wait:.1f} seconds for request limits to be restored...")
+            time.sleep(time_to_wait)
             print("Resuming operations...\n")
-        if (allowed_time := (self.last_request_timestamp + REQUEST_INTERVAL)) > (current_time := time.time()):
-            time.sleep(allowed_time - current_time)
-        response = self._wrapper.handle_request(request)
-        self.last_request_timestamp = time.time()
-        if (remained_requests := response.headers.get("X-Ratelimit-Remaining")) is not None:
-            if float(remained_requests) < 2:
-                self.time_to_wait = float(response.headers["X-Ratelimit-Reset"])
-        if self.logger:
+        elif time_to_wait > 0:
+            time.sleep(time_to_wait)
+        if self.metrics:
+            self.metrics.observe_throttle(max(time_to_wait, 0))
+            started = time.perf_counter()
+            response = self._wrapper.handle_request(request)
             response.read()
-            self.logger.debug(
-                f"\n{'=' * 40}\n"
-                f"Request url: {request.url}\n"
-                f"Response body:\n"
-                f"{json.dumps(response.json(), indent=4)}"
-                f"\n{'=' * 40}\n"
+            self.metrics.observe_request(
+                request.url.path, response.status_code, time.perf_counter() - started, received_bytes(response),
             )
+        else:
+            response = self._wrapper.handle_request(request)
+        self.limiter.update(response.headers)
+        if self.logger and self.logger.wants(response):
+            response.read()
+            self.logger.log(request, response)
         return response
 
 
+class TokenAuth(httpx.Auth):
+    """
+    Sets the bearer token on requests. The token is requested again shortly before it expires,
+    or when a request is rejected with 401, and the request is repeated with the new one.
+
+    """
+    def __init__(
+            self, auth_config: AuthConfig, store: TokenStore | None = None, clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.auth_config = auth_config
+        self.store = store
+        self.clock = clock
+        self.token = store.load(auth_config) if store else None
+        self._lock = threading.Lock()
+        self._async_lock = asyncio.Lock()
+
+    @property
+    def expired(self) -> bool:
+        return self.token is None or self.token.expires_at - TOKEN_REFRESH_MARGIN <= self.clock()
+
+    def build_token_request(self) -> Request:
+        request = Request(
+            "POST",
+            ACCESS_TOKEN_URL,
+            data={
+                "grant_type": "password",
+                "username": self.auth_config.username,
+                "password": self.auth_config.password,
+            },
+        )
+        return next(httpx.BasicAuth(self.auth_config.app_id, self.auth_config.secret).auth_flow(request))
+
+    def update(self, response: Response) -> None:
+        if response.status_code != httpx.codes.OK:
+            raise RedditAuthorizationError(
+                f"Authorization failed. Response: {get_error_body(response)}", response.status_code,
+            )
+        data = response.json()
+        self.token = Token(access_token=data["access_token"], expires_at=self.clock() + data["expires_in"])
+        if self.store:
+            self.store.save(self.auth_config, self.token)
+
+    def sync_auth_flow(self, request: Request) -> Generator[Request, Response, None]:
+        if self.expired:
+            with self._lock:
+                if self.expired:
+                    response = yield self.build_token_request()
+                    response.read()
+                    self.update(response)
+        token = self._set_header(request)
+        response = yield request
+        if response.status_code == httpx.codes.UNAUTHORIZED:
+            with self._lock:
+                # Another request could have refreshed the token already.
+                if self.token is token:
+                    token_response = yield self.build_token_request()
+                    token_response.read()
+                    self.update(token_response)
+            self._set_header(request)
+            yield request
+
+    async def async_auth_flow(self, request: Request) -> AsyncGenerator[Request, Response]:
+        if self.expired:
+            async with self._async_lock:
+                if self.expired:
+                    response = yield self.build_token_request()
+                    await response.aread()
+                    self.update(response)
+        token = self._set_header(request)
+        response = yield request
+        if response.status_code == httpx.codes.UNAUTHORIZED:
+            async with self._async_lock:
+                if self.token is token:
+                    token_response = yield self.build_token_request()
+                    await token_response.aread()
+                    self.update(token_response)
+            self._set_header(request)
+            yield request
+
+    def _set_header(self, request: Request) -> Token:
+        # Only reached once a token was received, a failed token request raises before.
+        if (token := self.token) is None:
+            raise RedditAuthorizationError("No access token to authorize the request with.")
+        request.headers["Authorization"] = f"bearer {token.access_token}"
+        return token
+
+
+def received_bytes(response: Response) -> int:
+    # Responses which were created with the content in place, rather than streamed, report no downloaded bytes.
+    return response.num_bytes_downloaded or len(response.content)
+
+
+def get_error_body(response: Response) -> str:
+    """
+    Body of a failed response for error messages. It isn't decoded, as it may not be JSON.
+
+    """
+    return response.text[:ERROR_BODY_LIMIT]
+
+
+def build_headers(auth_config: AuthConfig) -> dict[str, str]:
+    return {
+        "User-Agent": f"linux:{auth_config.app_id}:v0.5 (by /u/{auth_config.username})",
+    }
+
+
 class RedditApi:
-    def __init__(self, base_url: str, auth_config: AuthConfig) -> None:
+    def __init__(
+            self,
+            base_url: str,
+            auth_config: AuthConfig,
+            cache: ResponseCache | None = None,
+            validate: bool = False,
+            network: httpx.BaseTransport | None = None,
+            metrics: Metrics | None = None,
+            token_store: TokenStore | None = None,
+            retry: RetryPolicy | None = None,
+            connection: ConnectionConfig | None = None,
+            limiter: TokenBucket | None = None,
+    ) -> None:
         self.auth_config = auth_config
-        headers = {
-            "User-Agent": f"linux:{self.auth_config.app_id}:v0.5 (by /u/{self.auth_config.username})",
-        }
-        self.client = httpx.Client(base_url=base_url, headers=headers, transport=Transport())
+        self.auth = TokenAuth(auth_config, token_store)
+        connection = connection or ConnectionConfig()
+        self.transport = Transport(limiter, network=network, metrics=metrics, retry=retry, connection=connection)
+        self.client = httpx.Client(
+            base_url=base_url,
+            headers=build_headers(self.auth_config),
+            transport=self.transport,
+            auth=self.auth,
+            timeout=connection.timeout,
+        )
         self.user = RedditUser(self.client)
-        self.subreddits = RedditSubreddits(self.client)
+        self.subreddits = RedditSubreddits(self.client, cache=cache, validate=validate, metrics=metrics)
 
     def authorize(self) -> None:
-        auth = httpx.BasicAuth(self.auth_config.app_id, self.auth_config.secret)
-        data = {
-            "grant_type": "password",
-            "username": self.auth_config.username,
-            "password": self.auth_config.password
-        }
-        response = self.client.post(
-            url="https://www.reddit.com/api/v1/access_token", auth=auth, data=data,
-        )
-        if response.status_code != httpx.codes.OK:
-            raise RedditAuthorizationError(f"Authorization failed. Response: {response.json()}")
-        self.client.headers["Authorization"] = f"bearer {response.json()['access_token']}"
+        """
+        Requests a token unless a valid one is stored. Expired tokens are refreshed by `TokenAuth` on their own,
+        this only allows to fail early on wrong credentials.
+
+        """
+        if not self.auth.expired:
+            return
+        response = self.client.send(self.auth.build_token_request(), auth=None)
+        self.auth.update(response)
 
 
 class RedditUser:
     def __init__(self, client: httpx.Client) -> None:
         self.client = client
 
-    def _get(self, endpoint: str, params: dict[str, Any] = None) -> dict[str, Any] | list[Any]:
+    def _get(self, endpoint: str, params: dict[str, Any] = None) -> Any:
         if not params:
             params = {}
         params["raw_json"] = 1
         response = self.client.get(url=endpoint, params=params)
         if response.status_code != httpx.codes.OK:
             raise RedditApiError(f"Response to {endpoint} failed with code {response.status_code}.\n"
-                                 f"Body: {response.json()}")
+                                 f"Body: {get_error_body(response)}", response.status_code)
         return response.json()
 
     def get_me(self) -> dict[str, Any]:
@@ -100,36 +282,69 @@ class RedditUser:
 
 
 class RedditSubreddits:
-    def __init__(self, client: httpx.Client) -> None:
+    def __init__(
+            self,
+            client: httpx.Client,
+            cache: ResponseCache | None = None,
+            validate: bool = False,
+            metrics: Metrics | None = None,
+    ) -> None:
         self.client = client
+        self.cache = cache
+        self.validate = validate
+        self.metrics = metrics
+
+    def _get(
+            self,
+            endpoint: str,
+            params: dict[str, Any] = None,
+            ttl: Callable[[Any], float] | None = None,
+            schema: Any = None,
+    ) -> Any:
+        """
+        Responses are cached only if the cache is enabled and `ttl` is provided for the endpoint.
+        With `schema` only the fields described by it are decoded when msgspec is available.
 
-    def _get(self, endpoint: str, params: dict[str, Any] = None) -> dict[str, Any] | list[Any]:
+        """
         if not params:
             params = {}
         params["raw_json"] = 1
+        cache = self.cache if ttl is not None else None
+        if cache and (cached := cache.get(endpoint, params)) is not None:
+            if self.metrics:
+                self.metrics.cache_hits += 1
+            return cached
         response = self.client.get(url=endpoint, params=params)
         if response.status_code != httpx.codes.OK:
             raise RedditApiError(f"Response to {endpoint} failed with code {response.status_code}.\n"
-                                 f"Body: {response.json()}")
-        return response.json()
+                                 f"Body: {get_error_body(response)}", response.status_code)
+        result = decode_timed(response.content, schema, self.metrics)
+        if cache and ttl:
+            cache.set(endpoint, params, result, ttl=ttl(result))
+        return result
 
-    def get_top(self, subreddit_name: str, before: str = None) -> list[RedditEntity]:
+    def get_top(
+            self, subreddit_name: str, before: str = None, after: str = None, time_filter: str = "all",
+    ) -> list[Entity]:
         params: dict[str, int | str] = {
-            "t": "all",
-            "limit": 100,
+            "t": time_filter,
+            "limit": LISTING_PAGE_SIZE,
         }
         if before:
             params["before"] = before
+        if after:
+            params["after"] = after
 
         result = self._get(
             endpoint=f"/r/{subreddit_name}/top",
             params=params,
+            schema=Listing,
         )
-        return _convert_reddit_response_to_models(result["data"]["children"])
+        return _convert_reddit_response_to_models(result["data"]["children"], self.validate, self.metrics)
 
-    def get_new(self, subreddit_name: str, before: str = None, after: str = None) -> list[RedditEntity]:
+    def get_new(self, subreddit_name: str, before: str = None, after: str = None) -> list[Entity]:
         params: dict[str, str | int] = {
-            "limit": 100,
+            "limit": LISTING_PAGE_SIZE,
         }
         if before:
             params["before"] = before
@@ -139,26 +354,198 @@ class RedditSubreddits:
         result = self._get(
             endpoint=f"/r/{subreddit_name}/new",
             params=params,
+            ttl=self.cache.get_listing_ttl if self.cache else None,
+            schema=Listing,
         )
-        return _convert_reddit_response_to_models(result["data"]["children"])
+        return _convert_reddit_response_to_models(result["data"]["children"], self.validate, self.metrics)
 
-    def get_comments(self, subreddit_name: str, article: str) -> list[RedditEntity]:
-        params: dict[str, int | str] = {"sort": "new", "depth": 100}
-        result = self._get(
+    def iter_new(self, subreddit_name: str, threshold: float, after: str = None) -> Iterator[list[Entity]]:
+        return paginate(lambda cursor: self.get_new(subreddit_name, after=cursor), threshold, after=after)
+
+    def get_subreddit_comments(self, subreddit_name: str, after: str = None) -> list[Entity]:
+        """
+        Page of the newest comments of the whole subreddit. It changes every moment, so it's never cached.
+
+        """
+        params: dict[str, str | int] = {"limit": LISTING_PAGE_SIZE}
+        if after:
+            params["after"] = after
+        result = self._get(endpoint=f"/r/{subreddit_name}/comments", params=params, schema=Listing)
+        return _convert_reddit_response_to_models(result["data"]["children"], self.validate, self.metrics)
+
+    def iter_subreddit_comments(self, subreddit_name: str, threshold: float) -> Iterator[list[Entity]]:
+        return paginate(lambda after: self.get_subreddit_comments(subreddit_name, after=after), threshold)
+
+    def get_comments(self, subreddit_name: str, article: str, expected: int | None = None) -> list[Entity]:
+        return list(self.iter_comments(subreddit_name, article, expected))
+
+    def iter_comments(self, subreddit_name: str, article: str, expected: int | None = None) -> Iterator[Entity]:
+        """
+        Yields every comment of the link: nested replies are walked and `more` stubs are resolved
+        through /api/morechildren in batches, "continue this thread" stubs through the comment permalink.
+        With `expected` count of comments the first tree is sized to fit all of them.
+
+        """
+        stubs = CommentStubs()
+        tree = self._get_comments_tree(subreddit_name, article, limit=get_comments_limit(expected))
+        yield from _convert_comment_tree(tree[1]["data"], stubs, validate=self.validate, metrics=self.metrics)
+        while stubs:
+            if children := stubs.next_children_batch():
+                result = self._get(
+                    endpoint="/api/morechildren",
+                    params={
+                        "api_type": "json",
+                        "link_id": f"t3_{article}",
+                        "children": ",".join(children),
+                        "sort": "new",
+                    },
+                    ttl=self.cache.get_comments_ttl if self.cache else None,
+                    schema=MoreChildren,
+                )
+                yield from _convert_comment_tree(
+                    result["json"]["data"], stubs, key="things", validate=self.validate, metrics=self.metrics,
+                )
+            else:
+                comment_id = stubs.continue_ids.pop()
+                result = self._get_comments_tree(subreddit_name, article, comment=comment_id)[1]
+                # The listing starts from the parent comment which has been counted already.
+                for parent in result["data"]["children"]:
+                    if replies := parent["data"].get("replies"):
+                        yield from _convert_comment_tree(
+                            replies["data"], stubs, validate=self.validate, metrics=self.metrics,
+                        )
+
+    def _get_comments_tree(
+            self, subreddit_name: str, article: str, comment: str = None, limit: int | None = None,
+    ) -> list[Any]:
+        return self._get(
             endpoint=f"/r/{subreddit_name}/comments/{article}",
-            params=params,
+            params=get_comments_tree_params(comment, limit),
+            ttl=self.cache.get_comments_ttl if self.cache else None,
+            schema=Comments,
         )
-        return _convert_reddit_response_to_models(result[1]["data"]["children"])
-
-
-def _convert_reddit_response_to_models(data: list[dict[str, Any]]) -> list[RedditEntity]:
-    return [
-        RedditEntity(
-            id=item["data"]["id"],
-            author=item["data"]["author"],
-            created=item["data"]["created"],
-            name=item["data"]["name"],
-            kind=item["kind"],
-            score=item["data"]["score"]
-        ) for item in data if item["kind"] in RedditEntityKinds
+
+    def get_comment_counts(self, fullnames: list[str]) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for start in range(0, len(fullnames), INFO_BATCH_SIZE):
+            result = self._get(
+                endpoint="/api/info",
+                params={"id": ",".join(fullnames[start:start + INFO_BATCH_SIZE])},
+                schema=Listing,
+            )
+            for item in result["data"]["children"]:
+                counts[item["data"]["name"]] = item["data"]["num_comments"]
+        return counts
+
+
+def get_time_filter(days: int) -> str | None:
+    """
+    Returns the narrowest time filter of /top listings covering `days`, or None when even a year is too short.
+
+    """
+    return next((name for name, covered in TIME_FILTERS if days <= covered), None)
+
+
+def get_comments_limit(expected: int | None) -> int | None:
+    if expected is None:
+        return None
+    return min(expected + COMMENTS_LIMIT_MARGIN, MAX_COMMENTS_LIMIT)
+
+
+def get_comments_tree_params(comment: str | None = None, limit: int | None = None) -> dict[str, int | str]:
+    params: dict[str, int | str] = {"sort": "new", "depth": COMMENTS_DEPTH}
+    if comment:
+        params["comment"] = comment
+    if limit:
+        params["limit"] = limit
+    return params
+
+
+class CommentStubs:
+    """
+    Comment ids which are referenced by `more` stubs of a comment tree and still have to be requested.
+
+    """
+    def __init__(self) -> None:
+        self.children: list[str] = []
+        self.continue_ids: list[str] = []
+        self._position = 0
+
+    def __bool__(self) -> bool:
+        return self._position < len(self.children) or bool(self.continue_ids)
+
+    def add(self, data: dict[str, Any]) -> None:
+        if data["children"]:
+            self.children.extend(data["children"])
+        elif data.get("parent_id"):
+            self.continue_ids.append(data["parent_id"].partition("_")[2])
+
+    def next_children_batch(self) -> list[str]:
+        batch = self.children[self._position:self._position + MORECHILDREN_BATCH_SIZE]
+        self._position += len(batch)
+        if self._position == len(self.children):
+            self.children.clear()
+            self._position = 0
+        return batch
+
+
+def _walk_comment_tree(
+        listing: dict[str, Any], stubs: CommentStubs, key: str = "children", validate: bool = False,
+) -> Iterator[Entity]:
+    """
+    Flattens a comment listing without recursion: only iterators over the current branch are kept.
+
+    """
+    stack = [iter(listing[key])]
+    while stack:
+        item = next(stack[-1], None)
+        if item is None:
+            stack.pop()
+            continue
+        if item["kind"] == "more":
+            stubs.add(item["data"])
+        elif item["kind"] == RedditEntityKinds.comment:
+            yield entity_from_api(item["kind"], item["data"], validate)
+            if replies := item["data"].get("replies"):
+                stack.append(iter(replies["data"]["children"]))
+
+
+def _convert_comment_tree(
+        listing: dict[str, Any],
+        stubs: CommentStubs,
+        key: str = "children",
+        validate: bool = False,
+        metrics: Metrics | None = None,
+) -> Iterable[Entity]:
+    """
+    Comments of the listing, see `_walk_comment_tree`. With metrics the walk is timed as conversion,
+    so the listing is converted at once instead of lazily.
+
+    """
+    if not metrics:
+        return _walk_comment_tree(listing, stubs, key, validate)
+    started = time.perf_counter()
+    comments = list(_walk_comment_tree(listing, stubs, key, validate))
+    metrics.observe_phase("convert", time.perf_counter() - started)
+    return comments
+
+
+def decode_timed(content: bytes, schema: Any, metrics: Metrics | None) -> Any:
+    if not metrics:
+        return decode(content, schema)
+    started = time.perf_counter()
+    result = decode(content, schema)
+    metrics.observe_phase("decode", time.perf_counter() - started)
+    return result
+
+
+def _convert_reddit_response_to_models(
+        data: list[dict[str, Any]], validate: bool = False, metrics: Metrics | None = None,
+) -> list[Entity]:
+    started = time.perf_counter() if metrics else 0.0
+    entities = [
+        entity_from_api(item["kind"], item["data"], validate) for item in data if item["kind"] in ENTITY_KINDS
     ]
+    if metrics:
+        metrics.observe_phase("convert", time.perf_counter() - started)
+    return entities
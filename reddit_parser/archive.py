@@ -0,0 +1,188 @@
+"""
+Record/replay archive of API responses.
+
+An archive is a directory with an append-only file of zlib-compressed response bodies and a JSON lines
+index which maps requests, by method, path and query, to the offsets of their bodies. RecordingTransport
+stores every successful response it passes through, ReplayTransport serves requests from the archive
+without network. The time every subreddit was crawled at is kept with the archive, so a replayed crawl
+covers the same window as the recorded one.
+
+"""
+import json
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from urllib.parse import urlencode
+
+import httpx
+
+from reddit_parser.metrics import endpoint_name
+
+DATA_FILE = "responses.zlib"
+INDEX_FILE = "index.jsonl"
+META_FILE = "meta.json"
+ACCESS_TOKEN_PATH = "/api/v1/access_token"
+
+# Subreddit which is being crawled, set by the batch runners for the archive clock.
+current_subreddit: ContextVar[str] = ContextVar("current_subreddit", default="")
+
+
+@dataclass(slots=True)
+class ArchiveEntry:
+    offset: int
+    size: int
+    status_code: int
+    content_type: str
+
+
+class Archive:
+    """
+    `recorded_at` is the time the recording started and `started` the times crawls of subreddits started at,
+    see `start`. Sessions of a pool record and replay from worker threads, so the data file is only used
+    under a lock.
+
+    """
+    def __init__(self, directory: str, writable: bool = False, clock: Callable[[], float] = time.time) -> None:
+        self.directory = directory
+        self.writable = writable
+        self.clock = clock
+        self.index: dict[str, ArchiveEntry] = {}
+        self._meta_path = os.path.join(directory, META_FILE)
+        if writable and not os.path.exists(self._meta_path):
+            os.makedirs(directory, exist_ok=True)
+            with open(self._meta_path, "w") as file:
+                json.dump({"recorded_at": clock()}, file)
+        with open(self._meta_path) as file:
+            meta = json.load(file)
+        self.recorded_at: float = meta["recorded_at"]
+        self.started: dict[str, float] = meta.get("started", {})
+        index_path = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(index_path) or not writable:
+            with open(index_path) as file:
+                for line in file:
+                    record = json.loads(line)
+                    key = record.pop("key")
+                    self.index[key] = ArchiveEntry(**record)
+        self._data = open(os.path.join(directory, DATA_FILE), "ab+" if writable else "rb")
+        self._index_file = open(index_path, "a") if writable else None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __enter__(self) -> "Archive":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def append(self, key: str, status_code: int, content_type: str, content: bytes) -> None:
+        if self._index_file is None:
+            raise ValueError(f"Archive {self.directory} is opened read-only, open it with writable=True to record.")
+        compressed = zlib.compress(content)
+        with self._lock:
+            self._data.seek(0, os.SEEK_END)
+            entry = ArchiveEntry(self._data.tell(), len(compressed), status_code, content_type)
+            self._data.write(compressed)
+            self._data.flush()
+            self._index_file.write(json.dumps({"key": key, **asdict(entry)}) + "\n")
+            self._index_file.flush()
+            self.index[key] = entry
+
+    def start(self, subreddit_name: str) -> float:
+        """
+        Time a crawl of the subreddit counts its window back from. A recording stores the current time,
+        a replay returns the stored one, or `recorded_at` for subreddits without it.
+
+        """
+        name = subreddit_name.lower()
+        if not self.writable:
+            return self.started.get(name, self.recorded_at)
+        with self._lock:
+            self.started[name] = self.clock()
+            with open(f"{self._meta_path}.tmp", "w") as file:
+                json.dump({"recorded_at": self.recorded_at, "started": self.started}, file)
+            os.replace(f"{self._meta_path}.tmp", self._meta_path)
+        return self.started[name]
+
+    def get(self, key: str) -> tuple[ArchiveEntry, bytes] | None:
+        if (entry := self.index.get(key)) is None:
+            return None
+        with self._lock:
+            self._data.seek(entry.offset)
+            compressed = self._data.read(entry.size)
+        return entry, zlib.decompress(compressed)
+
+    def close(self) -> None:
+        self._data.close()
+        if self._index_file:
+            self._index_file.close()
+
+
+def request_key(request: httpx.Request) -> str:
+    return f"{request.method} {request.url.path}?{urlencode(sorted(request.url.params.multi_items()))}"
+
+
+class RecordingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Passes requests to `network` and appends successful responses to the archive.
+    Authorization requests are not recorded, so tokens never end up in the archive.
+
+    """
+    def __init__(self, archive: Archive, network: httpx.BaseTransport | httpx.AsyncBaseTransport) -> None:
+        self.archive = archive
+        self.network = network
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response = self.network.handle_request(request)  # type: ignore[union-attr]
+        response.read()
+        self._record(request, response)
+        return response
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.network.handle_async_request(request)  # type: ignore[union-attr]
+        await response.aread()
+        self._record(request, response)
+        return response
+
+    def close(self) -> None:
+        self.network.close()  # type: ignore[union-attr]
+
+    async def aclose(self) -> None:
+        await self.network.aclose()  # type: ignore[union-attr]
+
+    def _record(self, request: httpx.Request, response: httpx.Response) -> None:
+        if response.is_success and request.url.path != ACCESS_TOKEN_PATH:
+            content_type = response.headers.get("Content-Type", "application/json")
+            self.archive.append(request_key(request), response.status_code, content_type, response.content)
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Serves requests from the archive. Requests which were not recorded get 404.
+
+    """
+    def __init__(self, archive: Archive) -> None:
+        self.archive = archive
+        self.requests: Counter[str] = Counter()
+        self.bytes_sent = 0
+        self.misses = 0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == ACCESS_TOKEN_PATH:
+            return httpx.Response(200, json={"access_token": "replay", "token_type": "bearer", "expires_in": 86400})
+        self.requests[endpoint_name(request.url.path)] += 1
+        if (found := self.archive.get(request_key(request))) is None:
+            self.misses += 1
+            return httpx.Response(404, json={"message": "Not found in the archive", "error": 404})
+        entry, content = found
+        self.bytes_sent += len(content)
+        return httpx.Response(entry.status_code, content=content, headers={"Content-Type": entry.content_type})
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return self.handle_request(request)
@@ -0,0 +1,284 @@
+import asyncio
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Callable
+from typing import Any
+
+import httpx
+from httpx import Request, Response
+
+from reddit_parser.api import (
+    LISTING_PAGE_SIZE, RedditApiError, CommentStubs, TokenAuth, build_headers, decode_timed, get_comments_limit,
+    get_comments_tree_params, get_error_body, received_bytes, _convert_comment_tree, _convert_reddit_response_to_models,
+)
+from reddit_parser.auth import TokenStore
+from reddit_parser.cache import ResponseCache
+from reddit_parser.config import AuthConfig
+from reddit_parser.decoding import Comments, Listing, MoreChildren
+from reddit_parser.metrics import Metrics
+from reddit_parser.models import Entity
+from reddit_parser.network import ConnectionConfig, RetryPolicy, create_async_http_transport
+from reddit_parser.pagination import apaginate
+from reddit_parser.ratelimit import AsyncRequestLimiter, TokenBucket
+from reddit_parser.response_log import create_response_logger
+
+
+class AsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(
+            self,
+            limiter: AsyncRequestLimiter,
+            network: httpx.AsyncBaseTransport | None = None,
+            metrics: Metrics | None = None,
+            retry: RetryPolicy | None = None,
+            connection: ConnectionConfig | None = None,
+    ) -> None:
+        self._wrapper = network or create_async_http_transport(connection or ConnectionConfig())
+        self.limiter = limiter
+        self.logger = create_response_logger()
+        self.metrics = metrics
+        self.retry = retry or RetryPolicy()
+        self.retries: Counter[str] = Counter()
+
+    async def handle_async_request(self, request: Request) -> Response:
+        attempt = 0
+        while True:
+            try:
+                response = await self._send(request)
+            except httpx.TransportError as error:
+                if not self.retry.should_retry(attempt):
+                    raise
+                delay, reason = self.retry.get_delay(attempt), type(error).__name__
+            else:
+                if not self.retry.should_retry(attempt, response):
+                    return response
+                delay, reason = self.retry.get_delay(attempt, response), str(response.status_code)
+                await response.aclose()
+            self.retries[reason] += 1
+            if self.metrics:
+                self.metrics.observe_retry(reason)
+            # The request slot is released while waiting, so other requests are not held up by the backoff.
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _send(self, request: Request) -> Response:
+        if self.metrics:
+            return await self._handle_measured(request, self.metrics)
+        async with self.limiter:
+            response = await self._wrapper.handle_async_request(request)
+            self.limiter.update(response.headers)
+        if self.logger and self.logger.wants(response):
+            await response.aread()
+            self.logger.log(request, response)
+        return response
+
+    async def _handle_measured(self, request: Request, metrics: Metrics) -> Response:
+        # Only pacing by the bucket counts as throttling, as in the blocking transport. Waits for a free slot
+        # overlap between requests and are bounded by `max_in_flight` rather than by Reddit limits.
+        metrics.observe_throttle(await self.limiter.acquire())
+        try:
+            started = time.perf_counter()
+            response = await self._wrapper.handle_async_request(request)
+            await response.aread()
+            self.limiter.update(response.headers)
+        finally:
+            self.limiter.release()
+        metrics.observe_request(
+            request.url.path, response.status_code, time.perf_counter() - started, received_bytes(response),
+        )
+        if self.logger and self.logger.wants(response):
+            self.logger.log(request, response)
+        return response
+
+    async def aclose(self) -> None:
+        await self._wrapper.aclose()
+
+
+class AsyncRedditApi:
+    def __init__(
+            self,
+            base_url: str,
+            auth_config: AuthConfig,
+            max_in_flight: int = 8,
+            cache: ResponseCache | None = None,
+            validate: bool = False,
+            network: httpx.AsyncBaseTransport | None = None,
+            metrics: Metrics | None = None,
+            token_store: TokenStore | None = None,
+            retry: RetryPolicy | None = None,
+            connection: ConnectionConfig | None = None,
+            limiter: TokenBucket | None = None,
+    ) -> None:
+        self.auth_config = auth_config
+        self.auth = TokenAuth(auth_config, token_store)
+        self.limiter = AsyncRequestLimiter(limiter, max_in_flight=max_in_flight)
+        connection = connection or ConnectionConfig(
+            max_connections=max_in_flight, max_keepalive_connections=max_in_flight,
+        )
+        self.transport = AsyncTransport(
+            self.limiter, network=network, metrics=metrics, retry=retry, connection=connection,
+        )
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=build_headers(self.auth_config),
+            transport=self.transport,
+            auth=self.auth,
+            timeout=connection.timeout,
+        )
+        self.user = AsyncRedditUser(self.client)
+        self.subreddits = AsyncRedditSubreddits(self.client, cache=cache, validate=validate, metrics=metrics)
+
+    async def __aenter__(self) -> "AsyncRedditApi":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def authorize(self) -> None:
+        if not self.auth.expired:
+            return
+        response = await self.client.send(self.auth.build_token_request(), auth=None)
+        self.auth.update(response)
+
+
+async def _get(
+        client: httpx.AsyncClient,
+        endpoint: str,
+        params: dict[str, Any] = None,
+        cache: ResponseCache | None = None,
+        ttl: Callable[[Any], float] | None = None,
+        schema: Any = None,
+        metrics: Metrics | None = None,
+) -> Any:
+    if not params:
+        params = {}
+    params["raw_json"] = 1
+    if ttl is None:
+        cache = None
+    if cache and (cached := cache.get(endpoint, params)) is not None:
+        if metrics:
+            metrics.cache_hits += 1
+        return cached
+    response = await client.get(url=endpoint, params=params)
+    if response.status_code != httpx.codes.OK:
+        raise RedditApiError(f"Response to {endpoint} failed with code {response.status_code}.\n"
+                             f"Body: {get_error_body(response)}", response.status_code)
+    result = decode_timed(response.content, schema, metrics)
+    if cache and ttl:
+        cache.set(endpoint, params, result, ttl=ttl(result))
+    return result
+
+
+class AsyncRedditUser:
+    def __init__(self, client: httpx.AsyncClient) -> None:
+        self.client = client
+
+    async def get_me(self) -> dict[str, Any]:
+        return await _get(self.client, endpoint="/api/v1/me")
+
+
+class AsyncRedditSubreddits:
+    def __init__(
+            self,
+            client: httpx.AsyncClient,
+            cache: ResponseCache | None = None,
+            validate: bool = False,
+            metrics: Metrics | None = None,
+    ) -> None:
+        self.client = client
+        self.cache = cache
+        self.validate = validate
+        self.metrics = metrics
+
+    async def get_top(
+            self, subreddit_name: str, before: str = None, after: str = None, time_filter: str = "all",
+    ) -> list[Entity]:
+        params: dict[str, int | str] = {
+            "t": time_filter,
+            "limit": LISTING_PAGE_SIZE,
+        }
+        if before:
+            params["before"] = before
+        if after:
+            params["after"] = after
+
+        result = await _get(
+            self.client, endpoint=f"/r/{subreddit_name}/top", params=params, schema=Listing, metrics=self.metrics,
+        )
+        return _convert_reddit_response_to_models(result["data"]["children"], self.validate, self.metrics)
+
+    async def get_new(self, subreddit_name: str, before: str = None, after: str = None) -> list[Entity]:
+        params: dict[str, str | int] = {
+            "limit": LISTING_PAGE_SIZE,
+        }
+        if before:
+            params["before"] = before
+        if after:
+            params["after"] = after
+
+        result = await _get(
+            self.client, endpoint=f"/r/{subreddit_name}/new", params=params,
+            cache=self.cache, ttl=self.cache.get_listing_ttl if self.cache else None, schema=Listing,
+            metrics=self.metrics,
+        )
+        return _convert_reddit_response_to_models(result["data"]["children"], self.validate, self.metrics)
+
+    def iter_new(
+            self, subreddit_name: str, threshold: float, after: str = None,
+    ) -> AsyncIterator[list[Entity]]:
+        return apaginate(lambda cursor: self.get_new(subreddit_name, after=cursor), threshold, after=after)
+
+    async def get_subreddit_comments(self, subreddit_name: str, after: str = None) -> list[Entity]:
+        params: dict[str, str | int] = {"limit": LISTING_PAGE_SIZE}
+        if after:
+            params["after"] = after
+        result = await _get(
+            self.client, endpoint=f"/r/{subreddit_name}/comments", params=params, schema=Listing, metrics=self.metrics,
+        )
+        return _convert_reddit_response_to_models(result["data"]["children"], self.validate, self.metrics)
+
+    def iter_subreddit_comments(self, subreddit_name: str, threshold: float) -> AsyncIterator[list[Entity]]:
+        return apaginate(lambda after: self.get_subreddit_comments(subreddit_name, after=after), threshold)
+
+    async def get_comments(
+            self, subreddit_name: str, article: str, expected: int | None = None,
+    ) -> list[Entity]:
+        stubs = CommentStubs()
+        tree = await self._get_comments_tree(subreddit_name, article, limit=get_comments_limit(expected))
+        comments = list(_convert_comment_tree(tree[1]["data"], stubs, validate=self.validate, metrics=self.metrics))
+        while stubs:
+            if children := stubs.next_children_batch():
+                result = await _get(
+                    self.client, endpoint="/api/morechildren",
+                    params={
+                        "api_type": "json",
+                        "link_id": f"t3_{article}",
+                        "children": ",".join(children),
+                        "sort": "new",
+                    },
+                    cache=self.cache, ttl=self.cache.get_comments_ttl if self.cache else None,
+                    schema=MoreChildren, metrics=self.metrics,
+                )
+                comments.extend(_convert_comment_tree(
+                    result["json"]["data"], stubs, key="things", validate=self.validate, metrics=self.metrics,
+                ))
+            else:
+                tree = await self._get_comments_tree(subreddit_name, article, comment=stubs.continue_ids.pop())
+                for parent in tree[1]["data"]["children"]:
+                    if replies := parent["data"].get("replies"):
+                        comments.extend(
+                            _convert_comment_tree(replies["data"], stubs, validate=self.validate, metrics=self.metrics)
+                        )
+        return comments
+
+    async def _get_comments_tree(
+            self, subreddit_name: str, article: str, comment: str = None, limit: int | None = None,
+    ) -> list[Any]:
+        return await _get(
+            self.client, endpoint=f"/r/{subreddit_name}/comments/{article}",
+            params=get_comments_tree_params(comment, limit),
+            cache=self.cache, ttl=self.cache.get_comments_ttl if self.cache else None, schema=Comments,
+            metrics=self.metrics,
+        )
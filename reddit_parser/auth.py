@@ -0,0 +1,51 @@
+import json
+import os
+from dataclasses import dataclass, asdict
+
+from reddit_parser.config import AuthConfig
+
+DEFAULT_TOKEN_FILE = ".reddit_parser_token.json"
+TOKEN_FILE_MODE = 0o600
+
+
+@dataclass
+class Token:
+    access_token: str
+    expires_at: float
+
+
+class TokenStore:
+    """
+    Keeps bearer tokens between runs in a JSON file which only the owner can read, one per app and user.
+
+    """
+    def __init__(self, path: str = DEFAULT_TOKEN_FILE) -> None:
+        self.path = path
+
+    def load(self, auth_config: AuthConfig) -> Token | None:
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if token := data.get(token_key(auth_config)):
+            return Token(**token)
+        return None
+
+    def save(self, auth_config: AuthConfig, token: Token) -> None:
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        data[token_key(auth_config)] = asdict(token)
+        if directory := os.path.dirname(self.path):
+            os.makedirs(directory, exist_ok=True)
+        descriptor = os.open(f"{self.path}.tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, TOKEN_FILE_MODE)
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(data, file)
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+def token_key(auth_config: AuthConfig) -> str:
+    return f"{auth_config.app_id}:{auth_config.username}"
@@ -0,0 +1,114 @@
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+DEFAULT_TTL = 60 * 60
+DEFAULT_LISTING_TTL = 5 * 60
+DEFAULT_MAX_TTL = 7 * 24 * 60 * 60
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class ResponseCache:
+    """
+    On-disk cache of decoded Reddit API responses, keyed by endpoint and request parameters.
+
+    Comment trees of older links change rarely, so their TTL grows with the age of the link:
+    `ttl + age * age_ttl_factor`, but never longer than `max_ttl`. Listings are cached for
+    `listing_ttl` only. When the total size of stored bodies exceeds `max_bytes` the least
+    recently used entries are evicted.
+
+    """
+    def __init__(
+            self,
+            path: str,
+            ttl: float = DEFAULT_TTL,
+            listing_ttl: float = DEFAULT_LISTING_TTL,
+            age_ttl_factor: float = 0.25,
+            max_ttl: float = DEFAULT_MAX_TTL,
+            max_bytes: int = DEFAULT_MAX_BYTES,
+            clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl = ttl
+        self.listing_ttl = listing_ttl
+        self.age_ttl_factor = age_ttl_factor
+        self.max_ttl = max_ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, endpoint: str, params: dict[str, Any]) -> Any:
+        key = make_key(endpoint, params)
+        now = self._clock()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, endpoint: str, params: dict[str, Any], data: Any, ttl: float | None = None) -> None:
+        key = make_key(endpoint, params)
+        body = json.dumps(data, separators=(",", ":")).encode()
+        now = self._clock()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            old_size = self._connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, body, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, body, len(body), expires_at, now),
+            )
+            self._size += len(body) - (old_size[0] if old_size else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def ttl_for_age(self, age: float) -> float:
+        return min(self.ttl + max(age, 0.0) * self.age_ttl_factor, self.max_ttl)
+
+    def get_listing_ttl(self, result: Any) -> float:
+        return self.listing_ttl
+
+    def get_comments_ttl(self, result: Any) -> float:
+        try:
+            created = result[0]["data"]["children"][0]["data"]["created"]
+        except (LookupError, TypeError):
+            return self.ttl
+        return self.ttl_for_age(self._clock() - created)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _evict(self) -> None:
+        self._connection.execute("DELETE FROM responses WHERE expires_at <= ?", (self._clock(),))
+        self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if self._size <= self.max_bytes:
+            return
+        cursor = self._connection.execute("SELECT key, size FROM responses ORDER BY accessed_at")
+        evicted = []
+        for key, size in cursor:
+            evicted.append((key,))
+            self._size -= size
+            if self._size <= self.max_bytes:
+                break
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+
+def make_key(endpoint: str, params: dict[str, Any]) -> str:
+    return f"{endpoint}?{json.dumps(params, sort_keys=True, separators=(',', ':'))}"
@@ -0,0 +1,115 @@
+"""
+Checkpoints of top_users runs, so an interrupted run continues where it stopped instead of starting over.
+
+A checkpoint holds the window of the run, the links listed so far with the cursor of the listing, and
+the comment authors counted on the first links with comments. It's written at most once per `interval`
+seconds while the run goes on, and once more when the run fails. Blocking and asyncio searchers write
+the same checkpoints, so a run can be resumed by either of them. Links are stored as their columns with
+the string tables, so a checkpoint of a hundred thousand links is written in under half a second. The file
+is written next to the previous checkpoint and then replaces it, so a run killed while writing leaves the
+previous checkpoint intact.
+
+"""
+import json
+import os
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from reddit_parser.columns import COLUMNS, EntityColumns
+from reddit_parser.models import RedditEntityKinds
+
+DEFAULT_CHECKPOINT_DIR = ".reddit_parser_checkpoints"
+CHECKPOINT_INTERVAL = 30
+
+
+@dataclass
+class Checkpoint:
+    """
+    `processed` is the count of links with comments, in the order of the listing, whose comment
+    authors are in `comments_authors`.
+
+    """
+    subreddit: str
+    days: int
+    mode: str
+    threshold: float
+    links: EntityColumns = field(default_factory=lambda: EntityColumns(RedditEntityKinds.link))
+    after: str | None = None
+    listed: bool = False
+    processed: int = 0
+    comments_authors: Counter[str] = field(default_factory=Counter)
+
+
+class CheckpointStore:
+    def __init__(
+            self,
+            directory: str = DEFAULT_CHECKPOINT_DIR,
+            interval: float = CHECKPOINT_INTERVAL,
+            clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.directory = directory
+        self.interval = interval
+        self.clock = clock
+        # Subreddits of an asyncio batch are saved on their own schedules.
+        self._saved_at: dict[str, float] = {}
+
+    def load(self, subreddit_name: str, days: int, mode: str) -> Checkpoint | None:
+        try:
+            with open(self._path(subreddit_name, days, mode)) as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return None
+        links = EntityColumns(RedditEntityKinds.link)
+        for name in data.pop("names"):
+            links.names.intern(name)
+        for author in data.pop("authors"):
+            links.authors.intern(author)
+        for column, values in data.pop("links").items():
+            getattr(links, column).extend(values)
+        comments_authors = Counter(dict(data.pop("comments_authors")))
+        return Checkpoint(links=links, comments_authors=comments_authors, **data)
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(checkpoint.subreddit, checkpoint.days, checkpoint.mode)
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(self._dump(checkpoint), file, separators=(",", ":"))
+        os.replace(f"{path}.tmp", path)
+        self._saved_at[path] = self.clock()
+
+    def save_due(self, checkpoint: Checkpoint) -> bool:
+        now = self.clock()
+        saved_at = self._saved_at.setdefault(self._path(checkpoint.subreddit, checkpoint.days, checkpoint.mode), now)
+        if now - saved_at < self.interval:
+            return False
+        self.save(checkpoint)
+        return True
+
+    def delete(self, checkpoint: Checkpoint) -> None:
+        try:
+            os.remove(self._path(checkpoint.subreddit, checkpoint.days, checkpoint.mode))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _dump(checkpoint: Checkpoint) -> dict[str, Any]:
+        links = checkpoint.links
+        return {
+            "subreddit": checkpoint.subreddit,
+            "days": checkpoint.days,
+            "mode": checkpoint.mode,
+            "threshold": checkpoint.threshold,
+            "after": checkpoint.after,
+            "listed": checkpoint.listed,
+            "processed": checkpoint.processed,
+            "comments_authors": list(checkpoint.comments_authors.items()),
+            "names": links.names.strings,
+            "authors": links.authors.strings,
+            "links": {column: getattr(links, column).tolist() for column in COLUMNS},
+        }
+
+    def _path(self, subreddit_name: str, days: int, mode: str) -> str:
+        return os.path.join(self.directory, f"{subreddit_name.lower()}_{days}_{mode}.json")
@@ -0,0 +1,126 @@
+"""
+Columnar storage of links and comments.
+
+Searchers over long windows hold hundreds of thousands of entities. Kept as models, every one of them is
+an object with its own dict and strings. Here numeric fields are kept in typed arrays, and authors and
+fullnames are interned into string tables which columns can share, so an entity takes a few dozen bytes.
+
+"""
+from array import array
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from reddit_parser.models import Entity, entity_from_api
+
+# Stored in place of missing comment counts, edit times and links.
+MISSING = -1
+COLUMNS = ("name", "author", "created", "score", "num_comments", "edited", "link")
+
+
+class StringTable:
+    __slots__ = ("strings", "_indexes")
+
+    def __init__(self) -> None:
+        self.strings: list[str] = []
+        self._indexes: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def __getitem__(self, index: int) -> str:
+        return self.strings[index]
+
+    def __contains__(self, value: object) -> bool:
+        return value in self._indexes
+
+    def intern(self, value: str) -> int:
+        if (index := self._indexes.get(value)) is None:
+            index = self._indexes[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+
+class Columns:
+    """
+    Read access to columns. Rows are addressed by their index.
+
+    """
+    kind: str
+    authors: StringTable
+    names: StringTable
+    name: Any
+    author: Any
+    created: Any
+    score: Any
+    num_comments: Any
+    edited: Any
+    link: Any
+
+    def __len__(self) -> int:
+        return len(self.name)
+
+    def __iter__(self) -> Iterator[Entity]:
+        return map(self.entity, range(len(self)))
+
+    def get_name(self, index: int) -> str:
+        return self.names[self.name[index]]
+
+    def get_id(self, index: int) -> str:
+        return self.get_name(index).partition("_")[2]
+
+    def get_author(self, index: int) -> str:
+        return self.authors[self.author[index]]
+
+    def get_num_comments(self, index: int) -> int | None:
+        return None if (value := self.num_comments[index]) == MISSING else value
+
+    def dump(self, index: int) -> dict[str, Any]:
+        """
+        Same dict as model_dump() of the entity of the row.
+
+        """
+        edited = self.edited[index]
+        link = self.link[index]
+        return {
+            "id": self.get_id(index), "created": self.created[index], "name": self.get_name(index),
+            "author": self.get_author(index), "score": self.score[index], "kind": self.kind,
+            "num_comments": self.get_num_comments(index), "edited": None if edited == MISSING else edited,
+            "link_id": None if link == MISSING else self.names[link],
+        }
+
+    def entity(self, index: int) -> Entity:
+        return entity_from_api(self.kind, self.dump(index))
+
+
+class EntityColumns(Columns):
+    """
+    Entities of one kind. Pass tables of other columns to share interned strings with them.
+
+    """
+    def __init__(self, kind: str, authors: StringTable | None = None, names: StringTable | None = None) -> None:
+        self.kind = kind
+        self.authors = StringTable() if authors is None else authors
+        self.names = StringTable() if names is None else names
+        self.name = array("i")
+        self.author = array("i")
+        self.created = array("d")
+        self.score = array("i")
+        self.num_comments = array("i")
+        self.edited = array("d")
+        self.link = array("i")
+
+    def append(self, entity: Entity) -> None:
+        if entity.kind != self.kind:
+            raise ValueError(f"Expected entities of kind {self.kind}, got {entity.kind}.")
+        self.name.append(self.names.intern(entity.name))
+        self.author.append(self.authors.intern(entity.author))
+        self.created.append(entity.created)
+        self.score.append(entity.score)
+        self.num_comments.append(MISSING if entity.num_comments is None else entity.num_comments)
+        self.edited.append(MISSING if entity.edited is None else entity.edited)
+        self.link.append(MISSING if entity.link_id is None else self.names.intern(entity.link_id))
+
+    def extend(self, entities: Iterable[Entity]) -> None:
+        for entity in entities:
+            self.append(entity)
+
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import os
 
 
@@ -15,16 +15,35 @@ class AuthConfig:
 class Config:
     base_url: str
     auth: AuthConfig
+    # Further OAuth apps, each with its own rate limit, which share the crawl with `auth`.
+    extra_auth: list[AuthConfig] = field(default_factory=list)
+
+    @property
+    def credentials(self) -> list[AuthConfig]:
+        return [self.auth, *self.extra_auth]
 
 
 def load_from_env():
+    """
+    Credentials of further apps are read from the same variables suffixed with _2, _3 and so on.
+    REDDIT_AUTH_URL is shared by all of them.
+
+    """
     return Config(
         base_url=os.environ["REDDIT_BASE_URL"],
-        auth=AuthConfig(
-            app_id=os.environ["REDDIT_PARSER_APP_ID"],
-            secret=os.environ["REDDIT_PARSER_APP_SECRET"],
-            username=os.environ["REDDIT_USER"],
-            password=os.environ["REDDIT_PASSWORD"],
-            auth_url=os.environ["REDDIT_AUTH_URL"],
-        )
+        auth=load_auth_from_env(),
+        extra_auth=[
+            load_auth_from_env(f"_{number}")
+            for number in range(2, 100) if f"REDDIT_PARSER_APP_ID_{number}" in os.environ
+        ],
+    )
+
+
+def load_auth_from_env(suffix: str = "") -> AuthConfig:
+    return AuthConfig(
+        app_id=os.environ[f"REDDIT_PARSER_APP_ID{suffix}"],
+        secret=os.environ[f"REDDIT_PARSER_APP_SECRET{suffix}"],
+        username=os.environ[f"REDDIT_USER{suffix}"],
+        password=os.environ[f"REDDIT_PASSWORD{suffix}"],
+        auth_url=os.environ["REDDIT_AUTH_URL"],
     )
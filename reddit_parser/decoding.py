@@ -0,0 +1,73 @@
+"""
+Decoding of Reddit responses straight from bytes.
+
+When msgspec is installed, responses are decoded against the schemas below: only the fields the parser
+uses are materialized and everything else Reddit sends is skipped while parsing. Without msgspec, or for
+responses which don't match the schema, the stdlib json module is used.
+
+"""
+import json
+from typing import Any, NotRequired, TypedDict
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover
+    msgspec = None  # type: ignore[assignment]
+
+
+class ThingData(TypedDict, total=False):
+    id: str
+    name: str
+    author: str
+    created: float
+    score: int
+    num_comments: int
+    edited: bool | float
+    link_id: str
+    replies: "str | Listing"
+    children: list[str]
+    parent_id: str
+    count: int
+
+
+class Thing(TypedDict):
+    kind: str
+    data: ThingData
+
+
+class ListingData(TypedDict):
+    children: list[Thing]
+    after: NotRequired[str | None]
+
+
+class Listing(TypedDict):
+    kind: str
+    data: ListingData
+
+
+class MoreChildrenData(TypedDict):
+    things: list[Thing]
+
+
+class MoreChildrenJson(TypedDict):
+    data: MoreChildrenData
+
+
+class MoreChildren(TypedDict):
+    json: MoreChildrenJson
+
+
+Comments = list[Listing]
+
+_decoders: dict[Any, Any] = {}
+
+
+def decode(content: bytes, schema: Any = None) -> Any:
+    if msgspec is None or schema is None:
+        return json.loads(content)
+    if (decoder := _decoders.get(schema)) is None:
+        decoder = _decoders[schema] = msgspec.json.Decoder(schema)
+    try:
+        return decoder.decode(content)
+    except msgspec.ValidationError:
+        return json.loads(content)
@@ -0,0 +1,121 @@
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field, asdict
+from datetime import timedelta
+
+from reddit_parser.api import RedditApi
+from reddit_parser.models import Entity
+from reddit_parser.aggregation import AuthorCount, count_authors, top_authors
+
+DEFAULT_STATE_DIR = ".reddit_parser_state"
+
+
+@dataclass
+class LinkAggregate:
+    name: str
+    author: str
+    created: float
+    num_comments: int = -1
+    comment_authors: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class SubredditState:
+    subreddit: str
+    newest_name: str | None = None
+    newest_created: float = 0.0
+    links: dict[str, LinkAggregate] = field(default_factory=dict)
+    # Start of the window the links cover, None for states saved before it was stored.
+    threshold: float | None = None
+
+
+class StateStore:
+    def __init__(self, directory: str = DEFAULT_STATE_DIR) -> None:
+        self.directory = directory
+
+    def load(self, subreddit_name: str) -> SubredditState:
+        try:
+            with open(self._path(subreddit_name)) as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return SubredditState(subreddit=subreddit_name)
+        links = {link_id: LinkAggregate(**link) for link_id, link in data.pop("links").items()}
+        return SubredditState(links=links, **data)
+
+    def save(self, state: SubredditState) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(state.subreddit)
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(asdict(state), file)
+        os.replace(f"{path}.tmp", path)
+
+    def _path(self, subreddit_name: str) -> str:
+        return os.path.join(self.directory, f"{subreddit_name.lower()}.json")
+
+
+class IncrementalTopUsersSearcher:
+    """
+    TopUsersSearcher which keeps per-link author counts between runs.
+
+    Only links newer than the stored watermark are listed, comment trees are requested again
+    only for links whose comment count has changed, and links which left the window are dropped.
+    When the window is wider than the one of the stored state, it's listed down to its threshold.
+
+    """
+    def __init__(self, api: RedditApi, store: StateStore, top: int | None = None) -> None:
+        self.api = api
+        self.store = store
+        self.top = top
+
+    def process(self, subreddit_name: str, days: int = 3) -> dict[str, list[AuthorCount]]:
+        threshold = time.time() - timedelta(days=days).total_seconds()
+        state = self.store.load(subreddit_name)
+        new_links = self.get_new_links(subreddit_name, state, threshold)
+        if new_links and new_links[0].created >= state.newest_created:
+            state.newest_name = new_links[0].name
+            state.newest_created = new_links[0].created
+        links = {link.id: LinkAggregate(name=link.name, author=link.author, created=link.created) for link in new_links}
+        links.update({link_id: link for link_id, link in state.links.items() if link.created >= threshold})
+        state.links = links
+        state.threshold = threshold
+
+        counts = self.api.subreddits.get_comment_counts([link.name for link in links.values()])
+        for link_id, link in links.items():
+            if (num_comments := counts.get(link.name, link.num_comments)) == link.num_comments:
+                continue
+            link.num_comments = num_comments
+            if num_comments == 0:
+                link.comment_authors = {}
+                continue
+            comments = self.api.subreddits.iter_comments(subreddit_name, link_id, num_comments)
+            link.comment_authors = dict(count_authors(comments))
+        self.store.save(state)
+
+        comment_authors: Counter[str] = Counter()
+        for link in links.values():
+            comment_authors.update(link.comment_authors)
+        posts_authors = Counter(link.author for link in links.values())
+        return {
+            "top_users_by_posts": top_authors(posts_authors, self.top),
+            "top_users_by_comments": top_authors(comment_authors, self.top),
+        }
+
+    def get_new_links(self, subreddit_name: str, state: SubredditState, threshold: float) -> list[Entity]:
+        """
+        Links of the window missing from the state, newest first. The watermark only bounds the listing
+        when the state covers the whole window, links between the thresholds are listed otherwise.
+
+        """
+        covered = state.threshold is not None and state.threshold <= threshold
+        until = max(threshold, state.newest_created) if covered else threshold
+        result: list[Entity] = []
+        for page in self.api.subreddits.iter_new(subreddit_name, until):
+            for link in page:
+                if link.name == state.newest_name or link.id in state.links:
+                    if covered:
+                        return result
+                    continue
+                result.append(link)
+        return result
@@ -0,0 +1,135 @@
+"""
+Per-request instrumentation of the API clients.
+
+Metrics are collected only when a `Metrics` instance is passed to the API. Otherwise the hooks are
+a single `if` per request.
+
+"""
+import json
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_EXTENSION = ".prom"
+PROMETHEUS_PREFIX = "reddit_parser"
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {str(bound): count for bound, count in zip((*self.buckets, "+Inf"), self.counts)},
+        }
+
+
+class Metrics:
+    """
+    Request counts and network latency per endpoint and status, retries by reason, time spent waiting for
+    the rate limiter, bytes received, time spent decoding responses and converting listings and comment trees
+    to models.
+
+    """
+    def __init__(self) -> None:
+        self.requests: defaultdict[tuple[str, int], int] = defaultdict(int)
+        self.latency: defaultdict[str, Histogram] = defaultdict(Histogram)
+        self.phases: defaultdict[str, float] = defaultdict(float)
+        self.retries: defaultdict[str, int] = defaultdict(int)
+        self.throttled = 0.0
+        self.bytes_received = 0
+        self.cache_hits = 0
+
+    def observe_request(self, path: str, status_code: int, seconds: float, size: int) -> None:
+        endpoint = endpoint_name(path)
+        self.requests[endpoint, status_code] += 1
+        self.latency[endpoint].observe(seconds)
+        self.bytes_received += size
+
+    def observe_retry(self, reason: str) -> None:
+        self.retries[reason] += 1
+
+    def observe_throttle(self, seconds: float) -> None:
+        self.throttled += seconds
+
+    def observe_phase(self, phase: str, seconds: float) -> None:
+        self.phases[phase] += seconds
+
+    def to_dict(self) -> dict[str, Any]:
+        requests: defaultdict[str, dict[str, int]] = defaultdict(dict)
+        for (endpoint, status_code), count in sorted(self.requests.items()):
+            requests[endpoint][str(status_code)] = count
+        return {
+            "requests": requests,
+            "latency": {endpoint: histogram.to_dict() for endpoint, histogram in sorted(self.latency.items())},
+            "retries": dict(self.retries),
+            "throttled_seconds": self.throttled,
+            "bytes_received": self.bytes_received,
+            "cache_hits": self.cache_hits,
+            "phase_seconds": dict(self.phases),
+        }
+
+    def to_prometheus(self) -> str:
+        lines = [f"# TYPE {PROMETHEUS_PREFIX}_requests_total counter"]
+        for (endpoint, status_code), count in sorted(self.requests.items()):
+            lines.append(f'{PROMETHEUS_PREFIX}_requests_total{{endpoint="{endpoint}",code="{status_code}"}} {count}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_request_duration_seconds histogram")
+        for endpoint, histogram in sorted(self.latency.items()):
+            cumulative = 0
+            for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                cumulative += count
+                lines.append(
+                    f'{PROMETHEUS_PREFIX}_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} '
+                    f"{cumulative}"
+                )
+            for suffix, value in (("sum", histogram.sum), ("count", histogram.count)):
+                lines.append(f'{PROMETHEUS_PREFIX}_request_duration_seconds_{suffix}{{endpoint="{endpoint}"}} {value}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_retries_total counter")
+        for reason, count in sorted(self.retries.items()):
+            lines.append(f'{PROMETHEUS_PREFIX}_retries_total{{reason="{reason}"}} {count}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_phase_seconds_total counter")
+        for phase, seconds in sorted(self.phases.items()):
+            lines.append(f'{PROMETHEUS_PREFIX}_phase_seconds_total{{phase="{phase}"}} {seconds}')
+        for name, value in (
+                ("throttled_seconds_total", self.throttled),
+                ("received_bytes_total", self.bytes_received),
+                ("cache_hits_total", self.cache_hits),
+        ):
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} counter")
+            lines.append(f"{PROMETHEUS_PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, filename: str) -> None:
+        """
+        Writes Prometheus text format into files with .prom extension, JSON into any other.
+
+        """
+        with open(filename, "w") as file:
+            if filename.endswith(PROMETHEUS_EXTENSION):
+                file.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), file, indent=4)
+
+
+def endpoint_name(path: str) -> str:
+    """
+    Replaces subreddit names and link ids in the path, so requests are grouped by endpoint.
+
+    """
+    parts = path.strip("/").split("/")
+    if len(parts) >= 4 and parts[0] == "r" and parts[2] == "comments":
+        return "/r/{subreddit}/comments/{article}"
+    if len(parts) >= 3 and parts[0] == "r":
+        return f"/r/{{subreddit}}/{parts[2]}"
+    return path
@@ -1,4 +1,6 @@
+from dataclasses import dataclass
 from enum import StrEnum
+from typing import Any
 
 from pydantic import BaseModel
 
@@ -17,3 +19,57 @@ class RedditEntity(BaseModel, use_enum_values=True):
     author: str
     score: int
     kind: RedditEntityKinds
+    # Only links have comment counts and only comments have links. `edited` is the time of the last edit, if any.
+    num_comments: int | None = None
+    edited: float | None = None
+    link_id: str | None = None
+
+
+@dataclass(slots=True)
+class TrustedRedditEntity:
+    """
+    Fields of RedditEntity in a plain slotted class, for data received from the API which is trusted
+    and ingested in bulk without validation.
+
+    """
+    id: str
+    created: float
+    name: str
+    author: str
+    score: int
+    kind: str
+    num_comments: int | None = None
+    edited: float | None = None
+    link_id: str | None = None
+
+    def model_dump(self) -> dict[str, Any]:
+        """
+        Same dict as RedditEntity.model_dump() of the entity.
+
+        """
+        return {
+            "id": self.id, "created": self.created, "name": self.name, "author": self.author, "score": self.score,
+            "kind": self.kind, "num_comments": self.num_comments, "edited": self.edited, "link_id": self.link_id,
+        }
+
+
+type Entity = RedditEntity | TrustedRedditEntity
+
+
+def entity_from_api(kind: str, data: dict[str, Any], validate: bool = False) -> Entity:
+    """
+    Builds entity from the `data` of a Reddit thing. Data received from the API is trusted by default,
+    so TrustedRedditEntity is built without validation. Pass `validate` to get RedditEntity.
+
+    """
+    if validate:
+        return RedditEntity(
+            id=data["id"], created=data["created"], name=data["name"],
+            author=data["author"], score=data["score"], kind=kind,
+            num_comments=data.get("num_comments"), edited=data.get("edited") or None,
+            link_id=data.get("link_id"),
+        )
+    return TrustedRedditEntity(
+        data["id"], data["created"], data["name"], data["author"], data["score"], kind,
+        data.get("num_comments"), data.get("edited") or None, data.get("link_id"),
+    )
@@ -0,0 +1,54 @@
+import random
+from dataclasses import dataclass
+
+import httpx
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+@dataclass
+class ConnectionConfig:
+    max_connections: int = 20
+    max_keepalive_connections: int = 20
+    # Requests are paced by the rate limiter, so connections often idle for a few seconds between them.
+    keepalive_expiry: float = 60.0
+    http2: bool = False
+    timeout: float = 30.0
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter. `Retry-After` of a response takes precedence over it.
+
+    """
+    attempts: int = 5
+    backoff: float = 1.0
+    max_backoff: float = 60.0
+    statuses: frozenset[int] = RETRY_STATUSES
+
+    def should_retry(self, attempt: int, response: httpx.Response | None = None) -> bool:
+        if attempt + 1 >= self.attempts:
+            return False
+        return response is None or response.status_code in self.statuses
+
+    def get_delay(self, attempt: int, response: httpx.Response | None = None) -> float:
+        if response is not None and (retry_after := response.headers.get("Retry-After", "")).isdigit():
+            return float(retry_after)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+def create_http_transport(connection: ConnectionConfig) -> httpx.HTTPTransport:
+    return httpx.HTTPTransport(limits=connection.limits, http2=connection.http2)
+
+
+def create_async_http_transport(connection: ConnectionConfig) -> httpx.AsyncHTTPTransport:
+    return httpx.AsyncHTTPTransport(limits=connection.limits, http2=connection.http2)
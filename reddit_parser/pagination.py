@@ -0,0 +1,67 @@
+from bisect import bisect_right
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+
+from reddit_parser.models import Entity
+
+type PageGetter = Callable[[str | None], list[Entity]]
+type AsyncPageGetter = Callable[[str | None], Awaitable[list[Entity]]]
+
+
+class PageCutter:
+    """
+    Keeps state of a listing which is paginated with the `after` cursor down to a time threshold.
+
+    Entities already yielded on the previous page are skipped, because listings shift while they are
+    paginated. Listings sorted from newest to oldest (`ordered`) are cut with binary search and pagination
+    is finished as soon as a page crosses the threshold. Other listings are filtered and read to their end.
+
+    """
+    def __init__(self, threshold: float, ordered: bool = True, after: str | None = None) -> None:
+        self.threshold = threshold
+        self.ordered = ordered
+        self.after = after
+        self.finished = False
+        self._previous_names: set[str] = set()
+
+    def cut(self, page: list[Entity]) -> list[Entity]:
+        fresh = [entity for entity in page if entity.name not in self._previous_names]
+        if not fresh:
+            self.finished = True
+            return []
+        self.after = page[-1].name
+        self._previous_names = {entity.name for entity in page}
+        if self.ordered:
+            index = locate_closest_link_index(fresh, self.threshold)
+            self.finished = index < len(fresh)
+            return fresh[:index]
+        return [entity for entity in fresh if entity.created >= self.threshold]
+
+
+def paginate(
+        get_page: PageGetter, threshold: float, ordered: bool = True, after: str | None = None,
+) -> Iterator[list[Entity]]:
+    """
+    Pass `after` to continue pagination which was interrupted after that entity.
+
+    """
+    cutter = PageCutter(threshold, ordered, after)
+    while not cutter.finished:
+        if page := cutter.cut(get_page(cutter.after)):
+            yield page
+
+
+async def apaginate(
+        get_page: AsyncPageGetter, threshold: float, ordered: bool = True, after: str | None = None,
+) -> AsyncIterator[list[Entity]]:
+    cutter = PageCutter(threshold, ordered, after)
+    while not cutter.finished:
+        if page := cutter.cut(await get_page(cutter.after)):
+            yield page
+
+
+def locate_closest_link_index(links: list[Entity], timestamp: float) -> int:
+    """
+    Returns index of the first link older than the timestamp in the list sorted from newest to oldest.
+
+    """
+    return bisect_right(links, -timestamp, key=lambda x: -x.created)
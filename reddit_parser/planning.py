@@ -0,0 +1,73 @@
+"""
+Planning of how comment authors of the links in a time window are counted.
+
+Per link, every link with comments costs a comment tree, plus a morechildren request per hundred comments
+the tree leaves out. The subreddit-wide stream of the newest comments costs a request per hundred comments
+left in the window, including comments on links older than the window. Listings end after a thousand items,
+so the stream can only be used when the window has fewer comments than that.
+
+"""
+import math
+from enum import StrEnum
+
+from reddit_parser.api import LISTING_PAGE_SIZE, MAX_COMMENTS_LIMIT, MAX_LISTING_ITEMS, MORECHILDREN_BATCH_SIZE
+from reddit_parser.columns import MISSING, Columns
+
+# Share of comments which are left in the window on older links, on top of comments on the window's links.
+STREAM_OVERHEAD = 1.5
+
+
+class CommentsStrategy(StrEnum):
+    AUTO = "auto"
+    LINKS = "links"
+    STREAM = "stream"
+
+
+def estimate_links_cost(links: Columns) -> int:
+    cost = 0
+    for count in links.num_comments:
+        if count == MISSING:
+            cost += 1
+        elif count:
+            cost += 1 + math.ceil(max(count - MAX_COMMENTS_LIMIT, 0) / MORECHILDREN_BATCH_SIZE)
+    return cost
+
+
+def estimate_stream_cost(links: Columns) -> float:
+    """
+    Infinite when comment counts are unknown or the stream ends before it reaches the start of the window.
+
+    """
+    if MISSING in links.num_comments:
+        return math.inf
+    comments = STREAM_OVERHEAD * sum(links.num_comments)
+    if comments >= MAX_LISTING_ITEMS - LISTING_PAGE_SIZE:
+        return math.inf
+    return math.floor(comments / LISTING_PAGE_SIZE) + 1
+
+
+def plan_comments_strategy(
+        links: Columns, strategy: CommentsStrategy = CommentsStrategy.AUTO,
+) -> CommentsStrategy:
+    if strategy != CommentsStrategy.AUTO:
+        return strategy
+    if estimate_stream_cost(links) < estimate_links_cost(links):
+        return CommentsStrategy.STREAM
+    return CommentsStrategy.LINKS
+
+
+def is_stream_complete(streamed: int) -> bool:
+    """
+    Whether the stream got down to the start of the window rather than to the end of the listing.
+    Comments repeated on shifted pages are skipped, so the listing may end a page short of its limit.
+
+    """
+    return streamed < MAX_LISTING_ITEMS - LISTING_PAGE_SIZE
+
+
+def is_listing_complete(read: int) -> bool:
+    """
+    Whether a listing which isn't sorted by time was read to its end rather than cut at the limit of listings.
+
+    """
+    return read < MAX_LISTING_ITEMS - LISTING_PAGE_SIZE
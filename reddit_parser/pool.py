@@ -0,0 +1,147 @@
+"""
+Pool of API sessions of several OAuth apps.
+
+Reddit limits requests per OAuth client, so every session has its own client, token and rate limiter,
+and comment trees of one run are fetched by all of them at once. Workers of a session take links from
+a shared queue. A session whose credentials are throttled beyond its retries or revoked is taken out
+of the pool for a cooldown, and the link it was fetching goes back to the queue for the other sessions.
+
+"""
+import queue
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+
+from reddit_parser.aggregation import count_authors
+from reddit_parser.api import RedditApi, RedditApiError, RedditAuthorizationError
+from reddit_parser.ratelimit import RATELIMIT_PERIOD
+
+# Statuses of the credentials rather than of a link: 401 is left after `TokenAuth` has refreshed the token, 429 after
+# the retries. Sessions failing with them or on the token request are taken out of the pool, other errors, like 403
+# of a quarantined thread, fail the run.
+FAILOVER_STATUSES = frozenset({401, 429})
+FAILED_SESSION_COOLDOWN = RATELIMIT_PERIOD
+
+type CommentedLink = tuple[str, int | None]
+
+
+class NoSessionsError(RedditApiError): pass
+
+
+@dataclass
+class Session:
+    api: RedditApi
+    failed_at: float | None = None
+    error: Exception | None = None
+
+    def available(self, now: float) -> bool:
+        return self.failed_at is None or now - self.failed_at >= FAILED_SESSION_COOLDOWN
+
+    def fail(self, error: Exception, now: float) -> None:
+        self.failed_at = now
+        self.error = error
+
+
+class SessionPool:
+    """
+    `workers_per_session` threads fetch comments through every session. More than one only helps when
+    responses take longer than the limiter spaces requests.
+
+    """
+    def __init__(
+            self,
+            apis: list[RedditApi],
+            workers_per_session: int = 1,
+            clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not apis:
+            raise ValueError("At least one API session is required.")
+        self.sessions = [Session(api) for api in apis]
+        self.workers_per_session = workers_per_session
+        self.clock = clock
+
+    @property
+    def api(self) -> RedditApi:
+        """
+        First available session, used for requests which are not shared, like listings.
+
+        """
+        return self._available_sessions()[0].api
+
+    def authorize(self) -> None:
+        for session in self.sessions:
+            try:
+                session.api.authorize()
+            except RedditAuthorizationError as error:
+                session.fail(error, self.clock())
+        self._available_sessions()
+
+    def count_comments_authors(self, subreddit_name: str, links: Iterable[CommentedLink]) -> Counter[str]:
+        """
+        Counts are merged in the order of the links, so the result doesn't depend on which session
+        fetched which link.
+
+        """
+        links = list(links)
+        work: queue.SimpleQueue[tuple[int, CommentedLink]] = queue.SimpleQueue()
+        for item in enumerate(links):
+            work.put(item)
+        results: list[Counter[str] | None] = [None] * len(links)
+        errors: list[Exception] = []
+        stop = threading.Event()
+        while not work.empty() and not errors:
+            threads = [
+                threading.Thread(target=self._work, args=(session, subreddit_name, work, results, errors, stop))
+                for session in self._available_sessions()
+                for _ in range(self.workers_per_session)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+        authors: Counter[str] = Counter()
+        for counts in results:
+            authors.update(counts)
+        return authors
+
+    def _work(
+            self,
+            session: Session,
+            subreddit_name: str,
+            work: queue.SimpleQueue[tuple[int, CommentedLink]],
+            results: list[Counter[str] | None],
+            errors: list[Exception],
+            stop: threading.Event,
+    ) -> None:
+        while not stop.is_set() and session.failed_at is None:
+            try:
+                index, (link_id, num_comments) = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[index] = count_authors(
+                    session.api.subreddits.iter_comments(subreddit_name, link_id, num_comments)
+                )
+            except RedditApiError as error:
+                work.put((index, (link_id, num_comments)))
+                if isinstance(error, RedditAuthorizationError) or error.status_code in FAILOVER_STATUSES:
+                    session.fail(error, self.clock())
+                else:
+                    errors.append(error)
+                    stop.set()
+            except Exception as error:
+                errors.append(error)
+                stop.set()
+
+    def _available_sessions(self) -> list[Session]:
+        now = self.clock()
+        if not (sessions := [session for session in self.sessions if session.available(now)]):
+            last = max(self.sessions, key=lambda x: x.failed_at or 0.0)
+            raise NoSessionsError(f"All {len(self.sessions)} sessions failed, the last error: {last.error}")
+        for session in sessions:
+            session.failed_at = None
+        return sessions
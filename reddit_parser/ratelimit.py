@@ -0,0 +1,175 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from contextvars import ContextVar
+
+from httpx import Headers
+
+REQUEST_INTERVAL = 60 / 90
+RATELIMIT_PERIOD = 600
+BURST_SIZE = 10
+
+current_lane: ContextVar[str] = ContextVar("current_lane", default="")
+
+
+class TokenBucket:
+    """
+    Token bucket which is refilled according to X-Ratelimit-* headers of Reddit responses.
+
+    Requests are allowed in bursts of up to `capacity` while there is quota left, and the rest of
+    the quota is spread evenly until the end of the current rate limit window. Before the first
+    response arrives the bucket is refilled with the conservative default rate.
+    A request reserves its token in advance, so the bucket may be shared by threads and asyncio
+    tasks: `reserve` never blocks and only returns the time the caller has to wait.
+
+    """
+    def __init__(
+            self,
+            capacity: int = BURST_SIZE,
+            rate: float = 1 / REQUEST_INTERVAL,
+            period: float = RATELIMIT_PERIOD,
+            clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = capacity
+        self.rate = rate
+        self.period = period
+        self.quota = rate * period
+        self.tokens = float(capacity)
+        self._clock = clock
+        self._updated_at = clock()
+        self._resume_at = self._updated_at
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self.tokens -= 1
+            delay = max(self._resume_at - now, 0.0)
+            if self.tokens < 0:
+                delay += -self.tokens / self.rate
+            return delay
+
+    def update(self, headers: Headers) -> None:
+        if (remaining_header := headers.get("X-Ratelimit-Remaining")) is None:
+            return
+        remaining = float(remaining_header)
+        reset = float(headers.get("X-Ratelimit-Reset", self.period))
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if (used := headers.get("X-Ratelimit-Used")) is not None:
+                self.quota = float(used) + remaining
+            if remaining < 1:
+                # Quota is exhausted: nothing is allowed until the reset, after which the whole
+                # quota of the next window is spread over it.
+                self.tokens = min(self.tokens, 0.0)
+                self._resume_at = now + reset
+                self.rate = self.quota / self.period
+                return
+            self._resume_at = min(self._resume_at, now)
+            self.tokens = min(self.tokens, remaining, self.capacity)
+            # Requests which reserved tokens but were not sent yet will use up part of the remaining quota too.
+            self.rate = max(remaining - max(self.tokens, 0.0), 1.0) / max(reset, 1.0)
+
+    def _refill(self, now: float) -> None:
+        start = max(self._updated_at, self._resume_at)
+        if now > start:
+            self.tokens = min(self.capacity, self.tokens + (now - start) * self.rate)
+        self._updated_at = max(now, self._updated_at)
+
+
+class UnlimitedBucket(TokenBucket):
+    """
+    Bucket which never makes requests wait, for transports which don't reach Reddit.
+
+    """
+    def reserve(self) -> float:
+        return 0.0
+
+    def update(self, headers: Headers) -> None:
+        pass
+
+
+class FairSemaphore:
+    """
+    Semaphore which hands released slots to waiting lanes in turn instead of first come, first served.
+    The lane of a waiter is taken from `current_lane`, so one busy lane can't starve the others.
+
+    """
+    def __init__(self, value: int) -> None:
+        self._value = value
+        self._lanes: OrderedDict[str, deque[asyncio.Future[None]]] = OrderedDict()
+
+    async def acquire(self) -> None:
+        if self._value > 0 and not self._lanes:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._lanes.setdefault(current_lane.get(), deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                # The slot was handed over right before cancellation.
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self._lanes:
+            lane, waiters = next(iter(self._lanes.items()))
+            future = waiters.popleft()
+            if waiters:
+                self._lanes.move_to_end(lane)
+            else:
+                del self._lanes[lane]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+
+class AsyncRequestLimiter:
+    """
+    Keeps requests of an asyncio client within Reddit limits: starts of requests are paced by
+    the token bucket and no more than `max_in_flight` requests are awaited at the same time.
+    Free slots are shared fairly between lanes, see FairSemaphore.
+
+    """
+    def __init__(self, bucket: TokenBucket | None = None, max_in_flight: int = 8) -> None:
+        self.bucket = bucket or TokenBucket()
+        self.max_in_flight = max_in_flight
+        self._semaphore: FairSemaphore | None = None
+
+    async def __aenter__(self) -> "AsyncRequestLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.release()
+
+    async def acquire(self) -> float:
+        """
+        Returns the time the request was paced by the bucket, without the wait for a free slot.
+
+        """
+        if self._semaphore is None:
+            self._semaphore = FairSemaphore(self.max_in_flight)
+        await self._semaphore.acquire()
+        try:
+            if (delay := self.bucket.reserve()) > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            # A request cancelled while it's paced never reaches __aexit__, so its slot is given back here.
+            self._semaphore.release()
+            raise
+        return max(delay, 0.0)
+
+    def release(self) -> None:
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def update(self, headers: Headers) -> None:
+        self.bucket.update(headers)
@@ -0,0 +1,116 @@
+"""
+Logging of raw responses off the request path.
+
+Requests only put the response into a bounded queue. Formatting and writing happen in a background
+thread, log files are rotated and the rotated ones are compressed. When the queue is full, responses
+are dropped rather than slowing the crawl down.
+
+"""
+import atexit
+import datetime
+import gzip
+import itertools
+import logging
+import os
+import queue
+import shutil
+from dataclasses import dataclass
+from functools import cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from httpx import Request, Response
+
+from reddit_parser.utils import variable_to_boolean
+
+QUEUE_SIZE = 10_000
+
+
+@dataclass
+class ResponseLogConfig:
+    path: str = "responses.log"
+    max_bytes: int = 50 * 1024 * 1024
+    backup_count: int = 5
+    # Only every `sample_rate`-th successful response is logged, errors always are.
+    sample_rate: int = 1
+    errors_only: bool = False
+
+
+class ResponseLogger:
+    def __init__(self, config: ResponseLogConfig) -> None:
+        self.config = config
+        self.dropped = 0
+        self._counter = itertools.count()
+        handler = RotatingFileHandler(config.path, maxBytes=config.max_bytes, backupCount=config.backup_count)
+        handler.namer = lambda name: f"{name}.gz"
+        handler.rotator = _compress
+        handler.setFormatter(ResponseFormatter())
+        self._queue: queue.Queue[logging.LogRecord] = queue.Queue(QUEUE_SIZE)
+        self._listener = QueueListener(self._queue, handler)
+        self._logger = logging.Logger("reddit_parser.responses")
+        self._logger.addHandler(_DroppingQueueHandler(self))
+        self._listener.start()
+
+    def wants(self, response: Response) -> bool:
+        if response.is_error:
+            return True
+        return not self.config.errors_only and next(self._counter) % self.config.sample_rate == 0
+
+    def log(self, request: Request, response: Response) -> None:
+        self._logger.info("", extra={"request": request, "response": response})
+
+    def close(self) -> None:
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+
+
+class ResponseFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        request: Request = record.request  # type: ignore[attr-defined]
+        response: Response = record.response  # type: ignore[attr-defined]
+        return (
+            f"{'=' * 40}\n"
+            f"{datetime.datetime.fromtimestamp(record.created).isoformat()} {request.method} {request.url} "
+            f"{response.status_code} {len(response.content)} bytes\n"
+            f"{response.content.decode(errors='replace')}"
+        )
+
+
+class _DroppingQueueHandler(QueueHandler):
+    def __init__(self, owner: ResponseLogger) -> None:
+        super().__init__(owner._queue)
+        self.owner = owner
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The record stays in the process, so formatting is left to the listener thread.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.owner.dropped += 1
+
+
+def _compress(source: str, destination: str) -> None:
+    with open(source, "rb") as source_file, gzip.open(destination, "wb") as destination_file:
+        shutil.copyfileobj(source_file, destination_file)
+    os.remove(source)
+
+
+@cache
+def create_response_logger() -> ResponseLogger | None:
+    """
+    Shared logger configured by environment variables: ENABLE_REDDIT_PARSER_LOGGING turns it on,
+    REDDIT_PARSER_LOG_FILE, REDDIT_PARSER_LOG_SAMPLE_RATE and REDDIT_PARSER_LOG_ERRORS_ONLY tune it.
+
+    """
+    if not variable_to_boolean(os.getenv("ENABLE_REDDIT_PARSER_LOGGING")):
+        return None
+    logger = ResponseLogger(ResponseLogConfig(
+        path=os.getenv("REDDIT_PARSER_LOG_FILE", ResponseLogConfig.path),
+        sample_rate=int(os.getenv("REDDIT_PARSER_LOG_SAMPLE_RATE", ResponseLogConfig.sample_rate)),
+        errors_only=variable_to_boolean(os.getenv("REDDIT_PARSER_LOG_ERRORS_ONLY")),
+    ))
+    atexit.register(logger.close)
+    return logger
@@ -1,88 +1,288 @@
-from datetime import datetime, timedelta
+import asyncio
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
 from typing import Any
 
-from reddit_parser.api import RedditApi
-from reddit_parser.models import RedditEntity
+from reddit_parser.aggregation import AuthorCount, count_authors, top_authors, top_rows_by_score
+from reddit_parser.api import RedditApi, get_time_filter
+from reddit_parser.async_api import AsyncRedditApi
+from reddit_parser.checkpoint import Checkpoint, CheckpointStore
+from reddit_parser.columns import Columns, EntityColumns
+from reddit_parser.models import Entity, RedditEntityKinds
+from reddit_parser.pagination import paginate
+from reddit_parser.pool import SessionPool
+from reddit_parser.planning import CommentsStrategy, is_listing_complete, is_stream_complete, plan_comments_strategy
 
-type Json = dict[str, Any] | list[dict[str, Any]]
+# Checkpoints of both top_users searchers are stored under this mode.
+TOP_USERS_MODE = "top_users"
 
 
 class TopLinksSearcher:
-    def __init__(self, api: RedditApi) -> None:
+    def __init__(self, api: RedditApi, top: int | None = None, clock: Callable[[], float] = time.time) -> None:
         self.api = api
+        self.top = top
+        self.clock = clock
 
-    def process(self, subreddit_name: str, days: int = 3) -> list[dict[str, Any]]:
-        threshold = datetime.now() - timedelta(days=days)
-        links = self.get_links_from_api(subreddit_name)
-        if not links:
-            return []
+    def process(self, subreddit_name: str, days: int = 3) -> Iterator[dict[str, Any]]:
+        """
+        Links are kept in columns and dumped one by one while the result is being written. They are read
+        from the top listing of the narrowest time filter covering the days, or from /new when the days
+        don't fit any filter or the top listing ended at its limit with fewer links of the window than asked.
 
-        while True:
-            oldest_timestamp = datetime.fromtimestamp(links[-1].created)
-            if oldest_timestamp > threshold:
-                links.extend(self.get_links_from_api(subreddit_name, before=links[-1].name))
-            else:
-                index = locate_closest_link_index(links, threshold)
-                ordered = self._sort_links_by_score(links[:index])
-                return [x.model_dump() for x in ordered]
+        """
+        threshold = get_threshold(days, self.clock())
+        time_filter = get_time_filter(days)
+        links = self._read_top_links(subreddit_name, threshold, time_filter) if time_filter else None
+        if links is None:
+            links = EntityColumns(RedditEntityKinds.link)
+            for page in self.api.subreddits.iter_new(subreddit_name, threshold):
+                links.extend(page)
+        return map(links.dump, top_rows_by_score(links, self.top))
 
-    def get_links_from_api(self, subreddit_name: str, before: str = None) -> list[RedditEntity]:
-        res = self.api.subreddits.get_top(subreddit_name, before=before)
-        return sorted(res, key=lambda x: x.created, reverse=True)
+    def _read_top_links(self, subreddit_name: str, threshold: float, time_filter: str) -> EntityColumns | None:
+        """
+        Top links are not sorted by time, so the whole listing is read and links older than the threshold
+        are dropped. A listing cut at its limit holds only the top links of the whole time filter, which
+        are the top ones of the window only when at least `top` of them are in it. None is returned otherwise.
 
-    def _sort_links_by_score(self, links: list[RedditEntity]):
-        return sorted(links, key=lambda x: x.score, reverse=True)
+        """
+        read = 0
+
+        def get_page(after: str | None) -> list[Entity]:
+            nonlocal read
+            page = self.api.subreddits.get_top(subreddit_name, after=after, time_filter=time_filter)
+            read += len(page)
+            return page
+
+        links = EntityColumns(RedditEntityKinds.link)
+        for page in paginate(get_page, threshold, ordered=False):
+            links.extend(page)
+        if is_listing_complete(read) or (self.top is not None and len(links) >= self.top):
+            return links
+        return None
 
 
 class TopUsersSearcher:
-    def __init__(self, api: RedditApi) -> None:
+    """
+    Comment authors are counted either per link or from the subreddit-wide comment stream, whichever
+    `strategy` asks for. By default the cheaper one is planned from the comment counts of the links.
+    When the stream ends before the start of the window, the comments are requested per link after all.
+    With a `pool`, comment trees are fetched by all of its sessions, listings still go through `api`.
+
+    With `checkpoints` the listed links and the authors counted so far are saved while the run goes on and
+    when it fails, and with `resume` a run continues from the checkpoint of the same subreddit and days,
+    in its window. Comments counted by a pool are saved only once all of them are counted.
+
+    """
+    def __init__(
+            self,
+            api: RedditApi,
+            top: int | None = None,
+            clock: Callable[[], float] = time.time,
+            strategy: CommentsStrategy = CommentsStrategy.AUTO,
+            pool: SessionPool | None = None,
+            checkpoints: CheckpointStore | None = None,
+            resume: bool = False,
+    ) -> None:
         self.api = api
+        self.top = top
+        self.clock = clock
+        self.strategy = strategy
+        self.pool = pool
+        self.checkpoints = checkpoints
+        self.resume = resume
+
+    def process(self, subreddit_name: str, days: int = 3) -> dict[str, list[AuthorCount]]:
+        threshold = get_threshold(days, self.clock())
+        with checkpointed(self.checkpoints, self.resume, subreddit_name, days, threshold) as checkpoint:
+            return self._process(checkpoint)
+
+    def _process(self, checkpoint: Checkpoint) -> dict[str, list[AuthorCount]]:
+        subreddit_name, links = checkpoint.subreddit, checkpoint.links
+        if not checkpoint.listed:
+            for page in self.api.subreddits.iter_new(subreddit_name, checkpoint.threshold, checkpoint.after):
+                # Links listed before the interruption may come again when the listing has shifted.
+                links.extend(link for link in page if link.name not in links.names)
+                checkpoint.after = page[-1].name
+                self._save_checkpoint(checkpoint)
+            checkpoint.listed = True
+        comments_authors = None
+        if not checkpoint.processed and plan_comments_strategy(links, self.strategy) == CommentsStrategy.STREAM:
+            comments_authors = self._count_streamed_comments_authors(subreddit_name, links, checkpoint.threshold)
+        if comments_authors is None:
+            comments_authors = self._count_comments_authors(checkpoint)
+        return {
+            "top_users_by_posts": top_authors(count_authors(links), self.top),
+            "top_users_by_comments": top_authors(comments_authors, self.top),
+        }
+
+    def _count_comments_authors(self, checkpoint: Checkpoint) -> Counter[str]:
+        subreddit_name, authors = checkpoint.subreddit, checkpoint.comments_authors
+        links = list(iter_unprocessed_links(checkpoint))
+        if self.pool:
+            authors.update(self.pool.count_comments_authors(subreddit_name, links))
+            checkpoint.processed += len(links)
+            return authors
+        for link_id, num_comments in links:
+            authors.update(count_authors(self.api.subreddits.iter_comments(subreddit_name, link_id, num_comments)))
+            checkpoint.processed += 1
+            self._save_checkpoint(checkpoint)
+        return authors
+
+    def _save_checkpoint(self, checkpoint: Checkpoint) -> None:
+        if self.checkpoints:
+            self.checkpoints.save_due(checkpoint)
+
+    def _count_streamed_comments_authors(
+            self, subreddit_name: str, links: Columns, threshold: float,
+    ) -> Counter[str] | None:
+        names = links.names
+        authors: Counter[str] = Counter()
+        streamed = 0
+        for page in self.api.subreddits.iter_subreddit_comments(subreddit_name, threshold):
+            streamed += len(page)
+            authors.update(count_authors(comment for comment in page if comment.link_id in names))
+        return authors if is_stream_complete(streamed) else None
+
+
+class AsyncTopUsersSearcher:
+    """
+    Same rating as TopUsersSearcher. With the per-link strategy comment trees of all links are requested
+    concurrently while the listing is still being paginated, otherwise the listing is read first to plan.
+    How many requests are in flight at once is decided by the limiter of the API client.
+
+    Checkpoints are the same as those of TopUsersSearcher. Comment trees are counted in the order of the
+    links, so a checkpoint holds the counts of the links up to the first one still being fetched.
+
+    """
+    def __init__(
+            self,
+            api: AsyncRedditApi,
+            top: int | None = None,
+            clock: Callable[[], float] = time.time,
+            strategy: CommentsStrategy = CommentsStrategy.AUTO,
+            checkpoints: CheckpointStore | None = None,
+            resume: bool = False,
+    ) -> None:
+        self.api = api
+        self.top = top
+        self.clock = clock
+        self.strategy = strategy
+        self.checkpoints = checkpoints
+        self.resume = resume
+
+    async def process(self, subreddit_name: str, days: int = 3) -> dict[str, list[AuthorCount]]:
+        threshold = get_threshold(days, self.clock())
+        with checkpointed(self.checkpoints, self.resume, subreddit_name, days, threshold) as checkpoint:
+            return await self._process(checkpoint)
+
+    async def _process(self, checkpoint: Checkpoint) -> dict[str, list[AuthorCount]]:
+        subreddit_name, links = checkpoint.subreddit, checkpoint.links
+        tasks: list[asyncio.Task[Counter[str]]] = []
+        comments_authors: Counter[str] | None = None
+        try:
+            if self.strategy == CommentsStrategy.LINKS:
+                tasks.extend(self._create_tasks(subreddit_name, iter_unprocessed_links(checkpoint)))
+            if not checkpoint.listed:
+                async for page in self.api.subreddits.iter_new(subreddit_name, checkpoint.threshold, checkpoint.after):
+                    start = len(links)
+                    links.extend(link for link in page if link.name not in links.names)
+                    checkpoint.after = page[-1].name
+                    if self.strategy == CommentsStrategy.LINKS:
+                        tasks.extend(self._create_tasks(subreddit_name, iter_commented_links(links, start)))
+                    self._save_checkpoint(checkpoint)
+                checkpoint.listed = True
+            if not checkpoint.processed and plan_comments_strategy(links, self.strategy) == CommentsStrategy.STREAM:
+                comments_authors = await self._count_streamed_comments_authors(
+                    subreddit_name, links, checkpoint.threshold,
+                )
+            if comments_authors is None:
+                if self.strategy != CommentsStrategy.LINKS:
+                    tasks.extend(self._create_tasks(subreddit_name, iter_unprocessed_links(checkpoint)))
+                for task in tasks:
+                    checkpoint.comments_authors.update(await task)
+                    checkpoint.processed += 1
+                    self._save_checkpoint(checkpoint)
+                comments_authors = checkpoint.comments_authors
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return {
+            "top_users_by_posts": top_authors(count_authors(links), self.top),
+            "top_users_by_comments": top_authors(comments_authors, self.top),
+        }
+
+    def _create_tasks(
+            self, subreddit_name: str, links: Iterable[tuple[str, int | None]],
+    ) -> list[asyncio.Task[Counter[str]]]:
+        return [
+            asyncio.create_task(self._count_comments_authors(subreddit_name, link_id, num_comments))
+            for link_id, num_comments in links
+        ]
+
+    async def _count_comments_authors(
+            self, subreddit_name: str, link_id: str, num_comments: int | None,
+    ) -> Counter[str]:
+        return count_authors(await self.api.subreddits.get_comments(subreddit_name, link_id, num_comments))
+
+    async def _count_streamed_comments_authors(
+            self, subreddit_name: str, links: Columns, threshold: float,
+    ) -> Counter[str] | None:
+        names = links.names
+        authors: Counter[str] = Counter()
+        streamed = 0
+        async for page in self.api.subreddits.iter_subreddit_comments(subreddit_name, threshold):
+            streamed += len(page)
+            authors.update(count_authors(comment for comment in page if comment.link_id in names))
+        return authors if is_stream_complete(streamed) else None
+
+    def _save_checkpoint(self, checkpoint: Checkpoint) -> None:
+        if self.checkpoints:
+            self.checkpoints.save_due(checkpoint)
+
+
+@contextmanager
+def checkpointed(
+        store: CheckpointStore | None, resume: bool, subreddit_name: str, days: int, threshold: float,
+) -> Iterator[Checkpoint]:
+    """
+    Checkpoint of a top_users run, loaded from `store` when resuming. It's saved when the run fails and
+    deleted when the run is done. Without a store the checkpoint only keeps the progress in memory.
+
+    """
+    checkpoint = store.load(subreddit_name, days, TOP_USERS_MODE) if store and resume else None
+    if checkpoint is None:
+        checkpoint = Checkpoint(subreddit_name, days, TOP_USERS_MODE, threshold)
+    try:
+        yield checkpoint
+    except BaseException:
+        if store:
+            store.save(checkpoint)
+        raise
+    if store:
+        store.delete(checkpoint)
+
+
+def iter_unprocessed_links(checkpoint: Checkpoint) -> Iterator[tuple[str, int | None]]:
+    return islice(iter_commented_links(checkpoint.links), checkpoint.processed, None)
+
+
+def iter_commented_links(links: Columns, start: int = 0) -> Iterator[tuple[str, int | None]]:
+    """
+    Ids and comment counts of the links from `start` on. Links from sources without comment counts
+    are always included.
+
+    """
+    for index in range(start, len(links)):
+        if links.num_comments[index] != 0:
+            yield links.get_id(index), links.get_num_comments(index)
+
+
+def get_threshold(days: int, now: float | None = None) -> float:
+    return (time.time() if now is None else now) - timedelta(days=days).total_seconds()
 
-    def process(self, subreddit_name: str, days: int = 3) -> dict[str, list[str]]:
-        threshold = datetime.now() - timedelta(days=days)
-        links = self.get_links_from_api(subreddit_name)
-        result: dict[str, list[str]] = {
-                    "top_users_by_posts": [],
-                    "top_users_by_comments": [],
-                }
-        if not links:
-            return result
-
-        while True:
-            oldest_timestamp = datetime.fromtimestamp(links[-1].created)
-            if oldest_timestamp > threshold:
-                new_links = self.get_links_from_api(subreddit_name, before=links[-1].name)
-                if new_links:
-                    links.extend(new_links)
-                else:
-                    break
-        index = locate_closest_link_index(links, threshold)
-        result["top_users_by_posts"] = self._top_users_by_posts(links[:index])
-        result["top_users_by_comments"] = self._top_users_by_comments(subreddit_name,  links[:index])
-        return result
-
-    def get_links_from_api(self, subreddit_name: str, before: str = None, after: str = None) -> list[RedditEntity]:
-        res = self.api.subreddits.get_new(subreddit_name, before=before, after=after)
-        return sorted(res, key=lambda x: x.created, reverse=True)
-
-    def _top_users_by_comments(self, subreddit_name: str, links: list[RedditEntity]) -> list[str]:
-        link_comments_dict = {link.id: self.api.subreddits.get_comments(subreddit_name, link.id) for link in links}
-        authors: dict[str, int] = {}
-        for comment_list in link_comments_dict.values():
-            for comment in comment_list:
-                authors[comment.author] = authors.get(comment.author, 0) + 1
-        # return sorted(authors, key=lambda x: authors[x], reverse=True)
-        return [f"{author}: {authors[author]}" for author in sorted(authors, key=lambda x: authors[x], reverse=True)]
-
-    def _top_users_by_posts(self, links: list[RedditEntity]) -> list[str]:
-        users_posts: dict[str, int] = {}
-        for link in links:
-            users_posts[link.author] = users_posts.get(link.author, 0) + 1
-        return [f"{author}: {users_posts[author]}" for author in sorted(users_posts, key=lambda x: users_posts[x], reverse=True)]
-
-
-def locate_closest_link_index(links: list[RedditEntity], timestamp: datetime) -> int:
-    for index, value in enumerate(links):
-        if datetime.fromtimestamp(value.created) < timestamp:
-            return index
-    return len(links)
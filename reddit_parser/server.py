@@ -0,0 +1,162 @@
+"""
+Long-running mode which keeps rankings of several subreddits in memory and serves them over HTTP.
+
+Rankings are refreshed by a background thread on one API session. Every ranking is serialized once
+when it's refreshed, so requests only prepend its staleness metadata to the stored bytes.
+
+"""
+import json
+import threading
+import time
+import traceback
+from collections.abc import Callable
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from reddit_parser.api import RedditApi
+from reddit_parser.searcher import TopLinksSearcher, TopUsersSearcher
+
+DEFAULT_INTERVAL = 15 * 60
+DEFAULT_PORT = 8080
+# A ranking is stale when it has missed this many refreshes.
+STALE_INTERVALS = 2
+# Seconds shutdown waits for the refresh in progress. The thread is a daemon, so a crawl still running is abandoned.
+STOP_TIMEOUT = 5
+
+
+@dataclass
+class Ranking:
+    subreddit: str
+    mode: str
+    refreshed_at: float | None = None
+    duration: float | None = None
+    error: str | None = None
+    body: bytes = b"null"
+
+    def metadata(self, now: float, interval: float) -> dict[str, Any]:
+        age = None if self.refreshed_at is None else now - self.refreshed_at
+        return {
+            "subreddit": self.subreddit,
+            "mode": self.mode,
+            "refreshed_at": self.refreshed_at,
+            "age_seconds": age,
+            "refresh_duration": self.duration,
+            "stale": age is None or age > STALE_INTERVALS * interval,
+            "error": self.error,
+        }
+
+
+class RankingService:
+    def __init__(
+            self,
+            api: RedditApi,
+            subreddits: list[str],
+            modes: list[str],
+            days: int = 3,
+            interval: float = DEFAULT_INTERVAL,
+            top: int | None = None,
+            clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.api = api
+        self.days = days
+        self.interval = interval
+        self.clock = clock
+        self.searchers: dict[str, Callable[[str, int], Any]] = {
+            "top_links": lambda name, days: list(TopLinksSearcher(api, top=top, clock=clock).process(name, days)),
+            "top_users": TopUsersSearcher(api, top=top, clock=clock).process,
+        }
+        self.rankings = {
+            (subreddit.lower(), mode): Ranking(subreddit, mode) for subreddit in subreddits for mode in modes
+        }
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def refresh(self) -> None:
+        for key, ranking in self.rankings.items():
+            if self._stop.is_set():
+                return
+            started = self.clock()
+            try:
+                result = self.searchers[ranking.mode](ranking.subreddit, self.days)
+            except Exception:
+                # Keep serving the previous ranking, marked with the error of the failed refresh.
+                ranking.error = traceback.format_exc(limit=1)
+                continue
+            # A new object is published at once, so readers never see a half-updated ranking.
+            self.rankings[key] = Ranking(
+                subreddit=ranking.subreddit,
+                mode=ranking.mode,
+                refreshed_at=self.clock(),
+                duration=self.clock() - started,
+                body=json.dumps(result).encode(),
+            )
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            started = self.clock()
+            self.refresh()
+            self._stop.wait(max(self.interval - (self.clock() - started), 0))
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run, name="ranking-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = STOP_TIMEOUT) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def render(self, subreddit: str, mode: str) -> bytes | None:
+        if (ranking := self.rankings.get((subreddit.lower(), mode))) is None:
+            return None
+        metadata = json.dumps(ranking.metadata(self.clock(), self.interval))
+        return b"".join((metadata[:-1].encode(), b', "result": ', ranking.body, b"}"))
+
+    def render_index(self) -> bytes:
+        now = self.clock()
+        return json.dumps([ranking.metadata(now, self.interval) for ranking in self.rankings.values()]).encode()
+
+
+def create_handler(service: RankingService) -> type[BaseHTTPRequestHandler]:
+    class RankingHandler(BaseHTTPRequestHandler):
+        """
+        GET /rankings lists all rankings with their staleness, GET /rankings/{subreddit}/{mode} returns one.
+
+        """
+        def do_GET(self) -> None:
+            match self.path.strip("/").split("/"):
+                case ["rankings"]:
+                    self._send(HTTPStatus.OK, service.render_index())
+                case ["rankings", subreddit, mode] if (body := service.render(subreddit, mode)) is not None:
+                    self._send(HTTPStatus.OK, body)
+                case ["health"]:
+                    self._send(HTTPStatus.OK, b'{"status": "ok"}')
+                case _:
+                    self._send(HTTPStatus.NOT_FOUND, b'{"error": "Not found"}')
+
+        def _send(self, status: HTTPStatus, body: bytes) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return RankingHandler
+
+
+def serve(service: RankingService, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> None:
+    server = ThreadingHTTPServer((host, port), create_handler(service))
+    service.start()
+    print(f"Serving rankings on http://{host}:{server.server_address[1]}/rankings")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
@@ -0,0 +1,271 @@
+"""
+Durable work queue which spreads comment fetching of top_users runs over worker processes.
+
+The coordinator lists links of a subreddit, counts post authors and puts the links with comments into
+a SQLite queue as a job. Workers, in other processes or on other hosts sharing the path, claim links
+under a lease, fetch their comment trees and store the author counts. A worker which crashes leaves
+its lease to expire, after which the link is claimed again. Once every link of the job is done, the
+counts are merged in link order, so the result is the same TopUsersSearcher would have returned.
+
+The database doesn't use WAL, which doesn't work on network filesystems, and leases are compared
+with the wall clock of each host, so hosts sharing a queue should keep their clocks in sync.
+
+"""
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import httpx
+
+from reddit_parser.aggregation import AuthorCount, count_authors, top_authors
+from reddit_parser.api import RedditApi, RedditApiError
+from reddit_parser.columns import EntityColumns
+from reddit_parser.models import RedditEntityKinds
+from reddit_parser.searcher import get_threshold, iter_commented_links
+
+DEFAULT_LEASE = 5 * 60
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 1.0
+LOCK_TIMEOUT = 60
+
+type CommentedLink = tuple[str, int | None]
+
+
+class WorkQueueError(Exception): pass
+
+
+@dataclass(slots=True)
+class WorkItem:
+    job: str
+    subreddit: str
+    position: int
+    link_id: str
+    num_comments: int | None
+    attempts: int
+
+
+class WorkQueue:
+    """
+    A link is leased for `lease` seconds when it's claimed. Links which were claimed `max_attempts` times
+    without being done are failed, so a link which crashes every worker doesn't stall the job forever.
+
+    """
+    def __init__(
+            self,
+            path: str,
+            lease: float = DEFAULT_LEASE,
+            max_attempts: int = MAX_ATTEMPTS,
+            clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._connection = sqlite3.connect(path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        with self._transaction() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job TEXT PRIMARY KEY, subreddit TEXT NOT NULL, created_at REAL NOT NULL, posts_authors TEXT NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                "job TEXT NOT NULL, position INTEGER NOT NULL, link_id TEXT NOT NULL, num_comments INTEGER, "
+                "state TEXT NOT NULL DEFAULT 'pending', owner TEXT, leased_until REAL NOT NULL DEFAULT 0, "
+                "attempts INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, PRIMARY KEY (job, position))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS items_state ON items (state, leased_until)")
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def create_job(self, subreddit_name: str, posts_authors: Counter[str], links: Iterable[CommentedLink]) -> str:
+        """
+        Replaces the previous job of the subreddit, if there was one. Every job gets a new id, so workers
+        still holding links of the replaced job can't complete or fail links of the new one.
+
+        """
+        job = f"{subreddit_name.lower()}-{uuid.uuid4().hex}"
+        with self._transaction() as connection:
+            connection.execute(
+                "DELETE FROM items WHERE job IN (SELECT job FROM jobs WHERE lower(subreddit) = ?)",
+                (subreddit_name.lower(),),
+            )
+            connection.execute("DELETE FROM jobs WHERE lower(subreddit) = ?", (subreddit_name.lower(),))
+            connection.execute(
+                "INSERT INTO jobs (job, subreddit, created_at, posts_authors) VALUES (?, ?, ?, ?)",
+                (job, subreddit_name, self._clock(), json.dumps(list(posts_authors.items()))),
+            )
+            connection.executemany(
+                "INSERT INTO items (job, position, link_id, num_comments) VALUES (?, ?, ?, ?)",
+                ((job, position, link_id, num_comments) for position, (link_id, num_comments) in enumerate(links)),
+            )
+        return job
+
+    def claim(self, worker: str, limit: int = 1) -> list[WorkItem]:
+        now = self._clock()
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE items SET state = 'failed', error = 'Lease expired too many times' "
+                "WHERE state = 'pending' AND leased_until <= ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            rows = connection.execute(
+                "SELECT items.job, jobs.subreddit, position, link_id, num_comments, attempts + 1 "
+                "FROM items JOIN jobs USING (job) WHERE state = 'pending' AND leased_until <= ? "
+                "ORDER BY jobs.created_at, position LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE items SET owner = ?, leased_until = ?, attempts = attempts + 1 WHERE job = ? AND position = ?",
+                ((worker, now + self.lease, row[0], row[2]) for row in rows),
+            )
+        return [WorkItem(*row) for row in rows]
+
+    def complete(self, item: WorkItem, comments_authors: Counter[str]) -> None:
+        """
+        A link done by a worker whose lease has expired in the meantime is still accepted,
+        the counts of a link don't depend on who fetched it.
+
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE items SET state = 'done', owner = NULL, result = ? "
+                "WHERE job = ? AND position = ? AND state = 'pending'",
+                (json.dumps(list(comments_authors.items())), item.job, item.position),
+            )
+
+    def fail(self, item: WorkItem, error: str) -> None:
+        """
+        Releases the link to be retried at once, or fails it when it has used up its attempts.
+
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE items SET owner = NULL, leased_until = 0, error = ?, "
+                "state = CASE WHEN attempts >= ? THEN 'failed' ELSE state END "
+                "WHERE job = ? AND position = ? AND state = 'pending'",
+                (error, self.max_attempts, item.job, item.position),
+            )
+
+    def progress(self, job: str | None = None) -> Counter[str]:
+        """
+        Counts of pending, leased, done and failed links of the job, or of all jobs.
+
+        """
+        rows = self._connection.execute(
+            "SELECT CASE WHEN state = 'pending' AND leased_until > ? THEN 'leased' ELSE state END, COUNT(*) "
+            "FROM items WHERE ? IS NULL OR job = ? GROUP BY 1",
+            (self._clock(), job, job),
+        ).fetchall()
+        return Counter(dict(rows))
+
+    def merge(self, job: str, top: int | None = None) -> dict[str, list[AuthorCount]]:
+        if (row := self._connection.execute("SELECT posts_authors FROM jobs WHERE job = ?", (job,)).fetchone()) is None:
+            raise WorkQueueError(f"Unknown job {job}.")
+        progress = self.progress(job)
+        if unfinished := progress["pending"] + progress["leased"] + progress["failed"]:
+            error = self._connection.execute(
+                "SELECT error FROM items WHERE job = ? AND state = 'failed' LIMIT 1", (job,),
+            ).fetchone()
+            raise WorkQueueError(f"{unfinished} links of {job} are not done" + (f": {error[0]}" if error else "."))
+        comments_authors: Counter[str] = Counter()
+        for (result,) in self._connection.execute("SELECT result FROM items WHERE job = ? ORDER BY position", (job,)):
+            comments_authors.update(dict(json.loads(result)))
+        return {
+            "top_users_by_posts": top_authors(Counter(dict(json.loads(row[0]))), top),
+            "top_users_by_comments": top_authors(comments_authors, top),
+        }
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # Taking the write lock at once keeps concurrent claims from reading the same free links.
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._connection
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+
+class QueueCoordinator:
+    """
+    Same rating as TopUsersSearcher, but comment trees are fetched by QueueWorker processes.
+
+    """
+    def __init__(
+            self,
+            api: RedditApi,
+            queue: WorkQueue,
+            top: int | None = None,
+            clock: Callable[[], float] = time.time,
+            poll_interval: float = POLL_INTERVAL,
+    ) -> None:
+        self.api = api
+        self.queue = queue
+        self.top = top
+        self.clock = clock
+        self.poll_interval = poll_interval
+
+    def enqueue(self, subreddit_name: str, days: int = 3) -> str:
+        links = EntityColumns(RedditEntityKinds.link)
+        for page in self.api.subreddits.iter_new(subreddit_name, get_threshold(days, self.clock())):
+            links.extend(page)
+        return self.queue.create_job(subreddit_name, count_authors(links), iter_commented_links(links))
+
+    def wait(self, job: str) -> None:
+        while (progress := self.queue.progress(job))["pending"] + progress["leased"]:
+            time.sleep(self.poll_interval)
+
+    def process(self, subreddit_name: str, days: int = 3) -> dict[str, list[AuthorCount]]:
+        job = self.enqueue(subreddit_name, days)
+        self.wait(job)
+        return self.queue.merge(job, self.top)
+
+
+class QueueWorker:
+    def __init__(
+            self,
+            api: RedditApi,
+            queue: WorkQueue,
+            worker_id: str | None = None,
+            batch_size: int = 1,
+            poll_interval: float = POLL_INTERVAL,
+    ) -> None:
+        self.api = api
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+    def run_once(self) -> int:
+        items = self.queue.claim(self.worker_id, self.batch_size)
+        for item in items:
+            try:
+                comments = self.api.subreddits.iter_comments(item.subreddit, item.link_id, item.num_comments)
+                self.queue.complete(item, count_authors(comments))
+            except (RedditApiError, httpx.HTTPError) as error:
+                self.queue.fail(item, f"{type(error).__name__}: {error}")
+        return len(items)
+
+    def run(self, wait: bool = False) -> int:
+        """
+        Works until no link is left unfinished, including links leased by other workers, which may crash.
+        With `wait` keeps polling for new jobs instead.
+
+        """
+        processed = 0
+        while True:
+            if claimed := self.run_once():
+                processed += claimed
+                continue
+            progress = self.queue.progress()
+            if not wait and not progress["pending"] + progress["leased"]:
+                return processed
+            time.sleep(self.poll_interval)
@@ -0,0 +1,118 @@
+"""
+Writers of search results.
+
+Results are written record by record into a temporary file which replaces the target once it's complete,
+so a crashed run never leaves a truncated result behind. Ratings of several kinds, e.g. top_users results,
+are flattened into records with a `rating` field in every format except JSON.
+
+"""
+import csv
+import json
+import os
+import textwrap
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from enum import StrEnum
+from itertools import islice
+from typing import Any, TextIO
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None  # type: ignore[assignment]
+
+PARQUET_BATCH_SIZE = 10_000
+
+type Result = Mapping[str, Iterable[Mapping[str, Any]]] | Iterable[Mapping[str, Any]]
+
+
+class OutputFormat(StrEnum):
+    JSON = "json"
+    NDJSON = "ndjson"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+
+def iter_records(result: Result) -> Iterator[Mapping[str, Any]]:
+    if isinstance(result, Mapping):
+        for rating, records in result.items():
+            for record in records:
+                yield {"rating": rating, **record}
+    else:
+        yield from result
+
+
+def write_json(file: TextIO, result: Result) -> None:
+    """
+    Same document json.dumps(result, indent=4) makes, but lists are written one item at a time.
+
+    """
+    if isinstance(result, Mapping):
+        file.writelines(json.JSONEncoder(indent=4).iterencode(result))
+        return
+    separator = "[\n"
+    for record in result:
+        file.write(separator)
+        file.write(textwrap.indent(json.dumps(record, indent=4), "    "))
+        separator = ",\n"
+    file.write("[]" if separator == "[\n" else "\n]")
+
+
+def write_ndjson(file: TextIO, result: Result) -> None:
+    for record in iter_records(result):
+        file.write(json.dumps(record))
+        file.write("\n")
+
+
+def write_csv(file: TextIO, result: Result) -> None:
+    records = iter_records(result)
+    if (first := next(records, None)) is None:
+        return
+    writer = csv.DictWriter(file, fieldnames=list(first), extrasaction="ignore")
+    writer.writeheader()
+    writer.writerow(first)
+    writer.writerows(records)
+
+
+def is_available(output_format: OutputFormat) -> bool:
+    return output_format != OutputFormat.PARQUET or pyarrow is not None
+
+
+def write_parquet(path: str, result: Result) -> None:
+    if pyarrow is None:
+        raise RuntimeError("Parquet output requires pyarrow, install the parquet extra.")
+    records = iter_records(result)
+    writer = None
+    try:
+        while batch := list(islice(records, PARQUET_BATCH_SIZE)):
+            table = pyarrow.Table.from_pylist(batch)
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+        if writer is None:
+            pyarrow.parquet.write_table(pyarrow.table({}), path)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+TEXT_WRITERS: dict[OutputFormat, Callable[[TextIO, Result], None]] = {
+    OutputFormat.JSON: write_json,
+    OutputFormat.NDJSON: write_ndjson,
+    OutputFormat.CSV: write_csv,
+}
+
+
+def write_result(path: str, result: Result, output_format: OutputFormat = OutputFormat.JSON) -> None:
+    temporary_path = f"{path}.tmp"
+    try:
+        if output_format == OutputFormat.PARQUET:
+            write_parquet(temporary_path, result)
+        else:
+            with open(temporary_path, "w", newline="" if output_format == OutputFormat.CSV else None) as file:
+                TEXT_WRITERS[output_format](file, result)
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
@@ -1,7 +1,9 @@
 import time
+from collections.abc import AsyncIterator, Iterator
 from typing import Any
 
 from reddit_parser.models import RedditEntity
+from reddit_parser.pagination import paginate, apaginate
 
 
 class MockRedditUser:
@@ -26,7 +28,9 @@ class MockRedditSubreddits:
         for item in self.get_comments_responses:
             yield item
 
-    def get_top(self, subreddit_name: str, before: str = None) -> list[RedditEntity]:
+    def get_top(
+            self, subreddit_name: str, before: str = None, after: str = None, time_filter: str = "all",
+    ) -> list[RedditEntity]:
         result = []
         for x in self.get_top_responses:
             x["created"] = time.time()
@@ -43,7 +47,7 @@ class MockRedditSubreddits:
             pass
         return result
 
-    def get_comments(self, subreddit_name: str, article: str) -> list[RedditEntity]:
+    def get_comments(self, subreddit_name: str, article: str, expected: int = None) -> list[RedditEntity]:
         result = []
         try:
             for x in next(self.get_comments_responses_generator):
@@ -53,8 +57,119 @@ class MockRedditSubreddits:
             pass
         return result
 
+    def iter_new(self, subreddit_name: str, threshold: float, after: str = None) -> Iterator[list[RedditEntity]]:
+        return paginate(lambda cursor: self.get_new(subreddit_name, after=cursor), threshold, after=after)
+
+    def iter_comments(self, subreddit_name: str, article: str, expected: int = None) -> Iterator[RedditEntity]:
+        return iter(self.get_comments(subreddit_name, article))
+
 
 class MockRedditApi:
     def __init__(self, user_mock: MockRedditUser, subreddits_mock: MockRedditSubreddits) -> None:
         self.user = user_mock
         self.subreddits = subreddits_mock
+
+
+class AsyncMockRedditSubreddits:
+    def __init__(self, subreddits_mock: MockRedditSubreddits) -> None:
+        self.subreddits_mock = subreddits_mock
+
+    async def get_top(
+            self, subreddit_name: str, before: str = None, after: str = None, time_filter: str = "all",
+    ) -> list[RedditEntity]:
+        return self.subreddits_mock.get_top(subreddit_name, before=before, after=after, time_filter=time_filter)
+
+    async def get_new(self, subreddit_name: str, before: str = None, after: str = None) -> list[RedditEntity]:
+        return self.subreddits_mock.get_new(subreddit_name, before=before, after=after)
+
+    def iter_new(
+            self, subreddit_name: str, threshold: float, after: str = None,
+    ) -> AsyncIterator[list[RedditEntity]]:
+        return apaginate(lambda cursor: self.get_new(subreddit_name, after=cursor), threshold, after=after)
+
+    async def get_comments(self, subreddit_name: str, article: str, expected: int = None) -> list[RedditEntity]:
+        return self.subreddits_mock.get_comments(subreddit_name, article)
+
+
+class AsyncMockRedditApi:
+    def __init__(self, subreddits_mock: AsyncMockRedditSubreddits) -> None:
+        self.subreddits = subreddits_mock
+
+
+def make_entity(
+        kind: str, entity_id: str, author: str, created: float, score: int = 1, num_comments: int = None,
+        link_id: str = None,
+) -> RedditEntity:
+    return RedditEntity(
+        id=entity_id, name=f"{kind}_{entity_id}", author=author, created=created, score=score, kind=kind,
+        num_comments=num_comments, link_id=link_id,
+    )
+
+
+class StaticMockRedditSubreddits:
+    """
+    Serves fixed links and comments, paginates /new, /top and the comment stream by `after` like Reddit does
+    and records calls. The comment stream ends after `stream_size` comments, /top after `listing_size` links.
+
+    """
+    def __init__(
+            self,
+            links: list[RedditEntity],
+            comments: dict[str, list[RedditEntity]],
+            page_size: int = 100,
+            stream_size: int = 1000,
+            listing_size: int = 1000,
+    ) -> None:
+        self.links = links
+        self.comments = comments
+        self.page_size = page_size
+        self.stream_size = stream_size
+        self.listing_size = listing_size
+        self.calls: list[tuple[str, Any]] = []
+
+    def get_new(self, subreddit_name: str, before: str = None, after: str = None) -> list[RedditEntity]:
+        self.calls.append(("get_new", after))
+        return self._get_page(self.links, after)
+
+    def get_top(
+            self, subreddit_name: str, before: str = None, after: str = None, time_filter: str = "all",
+    ) -> list[RedditEntity]:
+        self.calls.append(("get_top", time_filter))
+        links = sorted(self.links, key=lambda x: x.score, reverse=True)[:self.listing_size]
+        start = 0
+        if after:
+            start = next(index for index, link in enumerate(links) if link.name == after) + 1
+        return links[start:start + self.page_size]
+
+    def get_subreddit_comments(self, subreddit_name: str, after: str = None) -> list[RedditEntity]:
+        self.calls.append(("get_subreddit_comments", after))
+        comments = sorted(
+            (comment for comments in self.comments.values() for comment in comments),
+            key=lambda x: x.created, reverse=True,
+        )
+        return self._get_page(comments[:self.stream_size], after)
+
+    def iter_subreddit_comments(self, subreddit_name: str, threshold: float) -> Iterator[list[RedditEntity]]:
+        return paginate(lambda after: self.get_subreddit_comments(subreddit_name, after=after), threshold)
+
+    def _get_page(self, entities: list[RedditEntity], after: str | None) -> list[RedditEntity]:
+        entities = sorted(entities, key=lambda x: x.created, reverse=True)
+        start = 0
+        if after:
+            start = next(index for index, entity in enumerate(entities) if entity.name == after) + 1
+        return entities[start:start + self.page_size]
+
+    def get_comments(self, subreddit_name: str, article: str, expected: int = None) -> list[RedditEntity]:
+        self.calls.append(("get_comments", article))
+        return list(self.comments.get(article, []))
+
+    def iter_new(self, subreddit_name: str, threshold: float, after: str = None) -> Iterator[list[RedditEntity]]:
+        return paginate(lambda cursor: self.get_new(subreddit_name, after=cursor), threshold, after=after)
+
+    def iter_comments(self, subreddit_name: str, article: str, expected: int = None) -> Iterator[RedditEntity]:
+        return iter(self.get_comments(subreddit_name, article))
+
+    def get_comment_counts(self, fullnames: list[str]) -> dict[str, int]:
+        self.calls.append(("get_comment_counts", len(fullnames)))
+        links = {link.name: link for link in self.links}
+        return {name: len(self.comments.get(links[name].id, [])) for name in fullnames if name in links}
@@ -1,7 +1,9 @@
 import pytest
 
-from reddit_parser.searcher import TopUsersSearcher
-from tests.mocks.api_mocks import MockRedditApi, MockRedditUser, MockRedditSubreddits
+from reddit_parser.searcher import TopUsersSearcher, AsyncTopUsersSearcher
+from tests.mocks.api_mocks import (
+    MockRedditApi, MockRedditUser, MockRedditSubreddits, AsyncMockRedditApi, AsyncMockRedditSubreddits,
+)
 from tests.mocks.mock_data import REDDIT_SUBREDDITS_GET_NEW_1, REDDIT_SUBREDDITS_GET_COMMENTS_1
 
 
@@ -19,3 +21,8 @@ def api_mock_positive() -> MockRedditApi:
 @pytest.fixture
 def top_users_searcher_positive(api_mock_positive) -> TopUsersSearcher:
     return TopUsersSearcher(api_mock_positive)
+
+
+@pytest.fixture
+def async_top_users_searcher_positive(api_mock_positive) -> AsyncTopUsersSearcher:
+    return AsyncTopUsersSearcher(AsyncMockRedditApi(AsyncMockRedditSubreddits(api_mock_positive.subreddits)))
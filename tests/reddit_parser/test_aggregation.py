@@ -0,0 +1,19 @@
+from collections import Counter
+from operator import itemgetter
+
+from reddit_parser.aggregation import select_top, top_authors
+
+
+class TestTopAuthors:
+    def test_ties_keep_counting_order(self):
+        counts = Counter(["bob", "alice", "carol", "alice", "dave", "carol"])
+        assert top_authors(counts, top=3) == [
+            {"author": "alice", "count": 2}, {"author": "carol", "count": 2}, {"author": "bob", "count": 1},
+        ]
+        assert top_authors(counts) == top_authors(counts, top=len(counts))
+
+
+def test_select_top():
+    items = [("a", 5), ("b", 9), ("c", 1), ("d", 9), ("e", 7)]
+    assert select_top(items, itemgetter(1), top=3) == [("b", 9), ("d", 9), ("e", 7)]
+    assert [name for name, _ in select_top(items, itemgetter(1))] == ["b", "d", "e", "a", "c"]
@@ -0,0 +1,78 @@
+import httpx
+
+from reddit_parser.api import RedditSubreddits, get_time_filter
+
+
+def comment(comment_id: str, author: str, replies: list[dict] = None) -> dict:
+    return {
+        "kind": "t1",
+        "data": {
+            "id": comment_id, "name": f"t1_{comment_id}", "author": author, "created": 1.0, "score": 1,
+            "replies": {"kind": "Listing", "data": {"children": replies}} if replies else "",
+        },
+    }
+
+
+def more(children: list[str], parent_id: str = "t3_abc") -> dict:
+    return {"kind": "more", "data": {"children": children, "parent_id": parent_id, "count": len(children)}}
+
+
+def listing(children: list[dict]) -> dict:
+    return {"kind": "Listing", "data": {"children": children}}
+
+
+class TestRedditSubredditsComments:
+    def test_whole_tree_is_walked_and_stubs_are_expanded(self):
+        more_ids = [f"m{index}" for index in range(150)]
+        tree = [
+            listing([]),
+            listing([
+                comment("c1", "alice", replies=[comment("c2", "bob", replies=[comment("c3", "carol")])]),
+                comment("c4", "dave", replies=[more([], parent_id="t1_c4")]),
+                more(more_ids),
+            ]),
+        ]
+        continued = [listing([]), listing([comment("c4", "dave", replies=[comment("c5", "erin")])])]
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.url.path == "/api/morechildren":
+                ids = request.url.params["children"].split(",")
+                things = [comment(comment_id, "frank") for comment_id in ids]
+                return httpx.Response(200, json={"json": {"errors": [], "data": {"things": things}}})
+            if request.url.params.get("comment") == "c4":
+                return httpx.Response(200, json=continued)
+            return httpx.Response(200, json=tree)
+
+        client = httpx.Client(base_url="https://oauth.reddit.com", transport=httpx.MockTransport(handler))
+        comments = RedditSubreddits(client).get_comments("python", "abc")
+
+        assert [x.author for x in comments[:5]] == ["alice", "bob", "carol", "dave", "frank"]
+        assert [x.id for x in comments if x.author == "frank"] == more_ids
+        assert comments[-1].author == "erin"
+        assert len(comments) == 5 + 150
+        assert [request.url.path for request in requests] == [
+            "/r/python/comments/abc", "/api/morechildren", "/api/morechildren", "/r/python/comments/abc",
+        ]
+        assert len(requests[1].url.params["children"].split(",")) == 100
+
+    def test_first_tree_is_sized_by_expected_count(self):
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json=[listing([]), listing([comment("c1", "alice")])])
+
+        client = httpx.Client(base_url="https://oauth.reddit.com", transport=httpx.MockTransport(handler))
+        RedditSubreddits(client).get_comments("python", "abc", expected=20)
+        RedditSubreddits(client).get_comments("python", "abc", expected=5000)
+        RedditSubreddits(client).get_comments("python", "abc")
+
+        assert [request.url.params.get("limit") for request in requests] == ["30", "500", None]
+
+
+def test_get_time_filter():
+    assert [get_time_filter(days) for days in (1, 3, 7, 8, 28, 365, 366)] == [
+        "day", "week", "week", "month", "month", "year", None,
+    ]
@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+from benchmarks.bench_searchers import AUTH_CONFIG, BASE_URL
+from benchmarks.synthetic import SubredditShape, SyntheticReddit, SyntheticSubreddit
+from reddit_parser.__main__ import get_clock, run_batch
+from reddit_parser.api import RedditApi
+from reddit_parser.archive import Archive, RecordingTransport, ReplayTransport
+from reddit_parser.ratelimit import UnlimitedBucket
+from reddit_parser.searcher import TopUsersSearcher
+
+
+class TestArchive:
+    def test_entries_survive_reopening(self, tmp_path):
+        with Archive(str(tmp_path), writable=True) as archive:
+            archive.append("GET /r/python/new?limit=100", 200, "application/json", b'{"first": 1}')
+            archive.append("GET /r/python/new?limit=100", 200, "application/json", b'{"second": 2}')
+            archive.append("GET /api/info?id=t3_a", 200, "application/json", b"{}")
+            recorded_at = archive.recorded_at
+
+        with Archive(str(tmp_path)) as archive:
+            assert len(archive) == 2
+            assert archive.get("GET /r/python/new?limit=100")[1] == b'{"second": 2}'
+            assert archive.get("GET /r/rust/new?limit=100") is None
+            with pytest.raises(ValueError, match="read-only"):
+                archive.append("GET /r/rust/new?limit=100", 200, "application/json", b"{}")
+            assert archive.recorded_at == recorded_at
+
+    def test_entries_are_appended_and_read_from_threads(self, tmp_path):
+        # Sessions of a pool share the archive, one thread per worker.
+        def run(target, archive: Archive) -> None:
+            threads = [threading.Thread(target=target, args=(archive, thread)) for thread in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        def append(archive: Archive, thread: int) -> None:
+            for index in range(100):
+                archive.append(f"GET /r/python/comments/{thread}x{index}?", 200, "application/json", b"%d" % index * 50)
+
+        def read(archive: Archive, thread: int) -> None:
+            for index in range(100):
+                if archive.get(f"GET /r/python/comments/{thread}x{index}?")[1] != b"%d" % index * 50:
+                    mismatches.append((thread, index))
+
+        mismatches: list[tuple[int, int]] = []
+        with Archive(str(tmp_path), writable=True) as archive:
+            run(append, archive)
+        with Archive(str(tmp_path)) as archive:
+            assert len(archive) == 800
+            run(read, archive)
+        assert mismatches == []
+
+    def test_recorded_crawl_is_replayed_without_network(self, tmp_path):
+        server = SyntheticReddit([SyntheticSubreddit("python", SubredditShape(days=1, links_per_day=20))])
+        with Archive(str(tmp_path), writable=True) as archive:
+            api = RedditApi(BASE_URL, AUTH_CONFIG, network=RecordingTransport(archive, server))
+            recorded = TopUsersSearcher(api).process("python", days=1)
+        requests = sum(server.requests.values())
+
+        with Archive(str(tmp_path)) as archive:
+            replay = ReplayTransport(archive)
+            api = RedditApi(BASE_URL, AUTH_CONFIG, network=replay, limiter=UnlimitedBucket())
+            replayed = TopUsersSearcher(api, clock=lambda: archive.recorded_at).process("python", days=1)
+
+        assert replayed == recorded
+        assert replay.misses == 0
+        assert sum(server.requests.values()) == requests
+
+    def test_subreddits_are_replayed_from_their_own_start(self, tmp_path):
+        # The second subreddit is crawled well after the recording started.
+        started = 1_000_000.0
+        now = [started]
+        subreddits = [
+            SyntheticSubreddit(name, SubredditShape(days=2, links_per_day=48), now=started + offset)
+            for name, offset in (("python", 0), ("rust", 2000))
+        ]
+        recorded: dict[str, dict] = {}
+        with Archive(str(tmp_path), writable=True, clock=lambda: now[0]) as archive:
+            api = RedditApi(BASE_URL, AUTH_CONFIG, network=RecordingTransport(archive, SyntheticReddit(subreddits)))
+            process = TopUsersSearcher(api, clock=get_clock(archive)).process
+            run_batch(process, ["python"], 1, recorded.__setitem__)
+            now[0] += 2000
+            run_batch(process, ["rust"], 1, recorded.__setitem__)
+
+        replayed: dict[str, dict] = {}
+        with Archive(str(tmp_path)) as archive:
+            replay = ReplayTransport(archive)
+            api = RedditApi(BASE_URL, AUTH_CONFIG, network=replay, limiter=UnlimitedBucket())
+            process = TopUsersSearcher(api, clock=get_clock(archive)).process
+            run_batch(process, ["python", "rust"], 1, replayed.__setitem__)
+
+        assert replayed == recorded
+        assert replay.misses == 0
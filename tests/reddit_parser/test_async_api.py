@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import httpx
+
+from reddit_parser.__main__ import BatchReport, run_async_batch
+from reddit_parser.async_api import AsyncRedditApi, AsyncTransport
+from reddit_parser.config import AuthConfig
+from reddit_parser.network import RetryPolicy
+from reddit_parser.planning import CommentsStrategy
+from reddit_parser.ratelimit import AsyncRequestLimiter, TokenBucket
+from reddit_parser.searcher import AsyncTopUsersSearcher
+
+AUTH_CONFIG = AuthConfig(app_id="id", secret="secret", username="user", password="password", auth_url="")
+NO_BACKOFF = RetryPolicy(attempts=3, backoff=0)
+
+
+def thing(kind: str, thing_id: str, author: str, created: float, **data) -> dict:
+    return {"kind": kind, "data": {
+        "id": thing_id, "name": f"{kind}_{thing_id}", "author": author, "created": created, "score": 1, **data,
+    }}
+
+
+def listing(children: list[dict]) -> dict:
+    return {"kind": "Listing", "data": {"after": None, "children": children}}
+
+
+class SubredditStub:
+    """
+    Serves /new with a few links per subreddit, comment trees with one comment and a gateway error page
+    for `failing` trees.
+
+    """
+    def __init__(self, failing: set[str] = frozenset(), latency: float = 0.0) -> None:
+        self.failing = failing
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            return self._respond(request)
+        finally:
+            self.in_flight -= 1
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        match request.url.path.strip("/").split("/"):
+            case ["api", "v1", "access_token"]:
+                return httpx.Response(200, json={"access_token": "token", "expires_in": 3600})
+            case ["r", subreddit, "new"]:
+                if request.url.params.get("after"):
+                    return httpx.Response(200, json=listing([]))
+                now = time.time()
+                links = [
+                    thing("t3", f"{subreddit}{index}", f"author{index}", now - 60 * index, num_comments=1)
+                    for index in range(1, 5)
+                ]
+                return httpx.Response(200, json=listing(links))
+            case ["r", _, "comments", article]:
+                if article in self.failing:
+                    return httpx.Response(502, text="<html><body><h1>502 Bad Gateway</h1></body></html>")
+                tree = [listing([]), listing([thing("t1", f"{article}c", f"commenter_{article}", time.time())])]
+                return httpx.Response(200, json=tree)
+        return httpx.Response(404, json={"message": "Not Found", "error": 404})
+
+
+class TestAsyncTransport:
+    def test_transient_failures_are_retried(self):
+        outcomes = [503, 429, 200]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            status = outcomes.pop(0)
+            return httpx.Response(status, headers={"Retry-After": "0"} if status == 429 else {})
+
+        transport = AsyncTransport(
+            AsyncRequestLimiter(TokenBucket(capacity=100)), network=httpx.MockTransport(handler), retry=NO_BACKOFF,
+        )
+        request = httpx.Request("GET", "https://oauth.reddit.com/r/python/new")
+        assert asyncio.run(transport.handle_async_request(request)).status_code == 200
+        assert transport.retries == {"503": 1, "429": 1}
+
+    def test_requests_in_flight_are_bounded(self):
+        stub = SubredditStub(latency=0.01)
+        limiter = AsyncRequestLimiter(TokenBucket(capacity=100), max_in_flight=3)
+        transport = AsyncTransport(limiter, network=httpx.MockTransport(stub))
+
+        async def run() -> None:
+            await asyncio.gather(*(
+                transport.handle_async_request(httpx.Request("GET", "https://oauth.reddit.com/r/python/new"))
+                for _ in range(10)
+            ))
+
+        asyncio.run(run())
+        assert stub.max_in_flight == 3
+
+
+class TestAsyncRedditApi:
+    def test_links_are_listed(self):
+        async def run() -> list[str]:
+            async with AsyncRedditApi(
+                    "https://oauth.reddit.com", AUTH_CONFIG, network=httpx.MockTransport(SubredditStub()),
+            ) as api:
+                await api.authorize()
+                return [link.id for link in await api.subreddits.get_new("python")]
+
+        assert asyncio.run(run()) == ["python1", "python2", "python3", "python4"]
+
+    def test_failed_subreddit_does_not_hold_up_others(self, tmp_path):
+        # Paced requests of the failed subreddit are cancelled while they wait for the bucket.
+        stub = SubredditStub(failing={"bad1"})
+        report = BatchReport(str(tmp_path / "{subreddit}.json"), batch=True)
+
+        async def run() -> None:
+            async with AsyncRedditApi(
+                    "https://oauth.reddit.com",
+                    AUTH_CONFIG,
+                    max_in_flight=4,
+                    network=httpx.MockTransport(stub),
+                    retry=RetryPolicy(attempts=1),
+                    limiter=TokenBucket(capacity=1, rate=100),
+            ) as api:
+                await api.authorize()
+                searcher = AsyncTopUsersSearcher(api, strategy=CommentsStrategy.LINKS)
+                await asyncio.wait_for(run_async_batch(searcher.process, ["bad", "good"], 3, report), timeout=5)
+                assert api.limiter._semaphore._value == 4
+
+        asyncio.run(run())
+        assert report.failed == ["bad"]
+        assert "502 Bad Gateway" in report.messages[0]
+        assert (tmp_path / "good.json").exists()
@@ -0,0 +1,73 @@
+import os
+import stat
+
+import httpx
+
+from reddit_parser.api import RedditApi
+from reddit_parser.auth import Token, TokenStore
+from reddit_parser.config import AuthConfig
+
+AUTH_CONFIG = AuthConfig(app_id="id", secret="secret", username="user", password="password", auth_url="")
+
+
+class RedditStub:
+    def __init__(self) -> None:
+        self.issued = 0
+        self.valid_tokens: set[str] = set()
+        self.requests: list[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.path == "/api/v1/access_token":
+            self.issued += 1
+            self.valid_tokens = {f"token{self.issued}"}
+            return httpx.Response(200, json={"access_token": f"token{self.issued}", "expires_in": 3600})
+        if request.headers["Authorization"].removeprefix("bearer ") not in self.valid_tokens:
+            return httpx.Response(401, json={"message": "Unauthorized", "error": 401})
+        return httpx.Response(200, json={"name": "user"})
+
+
+class TestTokenStore:
+    def test_token_is_saved_readable_only_by_owner(self, tmp_path):
+        store = TokenStore(str(tmp_path / "token.json"))
+        store.save(AUTH_CONFIG, Token(access_token="token", expires_at=100.0))
+
+        assert store.load(AUTH_CONFIG) == Token(access_token="token", expires_at=100.0)
+        assert stat.S_IMODE(os.stat(tmp_path / "token.json").st_mode) == 0o600
+        assert TokenStore(str(tmp_path / "missing.json")).load(AUTH_CONFIG) is None
+
+
+class TestTokenAuth:
+    def test_stored_token_skips_authorization(self, tmp_path):
+        reddit = RedditStub()
+        store = TokenStore(str(tmp_path / "token.json"))
+        api = RedditApi("https://oauth.reddit.com", AUTH_CONFIG, network=httpx.MockTransport(reddit), token_store=store)
+        api.authorize()
+        api.user.get_me()
+
+        api = RedditApi("https://oauth.reddit.com", AUTH_CONFIG, network=httpx.MockTransport(reddit), token_store=store)
+        api.authorize()
+        api.user.get_me()
+
+        assert reddit.issued == 1
+
+    def test_rejected_token_is_refreshed_and_request_repeated(self):
+        reddit = RedditStub()
+        api = RedditApi("https://oauth.reddit.com", AUTH_CONFIG, network=httpx.MockTransport(reddit))
+        api.authorize()
+        reddit.valid_tokens.clear()
+
+        assert api.user.get_me() == {"name": "user"}
+        assert reddit.issued == 2
+        assert reddit.requests[-1].headers["Authorization"] == "bearer token2"
+
+    def test_expiring_token_is_refreshed_before_request(self):
+        reddit = RedditStub()
+        api = RedditApi("https://oauth.reddit.com", AUTH_CONFIG, network=httpx.MockTransport(reddit))
+        api.authorize()
+        api.auth.token.expires_at = api.auth.clock() + 10
+
+        api.user.get_me()
+
+        assert reddit.issued == 2
+        assert len(reddit.requests) == 3
@@ -0,0 +1,33 @@
+from benchmarks.bench_searchers import AUTH_CONFIG, BASE_URL, measure, run_mode
+from benchmarks.synthetic import SubredditShape, SyntheticReddit, SyntheticSubreddit
+from reddit_parser.api import RedditApi
+
+
+class TestSyntheticReddit:
+    def test_whole_comment_tree_is_fetched_through_api(self):
+        subreddit = SyntheticSubreddit("test", SubredditShape(days=1, links_per_day=10, visible_comments=3))
+        link = max(subreddit.links, key=lambda x: x.num_comments)
+        server = SyntheticReddit([subreddit])
+        api = RedditApi(base_url=BASE_URL, auth_config=AUTH_CONFIG, network=server)
+        api.authorize()
+
+        comments = api.subreddits.get_comments("test", link.id)
+
+        expected = subreddit.comments(link.id)
+        assert sorted(comment.id for comment in comments) == sorted(comment.id for comment in expected)
+        assert server.requests == {"access_token": 1, "comments": 1, "morechildren": 1}
+
+    def test_scenario_is_measured(self):
+        result = measure("small", "top_users_links", concurrency=1, memory=False)
+        assert result["requests_by_endpoint"]["comments"] > 0
+        assert result["requests"] == sum(result["requests_by_endpoint"].values())
+
+    def test_comment_stream_counts_like_comment_trees(self):
+        subreddit = SyntheticSubreddit("test", SubredditShape(days=1, links_per_day=20, comments_per_thread=5))
+        results = []
+        for mode in "top_users", "top_users_links":
+            server = SyntheticReddit([subreddit])
+            result = run_mode(mode, server, "test", days=1, concurrency=1, clock=lambda: subreddit.now)
+            results.append({x["author"]: x["count"] for x in result["top_users_by_comments"]})
+            assert ("comment_stream" in server.requests) == (mode == "top_users")
+        assert results[0] == results[1]
@@ -0,0 +1,70 @@
+import httpx
+
+from reddit_parser.api import RedditSubreddits
+from reddit_parser.cache import ResponseCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def comments_response(created: float) -> list[dict]:
+    link = {"kind": "t3", "data": {"id": "abc", "name": "t3_abc", "author": "op", "created": created, "score": 1}}
+    comment = {"kind": "t1", "data": {"id": "c1", "name": "t1_c1", "author": "someone", "created": created, "score": 1}}
+    return [
+        {"kind": "Listing", "data": {"children": [link]}},
+        {"kind": "Listing", "data": {"children": [comment]}},
+    ]
+
+
+class TestResponseCache:
+    def test_get_returns_stored_data_until_expiry(self, tmp_path):
+        clock = FakeClock()
+        cache = ResponseCache(str(tmp_path / "cache.sqlite"), clock=clock)
+        cache.set("/r/python/new", {"limit": 100}, {"data": [1, 2]}, ttl=10)
+        assert cache.get("/r/python/new", {"limit": 100}) == {"data": [1, 2]}
+        assert cache.get("/r/python/new", {"limit": 50}) is None
+        clock.now += 11
+        assert cache.get("/r/python/new", {"limit": 100}) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_least_recently_used_entries_are_evicted(self, tmp_path):
+        clock = FakeClock()
+        cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=25, clock=clock)
+        cache.set("/first", {}, "x" * 8)
+        clock.now += 1
+        cache.set("/second", {}, "y" * 8)
+        clock.now += 1
+        cache.get("/first", {})
+        cache.set("/third", {}, "z" * 8)
+        assert cache.get("/second", {}) is None
+        assert cache.get("/first", {}) == "x" * 8
+        assert cache.get("/third", {}) == "z" * 8
+
+    def test_comments_of_older_links_live_longer(self, tmp_path):
+        clock = FakeClock()
+        cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl=100, age_ttl_factor=0.5, max_ttl=1000, clock=clock)
+        assert cache.get_comments_ttl(comments_response(clock.now)) == 100
+        assert cache.get_comments_ttl(comments_response(clock.now - 1000)) == 600
+        assert cache.get_comments_ttl(comments_response(clock.now - 10_000)) == 1000
+
+
+class TestRedditSubredditsCache:
+    def test_comments_are_requested_once(self, tmp_path):
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json=comments_response(1_700_000_000.0))
+
+        client = httpx.Client(base_url="https://oauth.reddit.com", transport=httpx.MockTransport(handler))
+        subreddits = RedditSubreddits(client, cache=ResponseCache(str(tmp_path / "cache.sqlite")))
+        first = subreddits.get_comments("python", "abc")
+        second = subreddits.get_comments("python", "abc")
+        assert first == second
+        assert [x.author for x in first] == ["someone"]
+        assert len(requests) == 1
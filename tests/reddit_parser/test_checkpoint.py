@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+import pytest
+
+from reddit_parser.api import RedditApiError
+from reddit_parser.checkpoint import Checkpoint, CheckpointStore
+from reddit_parser.models import RedditEntity
+from reddit_parser.planning import CommentsStrategy
+from reddit_parser.searcher import AsyncTopUsersSearcher, TopUsersSearcher
+from tests.mocks.api_mocks import (
+    AsyncMockRedditApi, AsyncMockRedditSubreddits, MockRedditApi, MockRedditUser, StaticMockRedditSubreddits,
+    make_entity,
+)
+
+
+class FailingRedditSubreddits(StaticMockRedditSubreddits):
+    def __init__(self, *args, fail_on: str | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.fail_on = fail_on
+
+    def get_comments(self, subreddit_name: str, article: str, expected: int = None) -> list[RedditEntity]:
+        if article == self.fail_on:
+            self.fail_on = None
+            raise RedditApiError("Server error", 500)
+        return super().get_comments(subreddit_name, article, expected)
+
+
+def create_subreddits(now: float, fail_on: str | None = None) -> FailingRedditSubreddits:
+    links = [make_entity("t3", f"l{i}", f"author_{i % 3}", now - i * 60, num_comments=2) for i in range(6)]
+    comments = {
+        link.id: [make_entity("t1", f"{link.id}c{j}", f"author_{(i + j) % 4}", now) for j in range(2)]
+        for i, link in enumerate(links)
+    }
+    return FailingRedditSubreddits(links, comments, page_size=2, fail_on=fail_on)
+
+
+def create_searcher(subreddits: StaticMockRedditSubreddits, store: CheckpointStore, resume: bool = False):
+    return TopUsersSearcher(
+        MockRedditApi(MockRedditUser(), subreddits),
+        strategy=CommentsStrategy.LINKS,
+        checkpoints=store,
+        resume=resume,
+    )
+
+
+def create_async_searcher(subreddits: StaticMockRedditSubreddits, store: CheckpointStore, resume: bool = False):
+    return AsyncTopUsersSearcher(
+        AsyncMockRedditApi(AsyncMockRedditSubreddits(subreddits)),
+        strategy=CommentsStrategy.LINKS,
+        checkpoints=store,
+        resume=resume,
+    )
+
+
+class TestCheckpointStore:
+    def test_checkpoint_is_saved_and_loaded(self, tmp_path):
+        store = CheckpointStore(str(tmp_path))
+        checkpoint = Checkpoint("Python", 3, "top_users", 100.0, after="t3_b", processed=1)
+        checkpoint.links.extend([make_entity("t3", "a", "alice", 200.0, num_comments=2)])
+        checkpoint.comments_authors.update({"bob": 2, "alice": 1})
+        store.save(checkpoint)
+
+        loaded = store.load("python", 3, "top_users")
+        assert store.load("python", 7, "top_users") is None
+        assert list(loaded.links) == list(checkpoint.links)
+        assert list(loaded.comments_authors.items()) == [("bob", 2), ("alice", 1)]
+        assert (loaded.threshold, loaded.after, loaded.listed, loaded.processed) == (100.0, "t3_b", False, 1)
+
+        store.delete(checkpoint)
+        assert store.load("python", 3, "top_users") is None
+
+    def test_checkpoints_are_saved_once_per_interval(self, tmp_path):
+        now = [0.0]
+        store = CheckpointStore(str(tmp_path), interval=30, clock=lambda: now[0])
+        checkpoint = Checkpoint("python", 3, "top_users", 100.0)
+        other = Checkpoint("rust", 3, "top_users", 100.0)
+
+        assert not store.save_due(checkpoint)
+        now[0] = 20
+        assert not store.save_due(other)
+        now[0] = 30
+        assert store.save_due(checkpoint)
+        assert not store.save_due(checkpoint)
+        assert not store.save_due(other)
+        now[0] = 50
+        assert store.save_due(other)
+        assert store.load("python", 3, "top_users") is not None
+
+
+class TestResume:
+    def test_resumed_run_continues_interrupted_one(self, tmp_path):
+        now = time.time()
+        expected = create_searcher(create_subreddits(now), CheckpointStore(str(tmp_path / "full"))).process("python")
+
+        store = CheckpointStore(str(tmp_path))
+        subreddits = create_subreddits(now, fail_on="l3")
+        with pytest.raises(RedditApiError):
+            create_searcher(subreddits, store).process("python")
+        assert store.load("python", 3, "top_users").processed == 3
+
+        subreddits.calls.clear()
+        assert create_searcher(subreddits, store, resume=True).process("python") == expected
+        assert subreddits.calls == [("get_comments", "l3"), ("get_comments", "l4"), ("get_comments", "l5")]
+        assert store.load("python", 3, "top_users") is None
+
+    def test_listing_continues_from_cursor(self, tmp_path):
+        now = time.time()
+        store = CheckpointStore(str(tmp_path))
+        subreddits = create_subreddits(now)
+        checkpoint = Checkpoint("python", 3, "top_users", now - 3 * 86400, after="t3_l1")
+        checkpoint.links.extend(subreddits.links[:2])
+        store.save(checkpoint)
+
+        result = create_searcher(subreddits, store, resume=True).process("python")
+        assert [call for call in subreddits.calls if call[0] == "get_new"] == [
+            ("get_new", "t3_l1"), ("get_new", "t3_l3"), ("get_new", "t3_l5"),
+        ]
+        assert sum(author["count"] for author in result["top_users_by_posts"]) == 6
+
+    def test_run_without_resume_starts_over(self, tmp_path):
+        now = time.time()
+        store = CheckpointStore(str(tmp_path))
+        subreddits = create_subreddits(now, fail_on="l3")
+        with pytest.raises(RedditApiError):
+            create_searcher(subreddits, store).process("python")
+
+        subreddits.calls.clear()
+        create_searcher(subreddits, store).process("python")
+        assert ("get_new", None) in subreddits.calls
+        assert len([call for call in subreddits.calls if call[0] == "get_comments"]) == 6
+
+    def test_interrupted_async_run_is_resumed(self, tmp_path):
+        now = time.time()
+        expected = create_searcher(create_subreddits(now), CheckpointStore(str(tmp_path / "full"))).process("python")
+
+        store = CheckpointStore(str(tmp_path))
+        subreddits = create_subreddits(now, fail_on="l3")
+        with pytest.raises(RedditApiError):
+            asyncio.run(create_async_searcher(subreddits, store).process("python"))
+        assert store.load("python", 3, "top_users").processed == 3
+
+        subreddits.calls.clear()
+        assert asyncio.run(create_async_searcher(subreddits, store, resume=True).process("python")) == expected
+        assert subreddits.calls == [("get_comments", "l3"), ("get_comments", "l4"), ("get_comments", "l5")]
+        assert store.load("python", 3, "top_users") is None
+
+    def test_async_checkpoint_is_resumed_by_blocking_searcher(self, tmp_path):
+        now = time.time()
+        expected = create_searcher(create_subreddits(now), CheckpointStore(str(tmp_path / "full"))).process("python")
+
+        store = CheckpointStore(str(tmp_path))
+        subreddits = create_subreddits(now, fail_on="l1")
+        with pytest.raises(RedditApiError):
+            asyncio.run(create_async_searcher(subreddits, store).process("python"))
+
+        assert create_searcher(subreddits, store, resume=True).process("python") == expected
@@ -0,0 +1,39 @@
+import pytest
+
+from reddit_parser.aggregation import count_authors, top_rows_by_score
+from reddit_parser.columns import EntityColumns
+from tests.mocks.api_mocks import make_entity
+
+
+def make_links() -> list:
+    return [
+        make_entity("t3", "a", "alice", 100, score=5, num_comments=3),
+        make_entity("t3", "b", "bob", 90, score=9),
+        make_entity("t3", "c", "alice", 80, score=7, num_comments=0),
+    ]
+
+
+class TestEntityColumns:
+    def test_rows_are_dumped_like_models(self):
+        links = EntityColumns("t3")
+        links.extend(make_links())
+
+        assert [links.dump(index) for index in range(len(links))] == [link.model_dump() for link in make_links()]
+        assert [link.model_dump() for link in links] == [link.model_dump() for link in make_links()]
+        assert len(links.authors) == 2
+
+    def test_comments_keep_links(self):
+        comments = EntityColumns("t1")
+        comments.append(make_entity("t1", "x", "carol", 100, link_id="t3_a"))
+
+        assert comments.dump(0)["link_id"] == "t3_a"
+        with pytest.raises(ValueError):
+            comments.append(make_links()[0])
+
+
+def test_aggregations_run_on_columns():
+    links = EntityColumns("t3")
+    links.extend(make_links())
+
+    assert count_authors(links) == count_authors(make_links())
+    assert [links.get_id(index) for index in top_rows_by_score(links, top=2)] == ["b", "c"]
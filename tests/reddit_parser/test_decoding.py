@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from reddit_parser import decoding
+from reddit_parser.decoding import Comments, Listing, decode
+
+LINK = {"id": "abc", "name": "t3_abc", "author": "alice", "created": 1736000000, "score": 5,
+        "num_comments": 2, "selftext": "long text", "preview": {"images": []}}
+LISTING = json.dumps({
+    "kind": "Listing", "data": {"after": None, "dist": 1, "children": [{"kind": "t3", "data": LINK}]},
+})
+
+
+class TestDecode:
+    def test_only_schema_fields_are_decoded(self):
+        pytest.importorskip("msgspec")
+        result = decode(LISTING.encode(), Listing)
+        assert result["data"]["children"][0]["data"] == {
+            "id": "abc", "name": "t3_abc", "author": "alice", "created": 1736000000.0, "score": 5, "num_comments": 2,
+        }
+        assert "dist" not in result["data"]
+
+    def test_nested_replies_are_decoded(self):
+        reply = {"kind": "t1", "data": {"id": "c2", "author": "bob", "replies": "", "body": "text"}}
+        tree = [
+            {"kind": "Listing", "data": {"children": []}},
+            {"kind": "Listing", "data": {"children": [
+                {"kind": "t1", "data": {"id": "c1", "replies": {"kind": "Listing", "data": {"children": [reply]}}}},
+            ]}},
+        ]
+        result = decode(json.dumps(tree).encode(), Comments)
+        assert result[1]["data"]["children"][0]["data"]["replies"]["data"]["children"][0]["data"]["author"] == "bob"
+
+    def test_unexpected_response_falls_back_to_stdlib(self):
+        content = json.dumps({"kind": "Listing", "data": {"children": "unexpected"}}).encode()
+        assert decode(content, Listing) == json.loads(content)
+
+    def test_without_msgspec_stdlib_is_used(self, monkeypatch):
+        monkeypatch.setattr(decoding, "msgspec", None)
+        assert decode(LISTING.encode(), Listing) == json.loads(LISTING)
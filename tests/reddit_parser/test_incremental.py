@@ -0,0 +1,60 @@
+import time
+
+from reddit_parser.incremental import IncrementalTopUsersSearcher, StateStore
+from tests.mocks.api_mocks import MockRedditApi, MockRedditUser, StaticMockRedditSubreddits, make_entity
+
+HOUR = 60 * 60
+
+
+class TestIncrementalTopUsersSearcher:
+    def test_second_run_requests_only_changes(self, tmp_path):
+        now = time.time()
+        links = [
+            make_entity("t3", "a", "alice", now - HOUR),
+            make_entity("t3", "b", "bob", now - 2 * HOUR),
+            make_entity("t3", "c", "alice", now - 5 * 24 * HOUR),
+        ]
+        comments = {
+            "a": [make_entity("t1", "a1", "bob", now), make_entity("t1", "a2", "carol", now)],
+            "b": [make_entity("t1", "b1", "carol", now)],
+        }
+        subreddits = StaticMockRedditSubreddits(links, comments, page_size=2)
+        searcher = IncrementalTopUsersSearcher(MockRedditApi(MockRedditUser(), subreddits), StateStore(str(tmp_path)))
+
+        assert searcher.process("python", days=3) == {
+            "top_users_by_posts": [{"author": "alice", "count": 1}, {"author": "bob", "count": 1}],
+            "top_users_by_comments": [{"author": "carol", "count": 2}, {"author": "bob", "count": 1}],
+        }
+
+        subreddits.calls.clear()
+        links.append(make_entity("t3", "d", "dave", now))
+        comments["d"] = [make_entity("t1", "d1", "dave", now)]
+        comments["b"].append(make_entity("t1", "b2", "dave", now))
+        assert searcher.process("python", days=3) == {
+            "top_users_by_posts": [
+                {"author": "dave", "count": 1}, {"author": "alice", "count": 1}, {"author": "bob", "count": 1},
+            ],
+            "top_users_by_comments": [
+                {"author": "dave", "count": 2}, {"author": "carol", "count": 2}, {"author": "bob", "count": 1},
+            ],
+        }
+        assert subreddits.calls == [
+            ("get_new", None),
+            ("get_comment_counts", 3),
+            ("get_comments", "d"),
+            ("get_comments", "b"),
+        ]
+
+    def test_wider_window_lists_links_between_thresholds(self, tmp_path):
+        now = time.time()
+        links = [make_entity("t3", f"l{i}", f"author_{i}", now - i * 12 * HOUR) for i in range(9)]
+        subreddits = StaticMockRedditSubreddits(links, {}, page_size=2)
+        searcher = IncrementalTopUsersSearcher(MockRedditApi(MockRedditUser(), subreddits), StateStore(str(tmp_path)))
+
+        assert len(searcher.process("python", days=1)["top_users_by_posts"]) == 2
+        assert len(searcher.process("python", days=4)["top_users_by_posts"]) == 8
+
+        links.insert(0, make_entity("t3", "new", "newcomer", now))
+        subreddits.calls.clear()
+        assert len(searcher.process("python", days=4)["top_users_by_posts"]) == 9
+        assert [call for call in subreddits.calls if call[0] == "get_new"] == [("get_new", None)]
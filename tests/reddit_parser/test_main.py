@@ -0,0 +1,72 @@
+import json
+import sys
+
+import httpx
+import pytest
+
+from reddit_parser import writers
+from reddit_parser.__main__ import BatchReport, get_args, get_subreddits, run_batch
+from reddit_parser.api import RedditApi, RedditApiError
+from reddit_parser.auth import Token
+from reddit_parser.config import AuthConfig
+from reddit_parser.network import RetryPolicy
+from reddit_parser.searcher import TopLinksSearcher
+
+AUTH_CONFIG = AuthConfig(app_id="id", secret="secret", username="user", password="password", auth_url="")
+
+
+class TestBatch:
+    def test_failed_subreddit_does_not_abort_others(self, tmp_path):
+        def process(subreddit_name: str, days: int) -> dict:
+            if subreddit_name == "broken":
+                raise RedditApiError("Response failed with code 403.")
+            return {"subreddit": subreddit_name, "days": days}
+
+        report = BatchReport(str(tmp_path / "result.json"), batch=True)
+        run_batch(process, ["python", "broken", "rust"], 7, report)
+
+        assert report.failed == ["broken"]
+        assert json.loads((tmp_path / "result_rust.json").read_text()) == {"subreddit": "rust", "days": 7}
+        assert (tmp_path / "result_python.json").exists()
+        assert not (tmp_path / "result_broken.json").exists()
+
+    def test_gateway_error_with_html_body_fails_only_its_subreddit(self, tmp_path):
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.startswith("/r/broken/"):
+                return httpx.Response(502, text="<html><body><h1>502 Bad Gateway</h1></body></html>")
+            return httpx.Response(200, json={"kind": "Listing", "data": {"after": None, "children": []}})
+
+        network = httpx.MockTransport(handler)
+        api = RedditApi("https://oauth.reddit.com", AUTH_CONFIG, network=network, retry=RetryPolicy(attempts=1))
+        api.auth.token = Token(access_token="token", expires_at=float("inf"))
+        report = BatchReport(str(tmp_path / "result.json"), batch=True)
+        run_batch(lambda name, days: list(TopLinksSearcher(api).process(name, days)), ["broken", "rust"], 3, report)
+
+        assert report.failed == ["broken"]
+        assert "502 Bad Gateway" in report.messages[0]
+        assert json.loads((tmp_path / "result_rust.json").read_text()) == []
+
+    def test_filename_template(self):
+        assert BatchReport("out/{subreddit}.json", batch=True).get_filename("python") == "out/python.json"
+        assert BatchReport("result.json", batch=False).get_filename("python") == "result.json"
+
+    def test_subreddits_are_read_from_file(self, tmp_path):
+        path = tmp_path / "subreddits.txt"
+        path.write_text("# cron list\nr/python\n\nrust\npython\n")
+        assert get_subreddits(["golang"], str(path)) == ["golang", "python", "rust"]
+
+
+def test_parquet_without_pyarrow_is_rejected_before_the_run(monkeypatch, capsys):
+    monkeypatch.setattr(writers, "pyarrow", None)
+    monkeypatch.setattr(sys, "argv", ["reddit_parser", "python", "--format", "parquet"])
+    with pytest.raises(SystemExit):
+        get_args()
+    assert "requires pyarrow" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("rate", ["0", "-2"])
+def test_log_sample_rate_below_one_is_rejected(monkeypatch, capsys, rate):
+    monkeypatch.setattr(sys, "argv", ["reddit_parser", "python", "--log-sample-rate", rate])
+    with pytest.raises(SystemExit):
+        get_args()
+    assert "--log-sample-rate" in capsys.readouterr().err
@@ -0,0 +1,91 @@
+import asyncio
+
+import httpx
+
+from reddit_parser.api import RedditApi
+from reddit_parser.async_api import AsyncTransport
+from reddit_parser.config import AuthConfig
+from reddit_parser.metrics import Histogram, Metrics, endpoint_name
+from reddit_parser.ratelimit import AsyncRequestLimiter, UnlimitedBucket
+
+AUTH_CONFIG = AuthConfig(app_id="id", secret="secret", username="user", password="password", auth_url="")
+
+
+def listing_response(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/api/v1/access_token":
+        return httpx.Response(200, json={"access_token": "token", "expires_in": 86400})
+    link = {"kind": "t3", "data": {"id": "abc", "name": "t3_abc", "author": "alice", "created": 1.0, "score": 5}}
+    return httpx.Response(200, json={"kind": "Listing", "data": {"after": None, "children": [link]}})
+
+
+def comments_response(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/api/v1/access_token":
+        return httpx.Response(200, json={"access_token": "token", "expires_in": 86400})
+    comment = {"kind": "t1", "data": {"id": "c", "name": "t1_c", "author": "bob", "created": 1.0, "score": 1}}
+    return httpx.Response(200, json=[
+        {"kind": "Listing", "data": {"after": None, "children": []}},
+        {"kind": "Listing", "data": {"after": None, "children": [comment]}},
+    ])
+
+
+class TestMetrics:
+    def test_requests_are_counted_per_endpoint(self):
+        metrics = Metrics()
+        network = httpx.MockTransport(listing_response)
+        api = RedditApi("https://oauth.reddit.com", AUTH_CONFIG, network=network, metrics=metrics)
+
+        api.subreddits.get_new("python")
+        api.subreddits.get_new("rust")
+
+        summary = metrics.to_dict()
+        assert summary["requests"]["/r/{subreddit}/new"] == {"200": 2}
+        assert summary["latency"]["/r/{subreddit}/new"]["count"] == 2
+        assert summary["bytes_received"] > 0
+        assert set(summary["phase_seconds"]) == {"decode", "convert"}
+
+    def test_comment_trees_are_timed_as_conversion(self):
+        metrics = Metrics()
+        network = httpx.MockTransport(comments_response)
+        api = RedditApi("https://oauth.reddit.com", AUTH_CONFIG, network=network, metrics=metrics)
+
+        assert [comment.author for comment in api.subreddits.get_comments("python", "abc")] == ["bob"]
+        assert set(metrics.phases) == {"decode", "convert"}
+
+    def test_waits_for_a_request_slot_are_not_throttling(self):
+        async def respond(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(0.01)
+            return httpx.Response(200)
+
+        async def run() -> None:
+            await asyncio.gather(*(
+                transport.handle_async_request(httpx.Request("GET", "https://oauth.reddit.com/r/python/new"))
+                for _ in range(5)
+            ))
+
+        metrics = Metrics()
+        limiter = AsyncRequestLimiter(UnlimitedBucket(), max_in_flight=1)
+        transport = AsyncTransport(limiter, network=httpx.MockTransport(respond), metrics=metrics)
+        asyncio.run(run())
+        assert metrics.requests["/r/{subreddit}/new", 200] == 5
+        assert metrics.throttled == 0
+
+    def test_prometheus_histogram_is_cumulative(self):
+        metrics = Metrics()
+        metrics.observe_request("/api/info", 200, 0.07, 10)
+        metrics.observe_request("/api/info", 200, 20, 10)
+
+        text = metrics.to_prometheus()
+        assert 'reddit_parser_request_duration_seconds_bucket{endpoint="/api/info",le="0.05"} 0' in text
+        assert 'reddit_parser_request_duration_seconds_bucket{endpoint="/api/info",le="0.1"} 1' in text
+        assert 'reddit_parser_request_duration_seconds_bucket{endpoint="/api/info",le="+Inf"} 2' in text
+        assert 'reddit_parser_received_bytes_total 20' in text
+
+    def test_histogram_bounds_are_inclusive(self):
+        histogram = Histogram(buckets=(1.0, 2.0))
+        histogram.observe(1.0)
+        assert histogram.counts == [1, 0, 0]
+
+    def test_endpoint_name(self):
+        assert endpoint_name("/r/python/comments/abc") == "/r/{subreddit}/comments/{article}"
+        assert endpoint_name("/r/python/comments") == "/r/{subreddit}/comments"
+        assert endpoint_name("/api/morechildren") == "/api/morechildren"
@@ -0,0 +1,29 @@
+from reddit_parser.models import RedditEntity, TrustedRedditEntity, entity_from_api
+
+DATA = {"id": "c1", "name": "t1_c1", "author": "alice", "created": 1736000000.5, "score": 7, "body": "text"}
+
+
+class TestEntityFromApi:
+    def test_trusted_entity_has_fields_of_validated(self):
+        trusted = entity_from_api("t1", DATA)
+        validated = entity_from_api("t1", DATA, validate=True)
+        assert type(trusted) is TrustedRedditEntity and type(validated) is RedditEntity
+        assert trusted.model_dump() == validated.model_dump() == {
+            "id": "c1", "created": 1736000000.5, "name": "t1_c1", "author": "alice", "score": 7, "kind": "t1",
+            "num_comments": None, "edited": None, "link_id": None,
+        }
+
+    def test_trusted_entity_is_mutable(self):
+        entity = entity_from_api("t1", DATA)
+        entity.score = 8
+        assert entity.score == 8
+        assert not hasattr(entity, "__dict__")
+
+    def test_link_keeps_comment_count_and_edit_time(self):
+        link = entity_from_api("t3", {**DATA, "num_comments": 3, "edited": 1736000100.0})
+        assert (link.num_comments, link.edited) == (3, 1736000100.0)
+        assert entity_from_api("t3", {**DATA, "edited": False}).edited is None
+        assert entity_from_api("t3", {**DATA, "edited": False}, validate=True).edited is None
+
+    def test_fields_match_validated_model(self):
+        assert list(TrustedRedditEntity.__dataclass_fields__) == list(RedditEntity.model_fields)
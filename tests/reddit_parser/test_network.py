@@ -0,0 +1,65 @@
+import httpx
+import pytest
+
+from reddit_parser.api import Transport
+from reddit_parser.metrics import Metrics
+from reddit_parser.network import RetryPolicy
+from reddit_parser.ratelimit import TokenBucket
+
+NO_BACKOFF = RetryPolicy(attempts=3, backoff=0)
+
+
+def scripted(*outcomes: int | Exception) -> httpx.MockTransport:
+    remaining = list(outcomes)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        outcome = remaining.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, headers={"Retry-After": "0"} if outcome == 429 else {})
+
+    return httpx.MockTransport(handler)
+
+
+def send(transport: Transport) -> httpx.Response:
+    return transport.handle_request(httpx.Request("GET", "https://oauth.reddit.com/r/python/new"))
+
+
+class TestRetries:
+    def test_transient_failures_are_retried(self):
+        metrics = Metrics()
+        transport = Transport(
+            TokenBucket(capacity=100), network=scripted(429, 503, 200), retry=NO_BACKOFF, metrics=metrics,
+        )
+        assert send(transport).status_code == 200
+        assert transport.retries == {"429": 1, "503": 1}
+        assert metrics.retries == {"429": 1, "503": 1}
+
+    def test_network_errors_are_retried(self):
+        network = scripted(httpx.ConnectError("reset"), 200)
+        transport = Transport(TokenBucket(capacity=100), network=network, retry=NO_BACKOFF)
+        assert send(transport).status_code == 200
+        assert transport.retries == {"ConnectError": 1}
+
+    def test_last_failure_is_returned_after_all_attempts(self):
+        transport = Transport(TokenBucket(capacity=100), network=scripted(502, 502, 502, 200), retry=NO_BACKOFF)
+        assert send(transport).status_code == 502
+        network = scripted(*[httpx.ConnectError("reset")] * 3)
+        with pytest.raises(httpx.ConnectError):
+            send(Transport(TokenBucket(capacity=100), network=network, retry=NO_BACKOFF))
+
+    def test_client_errors_are_not_retried(self):
+        transport = Transport(TokenBucket(capacity=100), network=scripted(404, 200), retry=NO_BACKOFF)
+        assert send(transport).status_code == 404
+        assert not transport.retries
+
+
+class TestRetryPolicy:
+    def test_retry_after_takes_precedence(self):
+        response = httpx.Response(429, headers={"Retry-After": "7"})
+        assert RetryPolicy().get_delay(0, response) == 7
+
+    def test_backoff_grows_up_to_limit(self):
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+        assert all(0 <= policy.get_delay(1) <= 2 for _ in range(20))
+        assert all(0 <= policy.get_delay(10) <= 5 for _ in range(20))
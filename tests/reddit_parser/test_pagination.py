@@ -0,0 +1,38 @@
+from reddit_parser.pagination import paginate, locate_closest_link_index
+from tests.mocks.api_mocks import make_entity
+
+
+def make_links(*created: float) -> list:
+    return [make_entity("t3", f"l{value}", "author", value) for value in created]
+
+
+class TestPaginate:
+    def test_stops_on_page_crossing_threshold(self):
+        pages = {None: make_links(100, 90), "t3_l90": make_links(80, 70), "t3_l70": make_links(60, 50)}
+        requested = []
+
+        def get_page(after):
+            requested.append(after)
+            return pages[after]
+
+        result = [[x.created for x in page] for page in paginate(get_page, threshold=75)]
+        assert result == [[100, 90], [80]]
+        assert requested == [None, "t3_l90"]
+
+    def test_skips_links_repeated_from_previous_page(self):
+        pages = {None: make_links(100, 90), "t3_l90": make_links(90, 80), "t3_l80": []}
+        result = [[x.created for x in page] for page in paginate(pages.get, threshold=0)]
+        assert result == [[100, 90], [80]]
+
+    def test_unordered_listing_is_filtered(self):
+        pages = {None: make_links(100, 10, 90), "t3_l90": make_links(20, 95), "t3_l95": []}
+        result = [[x.created for x in page] for page in paginate(pages.get, threshold=50, ordered=False)]
+        assert result == [[100, 90], [95]]
+
+
+def test_locate_closest_link_index():
+    links = make_links(100, 90, 80, 70)
+    assert locate_closest_link_index(links, 85) == 2
+    assert locate_closest_link_index(links, 80) == 3
+    assert locate_closest_link_index(links, 10) == 4
+    assert locate_closest_link_index(links, 200) == 0
@@ -0,0 +1,90 @@
+import httpx
+import pytest
+
+from benchmarks.bench_searchers import AUTH_CONFIG, BASE_URL
+from benchmarks.synthetic import RateLimitShape, SubredditShape, SyntheticReddit, SyntheticSubreddit
+from reddit_parser.api import RedditApi, RedditApiError
+from reddit_parser.config import load_from_env
+from reddit_parser.planning import CommentsStrategy
+from reddit_parser.pool import NoSessionsError, SessionPool
+from reddit_parser.ratelimit import UnlimitedBucket
+from reddit_parser.searcher import TopUsersSearcher
+
+SUBREDDIT = SyntheticSubreddit("test", SubredditShape(days=1, links_per_day=30, comments_per_thread=5))
+
+
+def create_api(network: httpx.BaseTransport) -> RedditApi:
+    return RedditApi(base_url=BASE_URL, auth_config=AUTH_CONFIG, network=network, limiter=UnlimitedBucket())
+
+
+def revoked(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/api/v1/access_token":
+        return httpx.Response(200, json={"access_token": "revoked", "expires_in": 86400, "token_type": "bearer"})
+    return httpx.Response(401, json={"message": "Unauthorized", "error": 401})
+
+
+class QuarantinedThread(SyntheticReddit):
+    def __init__(self, article: str) -> None:
+        super().__init__([SUBREDDIT])
+        self.article = article
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith(f"/comments/{self.article}"):
+            return httpx.Response(403, json={"message": "Forbidden", "error": 403})
+        return super().handle_request(request)
+
+
+def search(api: RedditApi, pool: SessionPool | None = None) -> dict:
+    searcher = TopUsersSearcher(api, clock=lambda: SUBREDDIT.now, strategy=CommentsStrategy.LINKS, pool=pool)
+    return searcher.process("test", days=1)
+
+
+class TestSessionPool:
+    def test_comment_trees_are_shared_between_sessions(self):
+        # With some latency every session gets links before the others have drained the queue.
+        servers = [SyntheticReddit([SUBREDDIT], RateLimitShape(latency=0.01)) for _ in range(3)]
+        pool = SessionPool([create_api(server) for server in servers])
+        pool.authorize()
+
+        assert search(pool.api, pool) == search(create_api(SyntheticReddit([SUBREDDIT])))
+        assert all(server.requests["comments"] > 0 for server in servers)
+
+    def test_revoked_session_fails_over(self):
+        server = SyntheticReddit([SUBREDDIT])
+        pool = SessionPool([create_api(httpx.MockTransport(revoked)), create_api(server)], workers_per_session=2)
+        pool.authorize()
+
+        assert search(create_api(server), pool) == search(create_api(SyntheticReddit([SUBREDDIT])))
+        assert pool.sessions[0].error.status_code == 401
+        assert pool.sessions[1].failed_at is None
+
+    def test_forbidden_thread_fails_the_run_without_failover(self):
+        article = next(link.id for link in SUBREDDIT.links if link.num_comments)
+        pool = SessionPool([create_api(QuarantinedThread(article)) for _ in range(2)])
+        pool.authorize()
+
+        with pytest.raises(RedditApiError) as error:
+            search(pool.api, pool)
+        assert type(error.value) is RedditApiError and error.value.status_code == 403
+        assert all(session.failed_at is None for session in pool.sessions)
+        assert pool.api is pool.sessions[0].api
+
+    def test_run_fails_without_sessions(self):
+        pool = SessionPool([create_api(httpx.MockTransport(revoked))])
+        with pytest.raises(NoSessionsError):
+            search(create_api(SyntheticReddit([SUBREDDIT])), pool)
+
+
+def test_extra_credentials_are_loaded_from_env(monkeypatch):
+    variables = {
+        "REDDIT_BASE_URL": BASE_URL, "REDDIT_AUTH_URL": "https://www.reddit.com/api/v1/access_token",
+        "REDDIT_PARSER_APP_ID": "one", "REDDIT_PARSER_APP_SECRET": "s1", "REDDIT_USER": "u1", "REDDIT_PASSWORD": "p1",
+        "REDDIT_PARSER_APP_ID_2": "two", "REDDIT_PARSER_APP_SECRET_2": "s2", "REDDIT_USER_2": "u2",
+        "REDDIT_PASSWORD_2": "p2",
+    }
+    for name, value in variables.items():
+        monkeypatch.setenv(name, value)
+
+    config = load_from_env()
+
+    assert [(auth.app_id, auth.username) for auth in config.credentials] == [("one", "u1"), ("two", "u2")]
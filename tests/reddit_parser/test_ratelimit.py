@@ -0,0 +1,118 @@
+import asyncio
+
+from httpx import Headers
+
+from reddit_parser.ratelimit import AsyncRequestLimiter, FairSemaphore, TokenBucket, current_lane
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def ratelimit_headers(used: int, remaining: int, reset: int) -> Headers:
+    return Headers({
+        "X-Ratelimit-Used": str(used),
+        "X-Ratelimit-Remaining": str(remaining),
+        "X-Ratelimit-Reset": str(reset),
+    })
+
+
+class TestTokenBucket:
+    def test_burst_is_allowed(self):
+        bucket = TokenBucket(capacity=5, rate=1, clock=FakeClock())
+        assert [bucket.reserve() for _ in range(5)] == [0, 0, 0, 0, 0]
+        assert bucket.reserve() == 1
+        assert bucket.reserve() == 2
+
+    def test_remaining_quota_is_spread_over_reset_window(self):
+        clock = FakeClock()
+        bucket = TokenBucket(capacity=5, rate=1, clock=clock)
+        bucket.update(ratelimit_headers(used=500, remaining=105, reset=100))
+        assert bucket.rate == 1
+        for _ in range(5):
+            bucket.reserve()
+        assert bucket.reserve() == 1
+        clock.now += 50
+        assert bucket.reserve() == 0
+
+    def test_reserved_requests_do_not_speed_up_refill(self):
+        bucket = TokenBucket(capacity=5, rate=1, clock=FakeClock())
+        for _ in range(10):
+            bucket.reserve()
+        assert bucket.tokens == -5
+        bucket.update(ratelimit_headers(used=590, remaining=10, reset=10))
+        assert bucket.rate == 1
+
+    def test_exhausted_quota_waits_for_reset(self):
+        clock = FakeClock()
+        bucket = TokenBucket(capacity=5, rate=1, period=600, clock=clock)
+        bucket.update(ratelimit_headers(used=600, remaining=0, reset=30))
+        assert bucket.reserve() == 30 + 1
+        clock.now += 40
+        assert bucket.reserve() == 0
+        assert bucket.rate == 1
+
+    def test_response_without_headers_keeps_state(self):
+        bucket = TokenBucket(capacity=1, rate=2, clock=FakeClock())
+        bucket.update(Headers())
+        bucket.reserve()
+        assert bucket.reserve() == 0.5
+
+
+class TestFairSemaphore:
+    def test_slots_are_handed_to_lanes_in_turn(self):
+        order = []
+
+        async def worker(semaphore: FairSemaphore, lane: str, index: int) -> None:
+            current_lane.set(lane)
+            await semaphore.acquire()
+            order.append(f"{lane}{index}")
+            await asyncio.sleep(0)
+            semaphore.release()
+
+        async def run() -> None:
+            semaphore = FairSemaphore(1)
+            await asyncio.gather(
+                *(worker(semaphore, "a", index) for index in range(4)),
+                *(worker(semaphore, "b", index) for index in range(2)),
+            )
+
+        asyncio.run(run())
+        assert order == ["a0", "a1", "b0", "a2", "b1", "a3"]
+
+
+class TestAsyncRequestLimiter:
+    def test_requests_in_flight_are_bounded(self):
+        limiter = AsyncRequestLimiter(TokenBucket(capacity=100), max_in_flight=2)
+        in_flight = []
+
+        async def request() -> None:
+            async with limiter:
+                in_flight.append(limiter._semaphore._value)
+                await asyncio.sleep(0.01)
+
+        async def run() -> None:
+            await asyncio.gather(*(request() for _ in range(6)))
+
+        asyncio.run(run())
+        assert len(in_flight) == 6
+        assert min(in_flight) == 0
+        assert limiter._semaphore._value == 2
+
+    def test_request_cancelled_while_paced_releases_its_slot(self):
+        limiter = AsyncRequestLimiter(TokenBucket(capacity=1, rate=1), max_in_flight=2)
+
+        async def run() -> int:
+            await limiter.acquire()
+            paced = asyncio.create_task(limiter.acquire())
+            await asyncio.sleep(0.01)
+            paced.cancel()
+            await asyncio.gather(paced, return_exceptions=True)
+            limiter.release()
+            return limiter._semaphore._value
+
+        assert asyncio.run(run()) == 2
@@ -0,0 +1,44 @@
+import gzip
+
+import httpx
+
+from reddit_parser.response_log import ResponseLogConfig, ResponseLogger
+
+REQUEST = httpx.Request("GET", "https://oauth.reddit.com/r/python/new")
+
+
+def log_responses(config: ResponseLogConfig, status_codes: list[int]) -> ResponseLogger:
+    logger = ResponseLogger(config)
+    for index, status_code in enumerate(status_codes):
+        response = httpx.Response(status_code, content=f'{{"index": {index}}}'.encode())
+        if logger.wants(response):
+            logger.log(REQUEST, response)
+    logger.close()
+    return logger
+
+
+class TestResponseLogger:
+    def test_raw_body_is_written_with_request_line(self, tmp_path):
+        path = tmp_path / "responses.log"
+        log_responses(ResponseLogConfig(path=str(path)), [200])
+        content = path.read_text()
+        assert "GET https://oauth.reddit.com/r/python/new 200 12 bytes" in content
+        assert '{"index": 0}' in content
+
+    def test_successful_responses_are_sampled(self, tmp_path):
+        path = tmp_path / "responses.log"
+        log_responses(ResponseLogConfig(path=str(path), sample_rate=2), [200, 200, 200, 500, 200])
+        content = path.read_text()
+        assert [f'"index": {index}' in content for index in range(5)] == [True, False, True, True, False]
+
+    def test_errors_only(self, tmp_path):
+        path = tmp_path / "responses.log"
+        log_responses(ResponseLogConfig(path=str(path), errors_only=True), [200, 429])
+        assert "429" in path.read_text() and '"index": 0' not in path.read_text()
+
+    def test_rotated_files_are_compressed(self, tmp_path):
+        path = tmp_path / "responses.log"
+        log_responses(ResponseLogConfig(path=str(path), max_bytes=200, backup_count=2), [200] * 5)
+        with gzip.open(tmp_path / "responses.log.1.gz", "rt") as file:
+            assert "200 12 bytes" in file.read()
+        assert not (tmp_path / "responses.log.3.gz").exists()
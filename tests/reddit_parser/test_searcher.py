@@ -1,18 +1,184 @@
+import asyncio
+import math
+import time
+from unittest.mock import patch
+
+from reddit_parser.columns import EntityColumns
+from reddit_parser.planning import CommentsStrategy, estimate_links_cost, estimate_stream_cost, plan_comments_strategy
+from reddit_parser.searcher import TopLinksSearcher, TopUsersSearcher
+from tests.mocks.api_mocks import MockRedditApi, MockRedditUser, StaticMockRedditSubreddits, make_entity
+
+
+TOP_USERS_POSITIVE_RESULT = {
+    'top_users_by_comments': [
+        {'author': 'random_author_013', 'count': 10}, {'author': 'random_author_001', 'count': 8},
+        {'author': 'random_author_012', 'count': 8}, {'author': 'random_author_007', 'count': 7},
+        {'author': 'random_author_011', 'count': 7}, {'author': 'random_author_017', 'count': 7},
+        {'author': 'random_author_018', 'count': 7}, {'author': 'random_author_008', 'count': 6},
+        {'author': 'random_author_003', 'count': 5}, {'author': 'random_author_019', 'count': 5},
+        {'author': 'random_author_006', 'count': 4}, {'author': 'random_author_016', 'count': 4},
+        {'author': 'random_author_010', 'count': 3}, {'author': 'random_author_000', 'count': 2},
+        {'author': 'random_author_004', 'count': 2}, {'author': 'random_author_005', 'count': 2},
+        {'author': 'random_author_015', 'count': 2}, {'author': 'random_author_002', 'count': 1},
+        {'author': 'random_author_009', 'count': 1}, {'author': 'random_author_014', 'count': 1},
+    ],
+    'top_users_by_posts': [
+        {'author': 'random_author_003', 'count': 3}, {'author': 'random_author_000', 'count': 2},
+        {'author': 'random_author_001', 'count': 2}, {'author': 'random_author_002', 'count': 2},
+        {'author': 'random_author_004', 'count': 1}, {'author': 'random_author_005', 'count': 1},
+        {'author': 'random_author_006', 'count': 1}, {'author': 'random_author_007', 'count': 1},
+        {'author': 'random_author_008', 'count': 1}, {'author': 'random_author_009', 'count': 1},
+        {'author': 'random_author_010', 'count': 1}, {'author': 'random_author_011', 'count': 1},
+        {'author': 'random_author_012', 'count': 1}, {'author': 'random_author_013', 'count': 1},
+        {'author': 'random_author_014', 'count': 1}, {'author': 'random_author_015', 'count': 1},
+        {'author': 'random_author_016', 'count': 1}, {'author': 'random_author_017', 'count': 1},
+        {'author': 'random_author_018', 'count': 1}, {'author': 'random_author_019', 'count': 1},
+    ],
+}
+
+
 class TestTopUsersSearcher:
     def test_get_positive(self, top_users_searcher_positive):
         result = top_users_searcher_positive.process("abrakadabra")
+        assert result == TOP_USERS_POSITIVE_RESULT
+
+
+class TestAsyncTopUsersSearcher:
+    def test_get_positive(self, async_top_users_searcher_positive):
+        result = asyncio.run(async_top_users_searcher_positive.process("abrakadabra"))
+        assert result == TOP_USERS_POSITIVE_RESULT
+
+
+class TestTopUsersSearcherTop:
+    def test_get_top_entries(self, api_mock_positive):
+        result = TopUsersSearcher(api_mock_positive, top=3).process("abrakadabra")
         assert result == {
-            'top_users_by_comments': ['random_author_013: 10', 'random_author_001: 8', 'random_author_012: 8',
-                                      'random_author_007: 7', 'random_author_011: 7', 'random_author_017: 7',
-                                      'random_author_018: 7', 'random_author_008: 6', 'random_author_003: 5',
-                                      'random_author_019: 5', 'random_author_006: 4', 'random_author_016: 4',
-                                      'random_author_010: 3', 'random_author_000: 2', 'random_author_004: 2',
-                                      'random_author_005: 2', 'random_author_015: 2', 'random_author_002: 1',
-                                      'random_author_009: 1', 'random_author_014: 1'],
-            'top_users_by_posts': ['random_author_003: 3', 'random_author_002: 2', 'random_author_001: 2',
-                                   'random_author_000: 2', 'random_author_019: 1', 'random_author_018: 1',
-                                   'random_author_017: 1', 'random_author_016: 1', 'random_author_015: 1',
-                                   'random_author_014: 1', 'random_author_013: 1', 'random_author_012: 1',
-                                   'random_author_011: 1', 'random_author_010: 1', 'random_author_009: 1',
-                                   'random_author_008: 1', 'random_author_007: 1', 'random_author_006: 1',
-                                   'random_author_005: 1', 'random_author_004: 1']}
+            key: value[:3] for key, value in TOP_USERS_POSITIVE_RESULT.items()
+        }
+
+
+class TestTopUsersSearcherCommentCounts:
+    def test_links_without_comments_are_not_requested(self):
+        now = time.time()
+        links = [
+            make_entity("t3", "a", "alice", now - 60, num_comments=1),
+            make_entity("t3", "b", "bob", now - 120, num_comments=0),
+        ]
+        subreddits = StaticMockRedditSubreddits(links, {"a": [make_entity("t1", "a1", "carol", now)]})
+        result = TopUsersSearcher(MockRedditApi(MockRedditUser(), subreddits)).process("python", days=1)
+
+        assert result["top_users_by_comments"] == [{"author": "carol", "count": 1}]
+        assert [call for call in subreddits.calls if call[0] == "get_comments"] == [("get_comments", "a")]
+
+
+class TestTopLinksSearcher:
+    @staticmethod
+    def create_subreddits(now: float) -> StaticMockRedditSubreddits:
+        links = [
+            make_entity("t3", "a", "alice", now - 60, score=5),
+            make_entity("t3", "b", "bob", now - 5 * 86400, score=9),
+            make_entity("t3", "c", "carol", now - 120, score=7),
+        ]
+        return StaticMockRedditSubreddits(links, {}, page_size=2)
+
+    def test_links_are_read_from_narrowest_time_filter(self):
+        now = time.time()
+        subreddits = self.create_subreddits(now)
+        result = TopLinksSearcher(MockRedditApi(MockRedditUser(), subreddits), clock=lambda: now).process("python", 3)
+
+        assert [link["id"] for link in result] == ["c", "a"]
+        assert {call for call in subreddits.calls} == {("get_top", "week")}
+
+    def test_top_listing_cut_at_its_limit_falls_back_to_new(self):
+        # The two best links of the week are served and one of them is older than the window.
+        now = time.time()
+        subreddits = self.create_subreddits(now)
+        subreddits.listing_size = 2
+        with patch("reddit_parser.searcher.is_listing_complete", return_value=False):
+            searcher = TopLinksSearcher(MockRedditApi(MockRedditUser(), subreddits), clock=lambda: now)
+            assert [link["id"] for link in searcher.process("python", 3)] == ["c", "a"]
+            assert ("get_new", None) in subreddits.calls
+
+            subreddits.calls.clear()
+            top = TopLinksSearcher(MockRedditApi(MockRedditUser(), subreddits), top=1, clock=lambda: now)
+            assert [link["id"] for link in top.process("python", 3)] == ["c"]
+            assert {call[0] for call in subreddits.calls} == {"get_top"}
+
+    def test_long_window_falls_back_to_new(self):
+        now = time.time()
+        subreddits = self.create_subreddits(now)
+        result = TopLinksSearcher(MockRedditApi(MockRedditUser(), subreddits), clock=lambda: now).process("python", 400)
+
+        assert [link["id"] for link in result] == ["b", "c", "a"]
+        assert {call[0] for call in subreddits.calls} == {"get_new"}
+
+
+class TestTopUsersSearcherCommentsStrategy:
+    @staticmethod
+    def create_subreddits(now: float, stream_size: int = 1000) -> StaticMockRedditSubreddits:
+        links = [
+            make_entity("t3", "a", "alice", now - 60, num_comments=2),
+            make_entity("t3", "b", "bob", now - 120, num_comments=1),
+            make_entity("t3", "c", "carol", now - 2 * 86400, num_comments=1),
+        ]
+        comments = {
+            "a": [make_entity("t1", "a1", "dave", now - 50, link_id="t3_a"),
+                  make_entity("t1", "a2", "erin", now - 40, link_id="t3_a")],
+            "b": [make_entity("t1", "b1", "dave", now - 100, link_id="t3_b")],
+            # A fresh comment on a link older than the window isn't counted.
+            "c": [make_entity("t1", "c1", "frank", now - 30, link_id="t3_c")],
+        }
+        return StaticMockRedditSubreddits(links, comments, stream_size=stream_size)
+
+    def test_stream_is_planned_for_few_comments(self):
+        now = time.time()
+        subreddits = self.create_subreddits(now)
+        result = TopUsersSearcher(MockRedditApi(MockRedditUser(), subreddits), clock=lambda: now).process("python", 1)
+
+        assert result["top_users_by_comments"] == [{"author": "dave", "count": 2}, {"author": "erin", "count": 1}]
+        assert {call[0] for call in subreddits.calls} == {"get_new", "get_subreddit_comments"}
+
+    def test_forced_strategies_count_the_same(self):
+        now = time.time()
+        results = []
+        for strategy in CommentsStrategy.LINKS, CommentsStrategy.STREAM:
+            api = MockRedditApi(MockRedditUser(), self.create_subreddits(now))
+            results.append(TopUsersSearcher(api, clock=lambda: now, strategy=strategy).process("python", 1))
+        assert results[0] == results[1]
+
+    def test_truncated_stream_falls_back_to_links(self):
+        now = time.time()
+        subreddits = self.create_subreddits(now, stream_size=2)
+        subreddits.page_size = 1
+        # Let the mock's tiny stream look as long as a real listing.
+        with patch("reddit_parser.searcher.is_stream_complete", return_value=False):
+            result = TopUsersSearcher(
+                MockRedditApi(MockRedditUser(), subreddits), clock=lambda: now, strategy=CommentsStrategy.STREAM,
+            ).process("python", 1)
+
+        assert result["top_users_by_comments"] == [{"author": "dave", "count": 2}, {"author": "erin", "count": 1}]
+        assert [call for call in subreddits.calls if call[0] == "get_comments"] == [
+            ("get_comments", "a"), ("get_comments", "b"),
+        ]
+
+
+class TestPlanCommentsStrategy:
+    @staticmethod
+    def create_links(*num_comments: int | None) -> EntityColumns:
+        links = EntityColumns("t3")
+        links.extend(make_entity("t3", str(index), "alice", 0, num_comments=x) for index, x in enumerate(num_comments))
+        return links
+
+    def test_cheaper_strategy_is_planned(self):
+        few = self.create_links(*[2] * 50)
+        many = self.create_links(*[200] * 50)
+        assert (estimate_links_cost(few), estimate_stream_cost(few)) == (50, 2)
+        assert plan_comments_strategy(few) == CommentsStrategy.STREAM
+        assert estimate_stream_cost(many) == math.inf
+        assert plan_comments_strategy(many) == CommentsStrategy.LINKS
+        assert plan_comments_strategy(few, CommentsStrategy.LINKS) == CommentsStrategy.LINKS
+
+    def test_unknown_counts_are_requested_per_link(self):
+        links = self.create_links(None, 1200)
+        assert estimate_links_cost(links) == 9
+        assert plan_comments_strategy(links) == CommentsStrategy.LINKS
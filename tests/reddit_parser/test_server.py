@@ -0,0 +1,85 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import httpx
+
+from reddit_parser.server import RankingService, create_handler
+from tests.mocks.api_mocks import MockRedditApi, MockRedditUser, StaticMockRedditSubreddits, make_entity
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = time.time()
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def create_service(clock: FakeClock) -> tuple[RankingService, StaticMockRedditSubreddits]:
+    links = [make_entity("t3", "a", "alice", clock.now - 60)]
+    subreddits = StaticMockRedditSubreddits(links, {"a": [make_entity("t1", "a1", "bob", clock.now)]})
+    api = MockRedditApi(MockRedditUser(), subreddits)
+    return RankingService(api, ["Python"], ["top_users"], days=1, interval=60, clock=clock), subreddits
+
+
+class TestRankingService:
+    def test_rankings_are_served_with_staleness(self):
+        clock = FakeClock()
+        service, _ = create_service(clock)
+        assert json.loads(service.render("python", "top_users"))["stale"] is True
+
+        service.refresh()
+        clock.now += 30
+        ranking = json.loads(service.render("python", "top_users"))
+
+        assert ranking["stale"] is False
+        assert ranking["age_seconds"] == 30
+        assert ranking["result"]["top_users_by_comments"] == [{"author": "bob", "count": 1}]
+        assert service.render("rust", "top_users") is None
+
+    def test_failed_refresh_keeps_previous_ranking(self):
+        clock = FakeClock()
+        service, subreddits = create_service(clock)
+        service.refresh()
+        subreddits.get_new = None
+        clock.now += 200
+        service.refresh()
+
+        ranking = json.loads(service.render("python", "top_users"))
+        assert ranking["stale"] is True
+        assert "TypeError" in ranking["error"]
+        assert ranking["result"]["top_users_by_posts"] == [{"author": "alice", "count": 1}]
+
+    def test_stop_does_not_wait_for_the_whole_crawl(self):
+        service, _ = create_service(FakeClock())
+        crawling, release = threading.Event(), threading.Event()
+
+        def crawl(name: str, days: int) -> dict:
+            crawling.set()
+            release.wait()
+            return {}
+
+        service.searchers["top_users"] = crawl
+        service.start()
+        crawling.wait()
+        started = time.monotonic()
+        service.stop(timeout=0.1)
+        assert time.monotonic() - started < 1
+        release.set()
+
+    def test_http_endpoint(self):
+        service, _ = create_service(FakeClock())
+        service.refresh()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), create_handler(service))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+            assert httpx.get(f"{base_url}/rankings/python/top_users").json()["subreddit"] == "Python"
+            assert [ranking["mode"] for ranking in httpx.get(f"{base_url}/rankings").json()] == ["top_users"]
+            assert httpx.get(f"{base_url}/rankings/python/top_links").status_code == 404
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,103 @@
+import multiprocessing
+from collections import Counter
+
+import pytest
+
+from benchmarks.bench_searchers import AUTH_CONFIG, BASE_URL
+from benchmarks.synthetic import SubredditShape, SyntheticReddit, SyntheticSubreddit
+from reddit_parser.api import RedditApi
+from reddit_parser.planning import CommentsStrategy
+from reddit_parser.ratelimit import UnlimitedBucket
+from reddit_parser.searcher import TopUsersSearcher
+from reddit_parser.workqueue import QueueCoordinator, QueueWorker, WorkQueue, WorkQueueError
+
+NOW = 1736000000.0
+SHAPE = SubredditShape(days=1, links_per_day=40, comments_per_thread=5)
+
+
+def create_api() -> RedditApi:
+    network = SyntheticReddit([SyntheticSubreddit("test", SHAPE, now=NOW)])
+    api = RedditApi(base_url=BASE_URL, auth_config=AUTH_CONFIG, network=network, limiter=UnlimitedBucket())
+    api.authorize()
+    return api
+
+
+def run_worker(path: str, worker_id: str) -> None:
+    QueueWorker(create_api(), WorkQueue(path), worker_id=worker_id, poll_interval=0.01).run()
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = NOW
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestWorkQueue:
+    def test_claimed_links_are_leased(self, tmp_path):
+        clock = Clock()
+        queue = WorkQueue(str(tmp_path / "queue.db"), lease=60, clock=clock)
+        job = queue.create_job("Test", Counter(alice=1), [("a", 1), ("b", None)])
+
+        first, second = queue.claim("one"), queue.claim("two")
+        assert [(item.link_id, item.subreddit) for item in first + second] == [("a", "Test"), ("b", "Test")]
+        assert queue.claim("three") == []
+        assert queue.progress(job) == {"leased": 2}
+
+        queue.complete(first[0], Counter(bob=2))
+        # "two" crashed, so its link is claimed again once the lease expires.
+        clock.now += 61
+        retried = queue.claim("three")
+        assert [(item.link_id, item.attempts) for item in retried] == [("b", 2)]
+        queue.complete(retried[0], Counter(carol=1, bob=1))
+
+        assert queue.merge(job) == {
+            "top_users_by_posts": [{"author": "alice", "count": 1}],
+            "top_users_by_comments": [{"author": "bob", "count": 3}, {"author": "carol", "count": 1}],
+        }
+
+    def test_link_is_failed_after_its_attempts(self, tmp_path):
+        queue = WorkQueue(str(tmp_path / "queue.db"), max_attempts=2)
+        job = queue.create_job("test", Counter(), [("a", 1)])
+        for _ in range(2):
+            queue.fail(queue.claim("worker")[0], "RedditApiError: 500")
+
+        assert queue.claim("worker") == []
+        assert queue.progress(job) == {"failed": 1}
+        with pytest.raises(WorkQueueError, match="500"):
+            queue.merge(job)
+
+    def test_stale_claim_does_not_touch_replacing_job(self, tmp_path):
+        queue = WorkQueue(str(tmp_path / "queue.db"))
+        queue.create_job("test", Counter(), [("old_a", 1)])
+        stale = queue.claim("slow")[0]
+        job = queue.create_job("Test", Counter(), [("new_x", 1)])
+
+        queue.complete(stale, Counter(alice=1))
+        queue.fail(stale, "RedditApiError: 500")
+        assert queue.progress() == {"pending": 1}
+        item = queue.claim("worker")[0]
+        assert (item.job, item.link_id, item.attempts) == (job, "new_x", 1)
+        queue.complete(item, Counter(bob=1))
+        assert queue.merge(job)["top_users_by_comments"] == [{"author": "bob", "count": 1}]
+
+
+def test_workers_in_processes_count_like_searcher(tmp_path):
+    path = str(tmp_path / "queue.db")
+    coordinator = QueueCoordinator(create_api(), WorkQueue(path), clock=lambda: NOW, poll_interval=0.01)
+    job = coordinator.enqueue("test", days=1)
+    # A worker which claimed a link and crashed before finishing it.
+    WorkQueue(path, lease=0).claim("crashed")
+
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=run_worker, args=(path, f"worker-{index}")) for index in range(3)]
+    for worker in workers:
+        worker.start()
+    coordinator.wait(job)
+    for worker in workers:
+        worker.join()
+
+    expected = TopUsersSearcher(create_api(), clock=lambda: NOW, strategy=CommentsStrategy.LINKS).process("test", 1)
+    assert coordinator.queue.merge(job) == expected
+    assert all(worker.exitcode == 0 for worker in workers)
@@ -0,0 +1,43 @@
+import csv
+import json
+
+import pytest
+
+from reddit_parser.writers import OutputFormat, write_result
+
+LINKS = [{"id": "a", "score": 10}, {"id": "b", "score": 5}]
+USERS = {"top_users_by_posts": [{"author": "alice", "count": 2}], "top_users_by_comments": []}
+
+
+class TestWriters:
+    @pytest.mark.parametrize("result", [LINKS, [], USERS])
+    def test_json_matches_whole_document_dump(self, tmp_path, result):
+        path = tmp_path / "result.json"
+        write_result(str(path), iter(result) if isinstance(result, list) else result)
+        assert path.read_text() == json.dumps(result, indent=4)
+
+    def test_ratings_are_flattened_into_ndjson_records(self, tmp_path):
+        path = tmp_path / "result.ndjson"
+        write_result(str(path), USERS, OutputFormat.NDJSON)
+        assert [json.loads(line) for line in path.read_text().splitlines()] == [
+            {"rating": "top_users_by_posts", "author": "alice", "count": 2},
+        ]
+
+    def test_csv(self, tmp_path):
+        path = tmp_path / "result.csv"
+        write_result(str(path), iter(LINKS), OutputFormat.CSV)
+        with open(path, newline="") as file:
+            assert list(csv.DictReader(file)) == [{"id": "a", "score": "10"}, {"id": "b", "score": "5"}]
+
+    def test_failed_write_keeps_previous_result(self, tmp_path):
+        path = tmp_path / "result.ndjson"
+        path.write_text("previous")
+
+        def failing():
+            yield LINKS[0]
+            raise RuntimeError("interrupted")
+
+        with pytest.raises(RuntimeError):
+            write_result(str(path), failing(), OutputFormat.NDJSON)
+        assert path.read_text() == "previous"
+        assert list(tmp_path.iterdir()) == [path]